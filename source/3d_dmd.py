@@ -16,6 +16,7 @@ import matplotlib.animation as animation
 from matplotlib import gridspec
 from DMD import DMD
 from sparse_dmd import dmd, sparse
+from low_rank import SVDBackend, StreamingDMD
 import types
 import dill
 
@@ -92,9 +93,16 @@ w1  w2  ... wn
 """
 
 # %% Load all the snapshots
+# stream = True: DMD updated as every snapshot is read (StreamingDMD), the
+# snapshot matrix is not formed, for long sequences
+stream = False
+dt = 0.5
 print("loading data")
 FirstFrame = DataFrame[col].values
-Snapshots = FirstFrame[ind].ravel(order='F')
+Snapshots = [FirstFrame[ind].ravel(order='F')]
+if stream:
+    bfs = StreamingDMD(dt=dt, rank=500, block=20)
+    bfs.update(Snapshots.pop())
 with timer("Load Data"):
     for i in range(np.size(dirs)-1):
         TempFrame = pd.read_hdf(pathH + dirs[i + 1])
@@ -103,12 +111,18 @@ with timer("Load Data"):
         if np.shape(TempFrame)[0] != np.shape(DataFrame)[0]:
             sys.exit('The input snapshots does not match!!!')
         NextFrame = TempFrame[col].values
-        Snapshots = np.vstack((Snapshots, NextFrame[ind].ravel(order='F')))
+        if stream:
+            bfs.update(NextFrame[ind].ravel(order='F'))
+        else:
+            Snapshots.append(NextFrame[ind].ravel(order='F'))
         DataFrame += TempFrame
-Snapshots = Snapshots.T
 # obtain the dimensional information:
 # m-No of coordinates, n-No of snapshots, o-No of variables
-m, n = np.shape(Snapshots)
+if stream:
+    m, n = bfs.data_shape
+else:
+    Snapshots = np.stack(Snapshots, axis=1)  # copied only once
+    m, n = np.shape(Snapshots)
 o = np.size(col)
 if (m % o != 0):
     sys.exit("Dimensions of snapshots are wrong!!!")
@@ -123,13 +137,21 @@ print("data loaded")
     Compute
 """
 # %% DMD 
-dt = 0.5
-bfs = dmd.DMD(Snapshots, dt=dt)
+# truncated SVD keeping 99.9% energy, svd = None for the full SVD
+svd = None if stream else SVDBackend('randomized', energy=0.999)
+# the reduction is kept in path3D/cache, a rerun on the same snapshots
+# skips the SVD
+if not stream:
+    bfs = dmd.DMD(Snapshots, dt=dt, svd=svd, cache=path3D + 'cache/')
 with timer("DMD computing"):
     bfs.compute()
 print("The residuals of DMD is ", bfs.residuals)
+if svd is not None:
+    print("SVD truncation: ", svd.info)
+elif stream:
+    print("SVD truncation: ", bfs.isvd.info)
 # %% SPDMD
-bfs1 = sparse.SparseDMD(Snapshots, dt=dt)
+bfs1 = sparse.SparseDMD(dmd=bfs)
 gamma = [500, 700, 900]
 with timer("SPDMD computing"):
     bfs1.compute_sparse(gamma)
@@ -147,29 +169,17 @@ re_coeff = bfs2.amplitudes
 #     bfs0 = dill.load(f)
 # %% Save results for plotting
 meanflow.to_hdf(path3D + 'Meanflow.h5', 'w', format='fixed')
-np.save(path3D + 'eigval', bfs.eigval)
-np.save(path3D + 'modes1', bfs.modes[:,:200])
-np.save(path3D + 'modes2', bfs.modes[:,200:400])
-np.save(path3D + 'modes3', bfs.modes[:,400:600])
-np.save(path3D + 'modes4', bfs.modes[:,600:800])
-np.save(path3D + 'modes5', bfs.modes[:,800:])
-np.save(path3D + 'omega', bfs.omega)
-np.save(path3D + 'beta', bfs.beta)
-np.save(path3D + 'amplitudes', bfs.amplitudes)
-
-# discard the bad DMD modes
-percent = 0.998
-bfs2 = bfs.reduce(percent)  # 0.95
-np.save(path3D + 'Re_modes', bfs2.modes)
-np.save(path3D + 'Re_freq', bfs2.omega/2/np.pi)
-np.save(path3D + 'Re_beta', bfs2.beta)
-np.save(path3D + 'Re_amplitudes', bfs2.amplitudes)
-np.save(path3D + 'Re_index', bfs2.ind)
-
-np.savez(path3D + 'sparse.npz',
-         Nz=bfs1.sparse.Nz,
-         gamma=bfs1.sparse.gamma,
-         nonzero=bfs1.sparse.nonzero)
+# modes, eigval, omega, beta, amplitudes and the SPDMD answer in one file,
+# read by dmd.DMDResult (3dmd_post.py)
+with timer("Save DMD results"):
+    bfs1.save(path3D + 'dmd.h5')
+# reconstructed flow of the sparse modes, frame by frame into a snapshot
+# store (the space x time array is not formed)
+# from snapshot_store import create_store
+# rec = bfs1.spdmd_reconstruction(0).reconstruction  # gamma index 0
+# store = create_store(path3D + 'Reconstruct.h5', meanflow[['x', 'y', 'z']],
+#                      col)
+# rec.to_store(store, col, dt=dt, block=16)
 
 # %% Eigvalue Spectrum
 eigval = bfs.eigval
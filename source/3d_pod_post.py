@@ -15,6 +15,7 @@ import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from matplotlib import gridspec
 import pod as pod
+from low_rank import IncrementalSVD
 
 
 plt.close("All")
@@ -90,7 +91,10 @@ w1  w2  ... wn
 # %% Load all the snapshots
 print("loading data")
 FirstFrame = DataFrame[col].values
-Snapshots = FirstFrame.ravel(order='F')
+# snapshots go to the incremental SVD as they are read, the snapshot
+# matrix is not formed (rank: NO of modes kept)
+isvd = IncrementalSVD(rank=700, block=20)
+isvd.update(FirstFrame.ravel(order='F'))
 with timer("Load Data"):
     for i in range(np.size(dirs)-1):
         TempFrame = pd.read_hdf(pathH + dirs[i+1])
@@ -99,12 +103,11 @@ with timer("Load Data"):
         if np.shape(TempFrame)[0] != np.shape(DataFrame)[0]:
             sys.exit('The input snapshots does not match!!!')
         NextFrame = TempFrame[col].values
-        Snapshots = np.vstack((Snapshots, NextFrame.ravel(order='F')))
+        isvd.update(NextFrame.ravel(order='F'))
         DataFrame += TempFrame
-Snapshots = Snapshots.T
 # obtain the dimensional information:
 # m-No of coordinates, n-No of snapshots, o-No of variables
-m, n = np.shape(Snapshots)
+m, n = isvd.dim, isvd.num
 o = np.size(col)
 if (m % o != 0):
     sys.exit("Dimensions of snapshots are wrong!!!")
@@ -120,8 +123,8 @@ print("data loaded")
 # %% POD
 dt = 0.5
 with timer("POD computing"):
-    eigval, eigvec, phi, coeff = \
-        pod.pod(Snapshots, fluc=True, method='svd')
+    eigval, eigvec, phi, coeff = isvd.pod(fluc=True)
+print("POD truncation: ", isvd.info)
         
 meanflow.to_hdf(path3P + 'Meanflow.h5', 'w', format='fixed')
 np.save(path3P + 'eigval', eigval)
@@ -246,12 +249,12 @@ for ind in mode_id:
 
         df1 = df.query("x<=0.0 & y>=0.0")
         filename1 = filename + "A"
-        p2p.frame2tec3d(df1, path3P, filename1, zname=1, stime=ind)
-        p2p.tec2plt(path3P, filename1, filename1)
+        p2p.frame2tec3d(df1, path3P, filename1, zname=1, stime=ind,
+                        binary=True)
         df2 = df.query("x>=0.0")
         filename2 = filename + "B"
-        p2p.frame2tec3d(df2, path3P, filename2, zname=2, stime=ind)
-        p2p.tec2plt(path3P, filename2, filename2)
+        p2p.frame2tec3d(df2, path3P, filename2, zname=2, stime=ind,
+                        binary=True)
 
 # %%###########################################################################
 """
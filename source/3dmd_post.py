@@ -15,6 +15,7 @@ import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from matplotlib import gridspec
 from scipy.interpolate import griddata
+from sparse_dmd import DMDResult
 import types
 from mpl_toolkits.axes_grid1.axes_divider import make_axes_locatable
 
@@ -70,24 +71,20 @@ varset = {var0: [0, m],
           var4: [4 * m, 5 * m]}
 dt = 0.5
 # %% Load & rename data
-eigval = np.load(path3D + 'eigval.npy')  # bfs.eigval
-omega = np.load(path3D + 'omega.npy')  # bfs.omega
-modes1 = np.load(path3D + 'modes1.npy')  # bfs.omega
-modes2 = np.load(path3D + 'modes2.npy')
-modes3 = np.load(path3D + 'modes3.npy')
-modes4 = np.load(path3D + 'modes4.npy')
-# %% merge modes
-modes = np.hstack((modes1, modes2, modes3, modes4))
-del modes1, modes2, modes3, modes4
-amplitudes = np.load(path3D + 'amplitudes.npy')  # bfs.omega
-sparse = np.load(path3D + 'sparse.npz')
-nonzero = sparse['nonzero']
+# all results of 3d_dmd.py in one file, the modes are read by slice
+res = DMDResult(path3D + 'dmd.h5')
+eigval = res.eigval  # bfs.eigval
+omega = res.omega  # bfs.omega
+modes = res.modes  # modes[:, num] reads only these modes
+amplitudes = res.amplitudes  # bfs.amplitudes
+sparse = res.sparse  # bfs1.sparse
+nonzero = sparse.nonzero
 # %% discard the bad DMD modes
-# re_phi = np.load(path2 + 'Re_modes.npy')  # bfs2.modes
-re_freq = np.load(path3D + 'Re_freq.npy')  # bfs2.omega/2/np.pi
-re_beta = np.load(path3D + 'Re_beta.npy')  # bfs2.beta
-re_coeff = np.load(path3D + 'Re_amplitudes.npy')  # bfs2.amplitudes
-re_index = np.load(path3D + 'Re_index.npy')  # bfs2.ind
+reduced = res.reduce(0.998)  # bfs2
+re_freq = reduced.omega/2/np.pi
+re_beta = reduced.beta
+re_coeff = reduced.amplitudes
+re_index = reduced.ind
 # %% load mean flow
 meanflow = pd.read_hdf(path3D + 'Meanflow.h5')
 meanflow['walldist'] = meanflow['y']
@@ -164,7 +161,7 @@ ax2.set_ylabel(r'$|\psi_k|$')
 ax2.grid(b=True, which='both', linestyle=':', alpha=0.0)
 plt.savefig(path3D+var+'DMDFreqSpectrum.svg', bbox_inches='tight')
 plt.show()
-print("the selected frequency:", freq[sparse['nonzero'][:, sp]])
+print("the selected frequency:", freq[sparse.nonzero[:, sp]])
 
 savenm = ['freq', 'psi', 'beta']
 savevr = np.vstack((freq1, psi1, beta1))
@@ -199,12 +196,12 @@ for ii in range(np.size(phase)):
     with timer('save plt of t=' + str(phase[ii])):
         df1 = df.query("x<=0.0 & y>=0.0")
         filename1 = filename + "A"
-        p2p.frame2tec3d(df1, path3D, filename1, zname=1, stime=ii)
-        p2p.tec2plt(path3D, filename1, filename1)
+        p2p.frame2tec3d(df1, path3D, filename1, zname=1, stime=ii,
+                        binary=True)
         df2 = df.query("x>=0.0")
         filename2 = filename + "B"
-        p2p.frame2tec3d(df2, path3D, filename2, zname=2, stime=ii)
-        p2p.tec2plt(path3D, filename2, filename2)
+        p2p.frame2tec3d(df2, path3D, filename2, zname=2, stime=ii,
+                        binary=True)
 
 
 """
@@ -9,14 +9,40 @@ import numpy as np
 import scipy as sp
 import warnings
 import sys
+from sparse_dmd.sparse import gamma_sweep, gamma_search
+from sparse_dmd.admm import admm_solve
+from sparse_dmd.dmd import cached_reduction, save_result, Reconstruction
+from sparse_dmd.sparse import SparseAnswer as EngineAnswer
 # from progressbar import ProgressBar, Percentage, Bar
 
 
+def vand_amplitude(eigvec, eigval, G):
+    """optimal amplitudes x of min ||G - eigvec diag(x) Vand||_F^2 in the
+    closed form J = x* P x - q* x - x* q + s, P x = q, O(r^2 n) without
+    forming the (r n) x r least squares system
+    Ref: Jovanovic M. R., et. al.-Sparsity-promoting dynamic mode
+    decomposition
+
+    G: the reduced snapshots, e.g. U* V1 = D VH
+    Return: x, P, q, s
+    """
+    Vand = np.vander(eigval, np.shape(G)[1], increasing=True)
+    P = (eigvec.T.conj() @ eigvec) * (Vand @ Vand.T.conj()).conj()
+    # q = diag(Vand G* eigvec)*, only the diagonal is computed
+    q = np.sum((Vand @ G.T.conj()) * eigvec.T, axis=1).conj()
+    s = np.linalg.norm(G)**2
+    try:
+        x = sp.linalg.cho_solve(sp.linalg.cho_factor(P), q)
+    except np.linalg.LinAlgError:  # P is singular numerically
+        x = np.linalg.lstsq(P, q, rcond=-1)[0]
+    return x, P, q, s
+
+
 class DMD(object):
     def __init__(self, snapshots):
         self.eigval = None
         self.eigvec = None
-        self.modes = None
+        self._modes = None
         self.snapshots = np.float64(snapshots)
         self.amplit = None
         self.Vand = None
@@ -24,6 +50,7 @@ class DMD(object):
         self.residual = 0
         self.beta = None
         self.omega = None
+        self.dt = None  # time interval, set by dmd_dynamics
         self.s = 0.0
         self.Ja = None
         self.rho = 1.0
@@ -31,13 +58,15 @@ class DMD(object):
         self.Prho = None
         self.eps_abs = 1.e-6
         self.eps_rel = 1.e-4
+        self.check = 1  # ADMM convergence test every check steps
+        self.kernel = None  # ADMM kernel, None (numpy) or 'numba'
         self.gamma = np.logspace(-2, 6, 50)
         self.spdmd = None
         self.spdmd_nmodes = None
-        self.spdmd_modes = None
+        self._spdmd_nonzero = None
         self.spdmd_amplit = None
         self.spdmd_Vand = None
-        self.spdmd_reconstruct = None
+        self.spdmd_reconstruction = None
         self.spdmd_loss = None
         self.r = 0.0
         self.ng = 0.0
@@ -46,6 +75,7 @@ class DMD(object):
         self.VH = None
         self.D = None
         self.DM = None
+        self.svd_info = None
 
     @property
     def dim(self):
@@ -55,50 +85,104 @@ class DMD(object):
     def tn(self):
         return np.shape(self.snapshots)[1]
 
+    @property
+    def modes(self):
+        """projected dynamic modes U eigvec, formed on first access"""
+        if self._modes is None and self.eigvec is not None:
+            self._modes = self.U @ self.eigvec
+        return self._modes
+
+    @modes.setter
+    def modes(self, modes):
+        self._modes = modes
+
+    @property
+    def spdmd_modes(self):
+        """modes of the nonzero spdmd amplitudes, formed on access"""
+        if self._spdmd_nonzero is None:
+            return None
+        if self._modes is not None:
+            return self._modes[:, self._spdmd_nonzero]
+        return self.U @ self.eigvec[:, self._spdmd_nonzero]
+
+    def mode_blocks(self, block=256):
+        """yield (columns, modes[:, columns]) block by block"""
+        for i in range(0, np.shape(self.eigvec)[1], block):
+            cols = np.arange(i, min(i + block, np.shape(self.eigvec)[1]))
+            yield cols, self.U @ self.eigvec[:, cols]
+
+    def save(self, filename, block=256, **extra):
+        """write modes, eigval, amplitudes, omega, beta (and the spdmd
+        answer) to one file, read it by sparse_dmd.DMDResult; dt is the
+        one of dmd_dynamics, 1 if not called"""
+        answer = None
+        if self.spdmd is not None:
+            answer = EngineAnswer(*np.shape(self.spdmd.amplit))
+            answer.gamma = self.spdmd.gamma
+            answer.Nz = self.spdmd.Nz
+            answer.Jsp = self.spdmd.Ja
+            answer.Jpol = self.spdmd.PolJa
+            answer.Ploss = self.spdmd.PolLoss
+            answer.xsp = self.spdmd.amplit
+            answer.xpol = self.spdmd.PolAmplit
+        dt = 1 if self.dt is None else self.dt
+        if self.omega is None:  # dmd_dynamics not called
+            lamb = np.log(self.eigval) / dt
+            omega, beta = lamb.imag, lamb.real
+        else:
+            omega, beta = self.omega, self.beta
+        save_result(filename, self.U, self.eigvec, self.eigval, self.amplit,
+                    dt=dt, block=block, sparse=answer, omega=omega,
+                    beta=beta, **extra)
+
     @property
     def dmd_residual(self):
         V1 = self.modes @ self.dynamics
         resid = V1 - self.snapshots[:, :-1]
         return (np.linalg.norm(resid))
 
-    def dmd_standard(self, fluc=None):
+    def dmd_standard(self, fluc=None, svd=None, cache=None):
         """
         U D VH = V1
         U: the left singular vectors
         D: the sigular values, it is a 1d array in python
         V: the right singular vectors, VH = V.T.conj()
+        svd: truncated SVD (e.g. low_rank.SVDBackend), full SVD if None
+        cache: folder of the reductions kept on disk, see
+               sparse_dmd.dmd.cached_reduction
         """
         tn = self.tn
         if fluc == True:
             self.snapshots = self.snapshots - np.transpose(
                 np.tile(np.mean(self.snapshots, axis=1), (tn, 1)))
-        snapshots = self.snapshots
-        V1 = np.float64(snapshots[:, :-1])
-        V2 = np.float64(snapshots[:, 1:])
-        #U, D, VH = sp.linalg.svd(V1, full_matrices=False, lapack_driver='gesvd')  # use min(m, n)
-        U, D, VH = np.linalg.svd(V1, full_matrices=False)  # use min(m, n)
-        V = VH.conj().T
-        DM = np.diag(D)
-        rank = np.linalg.matrix_rank(DM)
-        if np.size(D) != rank:
-            warnings.warn("There are " + str(np.size(D) - rank) +
-                          " zero-value singular value!!!")
-            V = V[:, :rank]
-            D = D[:rank]
-            U = U[:, :rank]
-        S = U.T.conj() @ V2 @ V * np.reciprocal(D)
+        # the reduction of the shared DMD engine (zero singular values
+        # truncated)
+        reduction = cached_reduction(self.snapshots, svd, cache)
+        if svd is not None:
+            self.svd_info = svd.info
+        U = reduction.U
+        D = np.diag(reduction.S)
+        V = reduction.V
+        S = reduction.UstarX1 @ V * np.reciprocal(D)
         self.eigval, self.eigvec = np.linalg.eig(S)
-        self.modes = U @ self.eigvec  # projected dynamic modes
+        self._modes = None  # projected dynamic modes, U @ eigvec
 
         self.U = U
         self.D = D
         self.V = V
         self.VH = V.T.conj()
-        self.DM = DM
+        self.DM = reduction.S
         return (self.eigval, self.modes)
 
     # convex optimization problem
     def dmd_amplitude(self, opt=None):
+        """
+        opt: False - fit the first snapshot
+             'spdmd' - closed form, P, q, s are kept for compute_spdmd
+             'vand' - closed form, same result as the default least
+             squares, O(r^2 n)
+             None - least squares of the stacked Vandermonde system
+        """
         snapshots = self.snapshots
         tn = self.tn
         if opt == False:
@@ -106,6 +190,9 @@ class DMD(object):
                 self.modes, snapshots.T[0], rcond=-1)[0]
         elif opt == 'spdmd':
             self.amplit = self.spdmd_amplitude()
+        elif opt == 'vand':
+            G = self.D[:, None] * self.VH  # U* V1
+            self.amplit = vand_amplitude(self.eigvec, self.eigval, G)[0]
         else:  # min(var-phi@coeff@Vand)-->min(UT@V1-UT@U@eigvec@coeff@Vand)
             A = self.eigvec @ np.diag(self.eigval**0)
             for i in range(tn - 2):
@@ -123,6 +210,7 @@ class DMD(object):
         if (np.size(np.unique(period)) != 1):
             sys.exit("Time period is not equal!!!")
         t_samp = timepoints[1] - timepoints[0]
+        self.dt = t_samp
         # # growth rate(real part), frequency(imaginary part)
         lamb = np.log(
             self.eigval) / t_samp
@@ -148,16 +236,10 @@ class DMD(object):
         # the matrix of snapshots V1 and the linear combination of
         # the dmd modes
         # Can be formulated : min ||sigma Vh - eigvec diag(amplit) Vand||_F^2
-        p1 = (self.eigvec.T.conj() @ self.eigvec)
-        p2 = (Vand @ Vand.T.conj()).conj()
-        P = p1 * p2
-        q = np.diag(Vand @ self.V @ self.DM.T.conj() @ self.eigvec).conj()
-        ss = (np.linalg.norm(self.D))**2
-        # ss = np.trace(self.DM.T.conj() @ self.DM)
         # Opitmal vector of amplitudes (amplit)
         # amplit = P^-1 q (P amplit = q)
-        amplit = sp.linalg.cho_solve(sp.linalg.cho_factor(P), q)
-        # amplit = sp.linalg.solve(P, q)
+        amplit, P, q, ss = vand_amplitude(
+            self.eigvec, self.eigval, self.D[:, None] * self.VH)
         self.q = q
         self.P = P
         self.s = ss
@@ -168,7 +250,11 @@ class DMD(object):
     # Ref: Jovanovic H. T., et. al.-2014
     # Sparsity-promoting dynamic mode decomposition
     def compute_spdmd(self, maxiter=None, gamma=None, rho=None,
-              eps_abs=None, eps_rel=None):
+              eps_abs=None, eps_rel=None, processes=1, warm=False):
+        """
+        processes: NO of workers of the gamma sweep (sparse_dmd.gamma_sweep)
+        warm: start every gamma from the solution of the previous one
+        """
         if eps_abs is not None:
             self.eps_abs = eps_abs
         if eps_rel is not None:
@@ -183,29 +269,35 @@ class DMD(object):
         self.r = len(self.q)
         self.ng = len(self.gamma)
         self.Prho = self.P + (self.rho / 2.0) * np.identity(self.r)
-        answer = SparseAnswer(self.r, self.ng)
-        answer.gamma = self.gamma
-        widgets = ['SPDMD iteration on gamma:', Percentage(), ' ',
-                    Bar(marker='>', left='[', right=']')]
-#        pbar = ProgressBar(widgets=widgets, maxval=np.size(self.gamma))
-#        pbar.start()
-        for i, gammaval in enumerate(self.gamma):
-            # find a sparisty structure which achieves a tradeoff between
-            # the number of the modes and the approximation error
-            ret = self.optimize_gamma(gammaval)
-            answer.amplit[:, i] = ret['xsp']
-            answer.PolAmplit[:, i] = ret['xpol']
-            answer.Nz[i] = ret['Nz']
-            answer.Ja[i] = ret['Jsp']
-            answer.PolJa[i] = ret['Jpol']
-            answer.PolLoss[i] = ret['Ploss']
-#            pbar.update(i)
-#        pbar.finish()
-        answer.nonzero[:] = answer.amplit != 0
-        self.spdmd = answer
+        # find a sparisty structure which achieves a tradeoff between
+        # the number of the modes and the approximation error
+        rets = gamma_sweep(self.P, self.q, self.s, self.gamma, self.rho,
+                           self.maxiter, self.eps_abs, self.eps_rel,
+                           processes=processes, warm=warm,
+                           check=self.check, kernel=self.kernel)
+        self.spdmd = SparseAnswer.from_results(rets, self.r, self.gamma)
 
         return self.spdmd
 
+    def search_spdmd(self, nmodes=None, ploss=None, **kwargs):
+        """
+        gamma for nmodes nonzero amplitudes (or the sparsest amplitudes
+        with performance loss <= ploss), by continuation and bisection
+        of gamma (sparse_dmd.gamma_search) instead of a fixed gamma array
+        Return: index of the answer in self.spdmd, for spdmd_reconstruct
+        """
+        self.r = len(self.q)
+        self.Prho = self.P + (self.rho / 2.0) * np.identity(self.r)
+        rets, ind = gamma_search(self.P, self.q, self.s, nmodes=nmodes,
+                                 ploss=ploss, rho=self.rho,
+                                 maxiter=self.maxiter, eps_abs=self.eps_abs,
+                                 eps_rel=self.eps_rel, check=self.check,
+                                 kernel=self.kernel, **kwargs)
+        self.gamma = np.array([ret['gamma'] for ret in rets])
+        self.ng = len(self.gamma)
+        self.spdmd = SparseAnswer.from_results(rets, self.r, self.gamma)
+        return ind
+
     def optimize_gamma(self, gamma):
         """
         minimize J(a), subject to E^T a = 0
@@ -245,73 +337,14 @@ class DMD(object):
         }
 
     def admm(self, z, y, gamma, opt=None):
-        """Alternating direction method of multipliers. 
-        Sec. III A, Appendix B"""
-        # There are two complexity sources:
-        # 1. the matrix solver. I can't see how this can get any
-        #    faster (tested with Intel MKL on Canopy).
-        # 2. the test for convergence. This is the dominant source
-        #    now (~3x the time of the solver)
-
-        # Further avenues for optimization:
-        # - write in cython and import as compiled module, e.g.
-        #   http://docs.cython.org/src/userguide/numpy_tutorial.html
-        # - use two cores, with one core performing the admm and
-        #   the other watching for convergence.
-        k = (gamma / self.rho)
-        if opt is None:
-            # precompute cholesky decomposition
-            C = sp.linalg.cholesky(self.Prho, lower=False)
-            # link directly to LAPACK fortran solver for positive
-            # definite symmetric system with precomputed cholesky decomp:
-            potrs, = sp.linalg.get_lapack_funcs(('potrs', ), arrays=(C, self.q))
-            # simple norm of a 1d vector, called directly from BLAS
-            norm, = sp.linalg.get_blas_funcs(('nrm2', ), arrays=(self.q, ))
-        # %% square root outside of the loop
-        root_r = np.sqrt(self.r)
-        for ADMMstep in range(self.maxiter):
-            # %% x-minimization step (alpha minimisation)
-            u = z - (1. / self.rho) * y
-            qs = self.q + (self.rho / 2.) * u
-            # Solve Prho x = qs (x = Prho^-1 qs), using fact that Prho
-            # is hermitian and positive definite and
-            # assuming Prho is well behaved (no inf or nan).
-            if opt is not None:
-                xnew = sp.linalg.inv(self.Prho) @ qs
-            else:
-                xnew = potrs(C, qs, lower=False, overwrite_b=False)[0]
-            # %%z-minimization step (beta minimisation)
-            v = xnew + (1 / self.rho) * y
-            # Soft-thresholding of v
-            # zero for |v| < k
-            # v - k for v > k
-            # v + k for v < -k
-            abs_v = np.abs(v)
-            znew = ((1 - k / abs_v) * v) * (abs_v > k)
-
-            # %% Lagrange multiplier update step
-            y = y + self.rho * (xnew - znew)
-            # %% Test convergence of admm
-            if opt is not None:
-                res_prim = np.linalg.norm(xnew - znew)  # Primal residuals
-                res_dual = self.rho * np.linalg.norm(znew - z)  # dual residuals
-                # Stopping criteria
-                eps_prim = root_r * self.eps_abs \
-                           + self.eps_rel * max(np.linalg.norm(xnew),
-                                                np.linalg.norm(znew))
-                eps_dual = root_r * self.eps_abs + self.eps_rel \
-                           * np.linalg.norm(y)
-            else:
-                res_prim = norm(xnew - znew)
-                res_dual = self.rho * norm(znew - z)
-                eps_prim = root_r * self.eps_abs \
-                           + self.eps_rel * max(norm(xnew), norm(znew))
-                eps_dual = root_r * self.eps_abs + self.eps_rel * norm(y)
-            if (res_prim < eps_prim) & (res_dual < eps_dual):
-                return z
-            else:
-                z = znew
-        return z
+        """Alternating direction method of multipliers.
+        Sec. III A, Appendix B, by the engine shared with sparse_dmd
+        (sparse_dmd.admm.admm_solve), opt is not used any more"""
+        # precompute cholesky decomposition
+        C = sp.linalg.cholesky(self.Prho, lower=False)
+        return admm_solve(C, self.q, gamma, self.rho, z, y, self.maxiter,
+                          self.eps_abs, self.eps_rel, self.check,
+                          self.kernel)[0]
 
     def KKT_solve(self, z):
         """
@@ -345,31 +378,45 @@ class DMD(object):
 
     @staticmethod
     def reconstruct(modes, amplitude, Vand):
+        # the whole (space x time) array, see reconstruction for frames
         reconstruct = modes @ np.diag(amplitude) @ Vand
         # dynamics = amplitude @ Vand
         return (reconstruct)
 
+    def reconstruction(self, amplit=None, ind=None, real=True):
+        """modes diag(amplit) Vand of the modes ind (default all) as a
+        sparse_dmd.Reconstruction, frames or tiles computed on demand
+        """
+        if amplit is None:
+            amplit = self.amplit
+        if ind is None:
+            ind = np.arange(np.size(self.eigval))
+        return Reconstruction((self.U, self.eigvec[:, ind]),
+                              np.asarray(amplit)[ind], self.eigval[ind],
+                              self.tn - 1, real=real)
+
     def spdmd_reconstruct(self, ind):
         """Reconstruction of the snapshots based on the selected 
         number of modes, given the index of gamma array
+
+        Return: sparse_dmd.Reconstruction of the nonzero modes, frames
+        or tiles computed on demand; np.asarray gives the whole complex
+        array modes @ diag(PolAmplit[:, ind]) @ Vand
         """
-        # the reconstructed data via spdmd
-        Damplit = np.diag(self.spdmd.PolAmplit[:, ind])
-        sp_reconst = self.modes @ Damplit @ self.Vand
         # the selected modes and corresponding parameters
         # the index of non zero amplitudes
         nonzero = self.spdmd.nonzero[:, ind]
         self.spdmd_nmodes = self.spdmd.Nz[ind]
-        self.spdmd_modes = self.modes[:, nonzero]
+        self._spdmd_nonzero = nonzero
         self.spdmd_amplit = self.spdmd.PolAmplit[nonzero, ind]
         self.spdmd_Vand = self.Vand[nonzero, :]
         self.spdmd_loss = self.spdmd.PolLoss[ind]
-        # actually, self.spdmd_reconstruct == sp_reconst
-        # zero value amplitudes almost still remain zero after polished
-        self.spdmd_reconstruct = \
-            self.spdmd_modes @ np.diag(self.spdmd_amplit) @ self.spdmd_Vand
-
-        return (sp_reconst)
+        # zero value amplitudes almost still remain zero after polished,
+        # only the nonzero modes are used
+        self.spdmd_reconstruction = Reconstruction(
+            (self.U, self.eigvec[:, nonzero]), self.spdmd_amplit,
+            self.eigval[nonzero], self.tn - 1, real=False)
+        return self.spdmd_reconstruction
 
     # Exact Dynamic Mode Decompostion
     # Ref: Jonathan H. T., et. al.-On dynamic mode decomposition:
@@ -417,15 +464,29 @@ class SparseAnswer(object):
         # number of non-zero amplitudes
         self.Nz = np.zeros(ng)
         # square of frobenius norm (before polishing)
-        self.Ja = np.zeros(ng, dtype=np.complex)
+        self.Ja = np.zeros(ng, dtype=complex)
         # square of frobenius norm (after polishing)
-        self.PolJa = np.zeros(ng, dtype=np.complex)
+        self.PolJa = np.zeros(ng, dtype=complex)
         # optimal performance loss (after polishing)
-        self.PolLoss = np.zeros(ng, dtype=np.complex)
+        self.PolLoss = np.zeros(ng, dtype=complex)
         # vector of amplitudes (before polishing)
-        self.amplit = np.zeros((n, ng), dtype=np.complex)
+        self.amplit = np.zeros((n, ng), dtype=complex)
         # vector of amplitudes (after polishing)
-        self.PolAmplit = np.zeros((n, ng), dtype=np.complex)
+        self.PolAmplit = np.zeros((n, ng), dtype=complex)
+
+    @classmethod
+    def from_results(cls, rets, n, gamma):
+        """answer from the results of sparse_dmd optimize_gamma"""
+        answer = cls(n, len(rets))
+        answer.gamma = gamma
+        for i, ret in enumerate(rets):
+            answer.amplit[:, i] = ret['xsp']
+            answer.PolAmplit[:, i] = ret['xpol']
+            answer.Nz[i] = ret['Nz']
+            answer.Ja[i] = ret['Jsp']
+            answer.PolJa[i] = ret['Jpol']
+            answer.PolLoss[i] = ret['Ploss']
+        return answer
 
     @property
     def nonzero(self):
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:05:27 2026
+    This code for averaging flow field over snapshots (and spanwise)
+    snapshot by snapshot, only running sums over the grid are kept
+    1. StatAccumulator (coords, VarList, keys, pairs): add snapshots one at
+    a time, mean/fluctuation variance/Reynolds stress at the end
+    2. accumulate (files, ...): average a series of .h5 snapshots, in
+    parallel if required
+@author: weibo
+"""
+
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+from grid_index import GridIndex
+
+
+def stress_name(var1, var2):
+    # name of second moments like <u`v`>
+    return '<' + var1 + '`' + var2 + '`>'
+
+
+class StatAccumulator(object):
+    """Running mean and second moments of variables on a grid
+
+    Inputs:
+        coords  - DataFrame with coordinates of a snapshot
+        VarList - variables to be averaged
+        keys    - coordinates of the averaged field, ['x', 'y'] for
+                  spanwise- and time-average, ['x', 'y', 'z'] for
+                  time-average
+        pairs   - pairs of variables for second moments, e.g.
+                  [('u', 'u'), ('u', 'v')], default variance of VarList
+
+    Points with the same keys (and all snapshots) are the samples of one
+    grid point. The moments of every new snapshot are merged to the running
+    values (Welford/Chan), so only O(grid) memory is used.
+    """
+    def __init__(self, coords, VarList, keys=['x', 'y'], pairs=None):
+        self.keys = list(keys)
+        self.VarList = list(VarList)
+        if pairs is None:
+            pairs = [(var, var) for var in self.VarList]
+        self.pairs = [tuple(pair) for pair in pairs]
+        self._pair_id = [(self.VarList.index(a), self.VarList.index(b))
+                         for a, b in self.pairs]
+        index = GridIndex(coords, cols=self.keys)
+        self.inverse, keys = index.group(self.keys)
+        self.grid = np.stack([index.axes[i][keys[:, i]]
+                              for i in range(len(self.keys))], axis=1)
+        self.num_grid = np.shape(self.grid)[0]
+        # NO of points averaged to every grid point in one snapshot
+        self.size = np.bincount(self.inverse, minlength=self.num_grid)
+        self.count = 0
+        self._mean = np.zeros((self.num_grid, len(self.VarList)))
+        self._comoment = np.zeros((self.num_grid, len(self.pairs)))
+
+    def _moments(self, val):
+        # mean and co-moments of one snapshot on the grid
+        mean = np.empty((self.num_grid, len(self.VarList)))
+        for i in range(len(self.VarList)):
+            mean[:, i] = np.bincount(self.inverse, weights=val[:, i],
+                                     minlength=self.num_grid) / self.size
+        fluc = val - mean[self.inverse]
+        comoment = np.empty((self.num_grid, len(self.pairs)))
+        for k, (i, j) in enumerate(self._pair_id):
+            comoment[:, k] = np.bincount(self.inverse,
+                                         weights=fluc[:, i] * fluc[:, j],
+                                         minlength=self.num_grid)
+        return mean, comoment
+
+    def _combine(self, count, mean, comoment):
+        # merge the moments of count snapshots to the running values
+        n1 = (self.count * self.size)[:, None]
+        n2 = (count * self.size)[:, None]
+        ntot = n1 + n2
+        delta = mean - self._mean
+        self._mean += delta * n2 / ntot
+        for k, (i, j) in enumerate(self._pair_id):
+            self._comoment[:, k] += comoment[:, k] \
+                + delta[:, i] * delta[:, j] * (n1 * n2 / ntot)[:, 0]
+        self.count += count
+
+    def add(self, df):
+        """add a snapshot (DataFrame with the same rows as coords)"""
+        val = np.asarray(df[self.VarList].values, dtype=np.float64)
+        if np.shape(val)[0] != np.size(self.inverse):
+            raise ValueError('ERROR: the snapshot does not match the grid')
+        mean, comoment = self._moments(val)
+        self._combine(1, mean, comoment)
+
+    def merge(self, other):
+        """merge the statistics of another accumulator (e.g. by another
+        worker) with the same grid and variables"""
+        if other.count == 0:
+            return self
+        if (other.VarList != self.VarList or other.pairs != self.pairs
+                or np.shape(other.grid) != np.shape(self.grid)
+                or not np.allclose(other.grid, self.grid, rtol=0.0,
+                                   atol=1e-6)):
+            raise ValueError('ERROR: accumulators do not match')
+        self._combine(other.count, other._mean, other._comoment)
+        return self
+
+    def mean(self):
+        df = pd.DataFrame(data=self.grid, columns=self.keys)
+        for i, var in enumerate(self.VarList):
+            df[var] = self._mean[:, i]
+        return df
+
+    def stress(self):
+        """variance of fluctuations / Reynolds stresses, e.g. <u`v`>"""
+        df = pd.DataFrame(data=self.grid, columns=self.keys)
+        samples = self.count * self.size
+        for k, (a, b) in enumerate(self.pairs):
+            df[stress_name(a, b)] = self._comoment[:, k] / samples
+        return df
+
+    def result(self):
+        """mean and second moments in one DataFrame"""
+        df = self.mean()
+        stress = self.stress()
+        for col in stress.columns[len(self.keys):]:
+            df[col] = stress[col]
+        return df
+
+
+def _accumulate_files(task):
+    files, VarList, keys, pairs = task
+    acc = None
+    for file in files:
+        df = pd.read_hdf(file)
+        if acc is None:
+            acc = StatAccumulator(df, VarList, keys=keys, pairs=pairs)
+        acc.add(df)
+    return acc
+
+
+def accumulate(files, VarList, keys=['x', 'y'], pairs=None, processes=1):
+    """average a series of snapshots (.h5 files of the same grid), every
+    worker reads a part of the series and the results are merged"""
+    num = max(1, min(processes, np.size(files)))
+    parts = np.array_split(np.arange(np.size(files)), num)
+    tasks = [([files[i] for i in part], VarList, keys, pairs)
+             for part in parts]
+    if num == 1:
+        results = [_accumulate_files(tasks[0])]
+    else:
+        with Pool(processes=num) as pool:
+            results = pool.map(_accumulate_files, tasks)
+    acc = results[0]
+    for other in results[1:]:
+        acc.merge(other)
+    return acc
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:12:40 2026
+    This code for indexing points by integer grid keys instead of floating
+    coordinates. Coordinates closer than tol are the same grid line, so
+    the round-off between snapshots does not matter
+    1. GridIndex (df, cols, tol): coordinates -> (i, j, k)
+    2. rows (xyz): rows of a point, a line or a plane
+    3. mean (df, keys): replacement for df.groupby(keys).mean()
+    4. repeat: the rows are the indexed points repeated for every snapshot
+    (LazyFrame.from_store), row r is point r % num_points
+@author: weibo
+"""
+
+import numpy as np
+import pandas as pd
+from lazy_frame import LazyFrame
+
+
+def grid_lines(val, tol=1e-6):
+    """distinct coordinate lines of val and the key of every value"""
+    val = np.asarray(val, dtype=np.float64)
+    order = np.argsort(val, kind='stable')
+    sort_val = val[order]
+    start = np.r_[True, np.diff(sort_val) > tol]
+    key = np.empty(np.size(val), dtype=np.int64)
+    key[order] = np.cumsum(start) - 1
+    return sort_val[start], key
+
+
+class GridIndex(object):
+    """Integer keys (i, j, k) of every row of a DataFrame
+
+    Inputs:
+        df   - DataFrame (or dict) with coordinates
+        cols - names of the coordinates, e.g. ['x', 'y', 'z']
+        tol  - coordinates differing less than tol are the same
+        repeat - NO of times the points of df are repeated in the rows
+
+    Attributes:
+        axes  - coordinate lines (sorted) of every direction
+        keys  - integer keys of points, shape (points, len(cols))
+        shape - NO of coordinate lines in every direction
+    """
+    def __init__(self, df, cols=['x', 'y', 'z'], tol=1e-6, repeat=1):
+        self.cols = list(cols)
+        self.tol = tol
+        self.repeat = int(repeat)
+        self.axes = []
+        keys = []
+        for col in self.cols:
+            line, key = grid_lines(df[col], tol=tol)
+            self.axes.append(line)
+            keys.append(key)
+        self.keys = np.stack(keys, axis=1)
+        self.shape = tuple(np.size(line) for line in self.axes)
+        self.flat = self.flat_key(self.keys)
+        # rows sorted by flat key, rows of a key are order[ptr[k]:ptr[k+1]]
+        self._order = np.argsort(self.flat, kind='stable')
+        if np.prod(self.shape, dtype=np.float64) <= 4 * np.size(self.flat):
+            count = np.bincount(self.flat, minlength=int(np.prod(self.shape)))
+            self._ptr = np.r_[0, np.cumsum(count)]
+        else:  # too sparse for a dense table
+            self._ptr = None
+            self._sort_flat = self.flat[self._order]
+
+    @classmethod
+    def of_frame(cls, df, cols=['x', 'y', 'z'], tol=1e-6):
+        """index of a DataFrame or LazyFrame, the points of a frame of
+        repeated snapshots are indexed once"""
+        if isinstance(df, LazyFrame) and df.num_points is not None:
+            npts = df.num_points
+            points = {col: df.column(col)[:npts] for col in cols}
+            return cls(points, cols=cols, tol=tol, repeat=len(df) // npts)
+        return cls(df, cols=cols, tol=tol)
+
+    @property
+    def num_points(self):
+        return np.shape(self.keys)[0]
+
+    @property
+    def num_rows(self):
+        return self.num_points * self.repeat
+
+    def _repeat(self, points):
+        # rows of the points in every snapshot, in the order of rows
+        if self.repeat == 1:
+            return points
+        step = np.arange(self.repeat, dtype=np.int64) * self.num_points
+        return (step[:, None] + points[None, :]).ravel()
+
+    @property
+    def structured(self):
+        """every grid point appears exactly once"""
+        return self.num_rows == np.prod(self.shape) and \
+            np.all(np.diff(self.flat[self._order]) == 1)
+
+    def flat_key(self, keys):
+        return np.ravel_multi_index(tuple(np.asarray(keys).T), self.shape,
+                                    order='F')
+
+    def axis(self, col):
+        return self.axes[self.cols.index(col)]
+
+    def index(self, val, col):
+        """keys of coordinates val along col, -1 if not on the grid"""
+        line = self.axis(col)
+        val = np.atleast_1d(np.asarray(val, dtype=np.float64))
+        pos = np.clip(np.searchsorted(line, val - self.tol), 0,
+                      np.size(line) - 1)
+        pos[np.abs(line[pos] - val) > self.tol] = -1
+        return pos
+
+    def _range(self, flat):
+        if self._ptr is not None:
+            return self._ptr[flat], self._ptr[flat + 1]
+        return (np.searchsorted(self._sort_flat, flat, side='left'),
+                np.searchsorted(self._sort_flat, flat, side='right'))
+
+    def point_rows(self, points):
+        """the first row of every point, points with shape (m, len(cols)),
+        -1 for points not found"""
+        points = np.atleast_2d(points)
+        keys = np.stack([self.index(points[:, i], col)
+                         for i, col in enumerate(self.cols)], axis=1)
+        rows = np.full(np.shape(points)[0], -1, dtype=np.int64)
+        found = np.all(keys >= 0, axis=1)
+        start, stop = self._range(self.flat_key(keys[found]))
+        has = stop > start
+        ind = np.flatnonzero(found)[has]
+        rows[ind] = self._order[start[has]]
+        return rows
+
+    def rows(self, xyz):
+        """rows of a point (all values given), or a line/plane (None for
+        free directions), in the original order of rows"""
+        xyz = list(xyz) + [None] * (len(self.cols) - len(xyz))
+        key = []
+        for val, col in zip(xyz, self.cols):
+            if val is None:
+                key.append(None)
+                continue
+            ind = self.index(val, col)[0]
+            if ind < 0:
+                return np.array([], dtype=np.int64)
+            key.append(ind)
+        if all(k is not None for k in key):
+            start, stop = self._range(self.flat_key([key]))
+            return self._repeat(np.sort(self._order[start[0]:stop[0]]))
+        mask = np.ones(self.num_points, dtype=bool)
+        for i, k in enumerate(key):
+            if k is not None:
+                mask &= self.keys[:, i] == k
+        return self._repeat(np.flatnonzero(mask))
+
+    def group(self, keys):
+        """integer id of every point for the grid of the given directions,
+        and the keys of every group"""
+        dims = [self.cols.index(col) for col in keys]
+        shape = tuple(self.shape[i] for i in dims)
+        # sorted by the first direction, like groupby
+        flat = np.ravel_multi_index(tuple(self.keys[:, dims].T), shape)
+        uniq, inverse = np.unique(flat, return_inverse=True)
+        return inverse.ravel(), np.stack(np.unravel_index(uniq, shape),
+                                         axis=1)
+
+    def mean(self, df, keys=None, chunk=2**22):
+        """same as df.groupby(keys).mean().reset_index() for the rows of
+        this index, but grouped by integer keys. Columns are reduced one by
+        one in blocks of chunk rows, the frame is not copied and the columns
+        of a LazyFrame are read block by block"""
+        if keys is None:
+            keys = self.cols
+        inverse, _ = self.group(keys)
+        size = np.bincount(inverse) * self.repeat
+        others = [col for col in df.columns if col not in keys]
+        cols = list(keys) + others
+        data = np.zeros((np.size(size), len(cols)))
+        for i, col in enumerate(cols):
+            if isinstance(df, LazyFrame):
+                val = df.column(col)
+            else:
+                val = df[col].values
+            for j in range(0, self.num_rows, chunk):
+                rows = np.arange(j, min(j + chunk, self.num_rows))
+                data[:, i] += np.bincount(inverse[rows % self.num_points],
+                                          weights=val[j:j+chunk],
+                                          minlength=np.size(size))
+            data[:, i] /= size
+        return pd.DataFrame(data=data, columns=cols)
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:26:51 2026
+    This code for a lazy data field used by LineField/PlanarField/TriField
+    instead of a DataFrame. A column is loaded (or memory-mapped) when it
+    is accessed the first time
+    1. save_columns (df, path): save every column as .npy
+    2. LazyFrame.from_columns (path): memory-mapped columns
+    3. LazyFrame.from_store (filename, steps): snapshots of a snapshot store,
+    rows are read by blocks of snapshots when they are selected, the
+    coordinates are found by the row index (row % points)
+@author: weibo
+"""
+
+import os
+import json
+import warnings
+import numpy as np
+import pandas as pd
+
+
+def save_columns(df, path):
+    """save every column of df as .npy in path, to be memory-mapped"""
+    if not os.path.exists(path):
+        os.mkdir(path)
+    names = list(df.columns)
+    for i, col in enumerate(names):
+        np.save(os.path.join(path, 'c%d.npy' % i),
+                np.ascontiguousarray(df[col].values))
+    # column names like "<u`u`>" are not used as file names
+    with open(os.path.join(path, 'columns.json'), 'w') as f:
+        json.dump(names, f)
+
+
+def _row_index(rows, nrows):
+    # integer index of rows (slice, mask, list or int)
+    if isinstance(rows, slice):
+        return np.arange(*rows.indices(nrows))
+    rows = np.asarray(rows)
+    if rows.dtype == bool:
+        return np.flatnonzero(rows)
+    return np.where(rows < 0, rows + nrows, rows)
+
+
+class CoordColumn(object):
+    """coordinate of the points repeated for every snapshot, row r is
+    point r % num_points"""
+    def __init__(self, values, num_steps):
+        self.values = np.asarray(values)
+        self.shape = (np.size(self.values) * num_steps,)
+        self.dtype = self.values.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        ind = _row_index(rows, self.shape[0])
+        return self.values[ind % np.size(self.values)]
+
+    def __array__(self, dtype=None, copy=None):
+        val = self[slice(None)]
+        return val if dtype is None else val.astype(dtype)
+
+
+class StoreColumn(object):
+    """variable of a SnapshotStore as one column (snapshots one after
+    another), row r is snapshot r // num_points at point r % num_points.
+    Selected rows are read by blocks of snapshots, only the points needed
+    """
+    def __init__(self, store, var, steps, block=None):
+        self.store = store
+        self.var = var
+        self.steps = range(*steps.indices(store.num_snapshots))
+        self.num_points = store.num_points
+        if block is None:
+            block = store.chunkshape[0]
+        self.block = int(block)
+        self.shape = (len(self.steps) * self.num_points,)
+        self.dtype = np.dtype(np.float64)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _steps(self, i1, i2):
+        # snapshots i1...i2-1 of the column as a slice of the store
+        return slice(self.steps[i1], self.steps[i2 - 1] + 1, self.steps.step)
+
+    def __getitem__(self, rows):
+        scalar = np.ndim(rows) == 0 and not isinstance(rows, slice)
+        ind = np.atleast_1d(_row_index(rows, self.shape[0]))
+        step = ind // self.num_points
+        point = ind % self.num_points
+        out = np.empty(np.size(ind), dtype=self.dtype)
+        blk = step // self.block
+        for b in np.unique(blk):
+            sel = np.flatnonzero(blk == b)
+            i1 = b * self.block
+            i2 = min(i1 + self.block, len(self.steps))
+            pts, inv = np.unique(point[sel], return_inverse=True)
+            data = self.store.read(self.var, points=pts,
+                                   steps=self._steps(i1, i2))
+            out[sel] = data[step[sel] - i1, inv.ravel()]
+        return out[0] if scalar else out
+
+    def __array__(self, dtype=None, copy=None):
+        # the whole column, filled block by block
+        out = np.empty(self.shape, dtype=self.dtype)
+        npts = self.num_points
+        for i1 in range(0, len(self.steps), self.block):
+            i2 = min(i1 + self.block, len(self.steps))
+            out[i1 * npts:i2 * npts] = self.store.read(
+                self.var, steps=self._steps(i1, i2)).ravel()
+        return out if dtype is None else out.astype(dtype)
+
+
+class _ILoc(object):
+    def __init__(self, frame):
+        self._frame = frame
+
+    def __getitem__(self, rows):
+        return self._frame.take(rows)
+
+
+class LazyFrame(object):
+    """Columns of a data field loaded on demand
+
+    Inputs:
+        loaders - dict, column name -> function returning the 1d array
+        nrows   - NO of rows
+
+    Only the part of DataFrame used by the field classes is supported
+    (df[col], df[cols], df[col] = val, columns, shape, iloc); for the other
+    attributes the whole DataFrame is built with a warning.
+    """
+    def __init__(self, loaders, nrows):
+        self._loaders = dict(loaders)
+        self._names = list(loaders.keys())
+        self._cache = {}
+        self._nrows = int(nrows)
+        # rows of snapshots of the same points (from_store), else None
+        self.num_points = None
+
+    @classmethod
+    def from_columns(cls, path):
+        with open(os.path.join(path, 'columns.json'), 'r') as f:
+            names = json.load(f)
+        loaders = {}
+        for i, col in enumerate(names):
+            file = os.path.join(path, 'c%d.npy' % i)
+            loaders[col] = (lambda file=file: np.load(file, mmap_mode='r'))
+        nrows = np.shape(np.load(os.path.join(path, 'c0.npy'),
+                                 mmap_mode='r'))[0]
+        return cls(loaders, nrows)
+
+    @classmethod
+    def from_store(cls, filename, steps=None, VarList=None):
+        """snapshots of a SnapshotStore one after another (like pd.concat of
+        .h5 files), coordinates are repeated for every snapshot. Nothing
+        is read until a column (whole) or rows (iloc/take) are used"""
+        from snapshot_store import SnapshotStore
+        store = SnapshotStore(filename)
+        if steps is None:
+            steps = slice(0, store.num_snapshots)
+        if VarList is None:
+            VarList = store.variables
+        nt = len(range(*steps.indices(store.num_snapshots)))
+        xyz = []
+
+        def coord(i):
+            def load():
+                if len(xyz) == 0:
+                    xyz.append(store.coordinates().values)
+                return CoordColumn(xyz[0][:, i], nt)
+            return load
+
+        def var(name):
+            return lambda: StoreColumn(store, name, steps)
+        loaders = {}
+        for i, col in enumerate(store.coords):
+            loaders[col] = coord(i)
+        for name in VarList:
+            loaders[name] = var(name)
+        frame = cls(loaders, store.num_points * nt)
+        frame.num_points = store.num_points
+        return frame
+
+    @property
+    def columns(self):
+        return pd.Index(self._names)
+
+    @property
+    def shape(self):
+        return (self._nrows, len(self._names))
+
+    @property
+    def loaded(self):
+        """columns already in memory (or mapped)"""
+        return list(self._cache.keys())
+
+    def __len__(self):
+        return self._nrows
+
+    def __contains__(self, col):
+        return col in self._names
+
+    def column(self, col):
+        """the column as an array, or a lazy column (StoreColumn) which
+        reads only the rows sliced"""
+        if col not in self._cache:
+            if col not in self._loaders:
+                raise KeyError(col)
+            self._cache[col] = self._loaders[col]()
+        return self._cache[col]
+
+    def array(self, col):
+        """the whole column as an array (a lazy column is read once)"""
+        val = self.column(col)
+        if not isinstance(val, np.ndarray):
+            val = np.asarray(val)
+            self._cache[col] = val
+        return val
+
+    def __getitem__(self, col):
+        if isinstance(col, (list, tuple, pd.Index)):
+            return pd.DataFrame({c: self.array(c) for c in col},
+                                columns=list(col), copy=False)
+        return pd.Series(self.array(col), name=col, copy=False)
+
+    def __setitem__(self, col, val):
+        val = np.asarray(val)
+        if np.ndim(val) == 0:
+            val = np.full(self._nrows, val)
+        if np.size(val) != self._nrows:
+            raise ValueError('ERROR: length of ' + str(col)
+                             + ' does not match')
+        if col not in self._names:
+            self._names.append(col)
+        self._cache[col] = val
+
+    def take(self, rows):
+        """DataFrame of the given rows, only these rows are copied"""
+        return pd.DataFrame({c: self.column(c)[rows] for c in self._names},
+                            columns=self._names)
+
+    @property
+    def iloc(self):
+        return _ILoc(self)
+
+    def to_frame(self, cols=None):
+        if cols is None:
+            cols = self._names
+        return self[list(cols)]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        warnings.warn('LazyFrame.' + name + ' loads the whole data field',
+                      UserWarning)
+        return getattr(self.to_frame(), name)
@@ -8,6 +8,7 @@ Created on Mon Apr 10 21:24:50 2019
 import pandas as pd
 import sys
 import numpy as np
+from lazy_frame import LazyFrame, save_columns
 
 
 class LineField(object):
@@ -22,9 +23,20 @@ class LineField(object):
 
     @ProbeSignal.setter
     def ProbeSignal(self, frame):
-        assert isinstance(frame, pd.DataFrame)
+        assert isinstance(frame, (pd.DataFrame, LazyFrame))
         self._data_field = frame
 
+    # lazy data field, columns are loaded when used the first time
+    def load_columns(self, path):
+        self._data_field = LazyFrame.from_columns(path)
+
+    def save_columns(self, path):
+        save_columns(self._data_field, path)
+
+    def load_store(self, filename, steps=None, VarList=None):
+        self._data_field = LazyFrame.from_store(filename, steps=steps,
+                                                VarList=VarList)
+
     @property
     def x(self):
         return self._data_field['x'].values
@@ -153,7 +165,19 @@ class LineField(object):
         filename = 'probe_' + format(probe_num, '05d') + '.dat'
         return(filename)
 
-    def load_probe(self, path, loc, per=None, varname=None, uniq=None):
+    def load_probe(self, path, loc, per=None, varname=None, uniq=None,
+                   db=None):
+        # db: ProbeDB of path, read from the binary cache without parsing
+        if db is not None:
+            data = db.load(loc, per=per, uniq=(uniq is None))
+            if varname is not None:
+                missing = [var for var in varname if var not in data.columns]
+                if len(missing) > 0:
+                    raise ValueError('ERROR: ' + str(missing)
+                                     + ' are not in the probe database')
+                data = data[list(varname)]
+            self._data_field = data
+            return(data)
         if varname is None:
             varname = ['itstep', 'time', 'u', 'v', 'w',
                        'rho', 'E', 'p']
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 10:12:36 2026
+    This code for truncated singular value decomposition of snapshots, used
+    by POD and DMD (pod.py, DMD.py, sparse_dmd) instead of the full economy
+    SVD when only the leading modes are kept
+    1. randomized SVD with oversampling and power iterations
+    Ref: Halko N., et. al.-Finding structure with randomness: probabilistic
+    algorithms for constructing approximate matrix decompositions
+    2. Lanczos partial SVD (scipy.sparse.linalg.svds)
+    3. rank given directly or by the fraction of energy, the truncation
+    error is reported in SVDBackend.info
+    4. incremental SVD (Brand), snapshots are added as they are read,
+    POD and the DMD reduction are available at any time
+    5. streaming DMD on the incremental SVD, eigenvalues, modes and
+    amplitudes at any time without the snapshot matrix
+@author: weibo
+"""
+
+import numpy as np
+import scipy.linalg as linalg
+from scipy.sparse.linalg import svds
+from sparse_dmd.dmd import DMD, Reduction
+
+
+def svd_info(S, total, rank):
+    """error estimates of a truncation to rank from the singular values S
+    (at least the leading ones) and total energy ||X||_F^2
+
+        energy   - fraction of the energy kept
+        error    - relative Frobenius error ||X - U S Vh||_F / ||X||_F
+        sigma_next - the next singular value, i.e. the (spectral) error
+                   ||X - U S Vh||_2, NaN if not computed
+    """
+    kept = np.sum(S[:rank] ** 2)
+    if total <= 0.0:
+        return {'rank': rank, 'energy': 1.0, 'error': 0.0,
+                'sigma_next': 0.0}
+    return {'rank': rank,
+            'energy': kept / total,
+            'error': np.sqrt(max(total - kept, 0.0) / total),
+            'sigma_next': S[rank] if np.size(S) > rank else np.nan}
+
+
+def energy_rank(S, total, energy):
+    """smallest rank with energy fraction >= energy, None if S are not
+    enough"""
+    frac = np.cumsum(S ** 2) / total
+    ind = np.where(frac >= energy - 1e-12)[0]
+    if np.size(ind) == 0:
+        return None
+    return int(ind[0]) + 1
+
+
+def randomized_svd(X, rank, oversample=10, power_iter=2, seed=None):
+    """leading rank + oversample singular triplets of X by a random
+    range finder, power iterations sharpen the decay of the spectrum"""
+    m, n = np.shape(X)
+    num = min(rank + oversample, m, n)
+    rng = np.random.default_rng(seed)
+    omega = rng.standard_normal((n, num))
+    if np.iscomplexobj(X):
+        omega = omega + 1j * rng.standard_normal((n, num))
+    Q = linalg.qr(X @ omega, mode='economic')[0]
+    for i in range(power_iter):
+        # orthonormalised every step to keep the small singular values
+        Z = linalg.qr(X.T.conj() @ Q, mode='economic')[0]
+        Q = linalg.qr(X @ Z, mode='economic')[0]
+    B = Q.T.conj() @ X
+    Ub, S, Vh = linalg.svd(B, full_matrices=False)
+    return Q @ Ub, S, Vh
+
+
+def lanczos_svd(X, rank, seed=None):
+    """leading rank singular triplets by implicitly restarted Lanczos"""
+    m, n = np.shape(X)
+    if rank >= min(m, n):
+        return linalg.svd(X, full_matrices=False)
+    rng = np.random.default_rng(seed)
+    v0 = rng.standard_normal(min(m, n))
+    U, S, Vh = svds(X, k=rank, v0=v0)
+    idx = S.argsort()[::-1]
+    return U[:, idx], S[idx], Vh[idx]
+
+
+class SVDBackend(object):
+    """Truncated SVD, a drop-in replacement of
+    linalg.svd(X, full_matrices=False) returning U, S, Vh
+
+    Inputs:
+        method     - 'randomized', 'lanczos' or 'full'
+        rank       - NO of singular values kept
+        energy     - fraction of energy kept (0~1), used if rank is None
+        oversample - extra columns of the random range finder
+        power_iter - NO of power iterations (randomized)
+        rank0      - first guess of rank for energy, doubled if not enough
+        seed       - seed of the random vectors
+
+    After a call, info gives rank, energy, error and sigma_next
+    (see svd_info).
+    """
+    def __init__(self, method='randomized', rank=None, energy=None,
+                 oversample=10, power_iter=2, rank0=64, seed=None):
+        if method not in ('randomized', 'lanczos', 'full'):
+            raise ValueError('ERROR: unknown SVD method ' + str(method))
+        if rank is None and energy is None and method != 'full':
+            raise ValueError('ERROR: rank or energy must be given')
+        self.method = method
+        self.rank = rank
+        self.energy = energy
+        self.oversample = oversample
+        self.power_iter = power_iter
+        self.rank0 = rank0
+        self.seed = seed
+        self.info = None
+
+    def _partial(self, X, rank):
+        if self.method == 'randomized':
+            return randomized_svd(X, rank, self.oversample, self.power_iter,
+                                  self.seed)
+        if self.method == 'lanczos':
+            # one more triplet for the error estimate
+            return lanczos_svd(X, min(rank + 1, min(np.shape(X))),
+                               self.seed)
+        return linalg.svd(X, full_matrices=False)
+
+    def __call__(self, X):
+        total = np.linalg.norm(X) ** 2
+        full = min(np.shape(X))
+        if self.rank is not None:
+            rank = min(self.rank, full)
+            U, S, Vh = self._partial(X, rank)
+        elif self.energy is None:
+            U, S, Vh = self._partial(X, full)
+            rank = np.size(S)
+        else:
+            guess = min(self.rank0, full)
+            while True:
+                U, S, Vh = self._partial(X, guess)
+                rank = energy_rank(S, total, self.energy)
+                if (rank is not None and rank < np.size(S)) \
+                        or np.size(S) >= full or guess >= full:
+                    break
+                guess = min(2 * guess, full)
+            if rank is None:
+                rank = np.size(S)
+        rank = min(rank, np.size(S))
+        self.info = svd_info(S, total, rank)
+        return U[:, :rank], S[:rank], Vh[:rank]
+
+    def __repr__(self):
+        # stable, also the key of the cached DMD reductions
+        return 'SVDBackend(' + self.method + ', rank=' + str(self.rank) \
+            + ', energy=' + str(self.energy) + ', oversample=' \
+            + str(self.oversample) + ', power_iter=' + str(self.power_iter) \
+            + ', rank0=' + str(self.rank0) + ', seed=' + str(self.seed) + ')'
+
+
+
+def svd_update(U, S, V, C, rank=None, tol=1e-10):
+    """Brand's update of the SVD X = U diag(S) V* with new columns C,
+    returns U, S, V of [X, C], truncated to rank and to singular values
+    > tol * S[0]
+    Ref: Brand M.-Fast low-rank modifications of the thin singular value
+    decomposition
+    """
+    C = np.reshape(C, (np.shape(C)[0], -1))
+    if U is None:
+        U, S, Vh = linalg.svd(C, full_matrices=False)
+        V = Vh.T.conj()
+    else:
+        k = np.size(S)
+        P = U.T.conj() @ C
+        R = C - U @ P
+        # orthogonalised twice against U to keep U orthonormal
+        P2 = U.T.conj() @ R
+        R = R - U @ P2
+        P = P + P2
+        Q, RR = linalg.qr(R, mode='economic')
+        K = np.zeros((k + np.shape(C)[1],) * 2,
+                     dtype=np.result_type(S, P, RR))
+        K[:k, :k] = np.diag(S)
+        K[:k, k:] = P
+        K[k:, k:] = RR
+        Uk, S, Vkh = linalg.svd(K, full_matrices=False)
+        U = np.hstack((U, Q)) @ Uk
+        Vk = Vkh.T.conj()
+        V = np.vstack((V @ Vk[:k], Vk[k:]))
+    num = np.sum(S > tol * S[0]) if S[0] > 0.0 else 1
+    if rank is not None:
+        num = min(num, rank)
+    return U[:, :num], S[:num], V[:, :num]
+
+
+class IncrementalSVD(object):
+    """SVD of snapshots added one (or a few) at a time, the snapshot matrix
+    is never formed. Memory is O(m*rank) + O(n*rank)
+
+    Inputs:
+        rank  - NO of singular values kept (all nonzero ones if None)
+        tol   - singular values <= tol * S[0] are dropped
+        block - NO of snapshots gathered for one update
+
+    update(snapshots) adds a snapshot (1d) or snapshots (2d, in columns),
+    svd(), pod() and reduction() can be called at any time.
+    """
+    def __init__(self, rank=None, tol=1e-10, block=1):
+        self.rank = rank
+        self.tol = tol
+        self.block = block
+        self.U = None
+        self.S = None
+        self.V = None
+        self.num = 0
+        self.total = 0.0  # ||X||_F^2
+        # snapshots not in U, S, V yet, the last one is kept out for
+        # the reduction of DMD
+        self._pending = []
+
+    @property
+    def dim(self):
+        if self.U is not None:
+            return np.shape(self.U)[0]
+        return np.size(self._pending[0])
+
+    def update(self, snapshots):
+        snapshots = np.asarray(snapshots)
+        if np.ndim(snapshots) == 1:
+            snapshots = snapshots[:, None]
+        for i in range(np.shape(snapshots)[1]):
+            self._pending.append(snapshots[:, i])
+        self.num += np.shape(snapshots)[1]
+        self.total += np.linalg.norm(snapshots) ** 2
+        if len(self._pending) > self.block:
+            C = np.stack(self._pending[:-1], axis=1)
+            self.U, self.S, self.V = svd_update(
+                self.U, self.S, self.V, C, self.rank, self.tol)
+            self._pending = self._pending[-1:]
+
+    def _current(self, last=True):
+        # U, S, V with the pending snapshots, the state is not changed
+        pending = self._pending if last else self._pending[:-1]
+        if len(pending) == 0:
+            return self.U, self.S, self.V
+        return svd_update(self.U, self.S, self.V,
+                          np.stack(pending, axis=1), self.rank, self.tol)
+
+    def svd(self):
+        """U, S, Vh of all snapshots"""
+        U, S, V = self._current()
+        return U, S, V.T.conj()
+
+    @property
+    def info(self):
+        """truncation error of all snapshots, see svd_info"""
+        S = self._current()[1]
+        return svd_info(S, self.total, np.size(S))
+
+    @property
+    def mean(self):
+        U, S, V = self._current()
+        return U @ (S * np.mean(V, axis=0).conj())
+
+    def pod(self, fluc=False):
+        """eigval, eigvec, phi, alpha as pod.pod(method='svd')
+        fluc: POD of fluctuations, from the SVD of the snapshots
+        X - mean = U S (V* - mean(V*)) (within the kept subspace)"""
+        U, S, V = self._current()
+        Vh = V.T.conj()
+        if fluc:
+            B = S[:, None] * (Vh - np.mean(Vh, axis=1)[:, None])
+            Ub, S, Vh = linalg.svd(B, full_matrices=False)
+            U = U @ Ub
+        eigval = S * S
+        alpha = np.diag(S) @ Vh
+        return (eigval, Vh.T.conj(), U, alpha)
+
+    def reduction(self, rank=None):
+        """the reduction of sparse_dmd.dmd.DMD.dmd_reduction,
+        X0 = U S V*, UstarX1 = U* X1 (X0 and X1 are None), truncated to
+        rank if given"""
+        if self.num < 2:
+            raise ValueError('ERROR: at least two snapshots are needed')
+        U, S, V = self._current(last=False)
+        if rank is not None:
+            U, S, V = U[:, :rank], S[:rank], V[:, :rank]
+        last = U.T.conj() @ self._pending[-1]
+        UstarX1 = np.hstack(((S[:, None] * V.T.conj())[:, 1:],
+                             last[:, None]))
+        return Reduction(UstarX1=UstarX1, S=np.diag(S), V=V, U=U,
+                         X0=None, X1=None)
+
+
+class StreamingDMD(DMD):
+    """DMD of snapshots read one (or a few) at a time, the reduction
+    X0 = U S V*, U* X1 is updated by IncrementalSVD and the snapshot
+    matrix is never formed. Memory is O(m*rank) + O(n*rank)
+
+    Inputs:
+        dt    - time interval between snapshots
+        rank  - NO of singular values of the reduction (all nonzero ones
+                if None)
+        extra - NO of singular values kept in addition during the
+                updates, the truncation error of the updates stays below
+                the batch truncation
+        tol, block - see IncrementalSVD
+
+    With rank=None (or rank >= rank of the data) the result is that of
+    sparse_dmd.dmd.DMD, otherwise that of DMD with svd truncated to rank
+    up to the error of the truncated updates.
+
+        bfs = StreamingDMD(dt=0.5, rank=200, block=20)
+        for file in files:
+            bfs.update(snapshot)
+            bfs.compute()  # eigval, modes, amplitudes at any time
+    """
+    def __init__(self, dt=1, rank=None, extra=10, tol=1e-10, block=1):
+        DMD.__init__(self, dt=dt)
+        self.rank = rank
+        self.isvd = IncrementalSVD(None if rank is None else rank + extra,
+                                   tol, block)
+
+    @property
+    def num(self):
+        return self.isvd.num
+
+    def update(self, snapshots):
+        """add a snapshot (1d) or snapshots (2d, in columns)"""
+        self.isvd.update(snapshots)
+        self.data_shape = (self.isvd.dim, self.isvd.num)
+        del self.reduction
+        self._modes = None
+        self.computed = False
+
+    @property
+    def reduction(self):
+        """the reduction of the snapshots read so far"""
+        if not hasattr(self, '_reduction'):
+            self._reduction = self.isvd.reduction(self.rank)
+        return self._reduction
+
+    @reduction.deleter
+    def reduction(self):
+        if hasattr(self, '_reduction'):
+            del self._reduction
+
+    @property
+    def residuals(self):
+        """||X0 - modes diag(amplitudes) Vand||_F, from the reduction and
+        the energy of X0 out of the kept subspace"""
+        reduction = self.reduction
+        G = reduction.S @ reduction.V.T.conj()
+        total = self.isvd.total - np.linalg.norm(self.isvd._pending[-1]) ** 2
+        resid = np.linalg.norm(G - self.Ydmd @ self.dynamics) ** 2
+        return np.sqrt(resid + max(total - np.linalg.norm(G) ** 2, 0.0))
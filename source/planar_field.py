@@ -12,12 +12,34 @@ import os
 import plt2pandas as p2p
 from glob import glob
 import numpy as np
+from grid_index import GridIndex
 
 
 class PlanarField(LineField):
     def __init__(self):
         super().__init__()
         self._PlanarData = pd.DataFrame()
+        self._grid = None
+
+    @property
+    def grid(self):
+        # integer grid index of the data, rebuilt if the data are replaced
+        return self.grid_of(self._data_field)
+
+    def grid_of(self, df):
+        # integer grid index of the frame df (the data field or the planar
+        # data of TriField), kept while df is not replaced
+        if self._grid is None:
+            self._grid = {}
+        if id(df) not in self._grid or self._grid[id(df)][0] is not df:
+            cols = [col for col in ['x', 'y', 'z'] if col in df.columns]
+            self._grid[id(df)] = (df, GridIndex.of_frame(df, cols=cols))
+            # only the indexes of the frames in use
+            for key in list(self._grid.keys()):
+                if self._grid[key][0] is not df and \
+                        self._grid[key][0] is not self._data_field:
+                    del self._grid[key]
+        return self._grid[id(df)][1]
 
     @property
     def PlanarData(self):
@@ -111,8 +133,7 @@ class PlanarField(LineField):
                                      VarList=NameList,
                                      FileName=infile)
         df = df.drop_duplicates(keep='last')
-        grouped = df.groupby(['x', 'y', 'z'])
-        df = grouped.mean().reset_index()
+        df = GridIndex(df, cols=['x', 'y', 'z']).mean(df)
         self._data_field = df
 
     def load_meanflow(self, path, FileList=None, OutFile=None):
@@ -120,8 +141,7 @@ class PlanarField(LineField):
         if exists:
             df = pd.read_hdf(path + 'MeanFlow/MeanFlow.h5')
             df = df.drop_duplicates(keep='last')
-            grouped = df.groupby(['x', 'y', 'z'])
-            df = grouped.mean().reset_index()
+            df = GridIndex(df, cols=['x', 'y', 'z']).mean(df)
         else:
             equ = ['{|gradp|}=sqrt(ddx({<p>})**2+ddy({<p>})**2+ddz({<p>})**2)']
             # nfiles = np.size(os.listdir(path + 'TP_stat/'))
@@ -180,8 +200,15 @@ class PlanarField(LineField):
             return(df)
 
     def yprofile(self, var_name, var_val):
-        df1 = self.PlanarData.loc[self.PlanarData[var_name] == var_val]
-        
+        data = self.PlanarData
+        if var_name in ['x', 'y', 'z'] and var_name in data.columns:
+            # the index of the frame filtered, not of the data field
+            grid = self.grid_of(data)
+            xyz = [var_val if col == var_name else None for col in grid.cols]
+            df1 = data.iloc[grid.rows(xyz)]
+        else:
+            df1 = data.loc[data[var_name] == var_val]
+
         # df2 = df1.drop_duplicates(subset=['y'], keep='first', inplace=True)   
         grouped = df1.groupby(['y'])
         df2 = grouped.mean().reset_index()
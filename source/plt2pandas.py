@@ -5,7 +5,6 @@ Created on Sat Jun 9 10:24:50 2018
     Convert data to pandas dataframe
 @author: Weibo Hu
 """
-import tecplot as tp
 import pandas as pd
 import os
 import sys
@@ -15,7 +14,17 @@ from scipy.interpolate import griddata
 from timer import timer
 from time import time
 import logging as log
+import re
+import struct
+from io import StringIO
 from glob import glob
+import hashlib
+from multiprocessing import Pool
+import plt_io
+try:
+    import tecplot as tp
+except ImportError:
+    tp = None  # only the binary .plt reader is available
 
 log.basicConfig(level=log.INFO)
 
@@ -28,111 +37,273 @@ def progress(count, total, status=''):
     sys.stdout.write('%s %s%s ...%s\r' % (bar, percents, '%', status))
     sys.stdout.flush()
 
+
+# %% load tecplot data by the binary reader or the tecplot engine
+def load_tecplot(FileName, Equ=None, native=None):
+    if(isinstance(FileName, list)):
+        szplt = FileName[0].find('szplt')
+    else:
+        szplt = FileName.find('szplt')
+    # equations and .szplt files need the tecplot engine
+    if native is None:
+        native = (szplt == -1 and Equ is None) or tp is None
+    if native:
+        if Equ is not None:
+            raise ValueError('ERROR: equations need the tecplot engine!!!')
+        return plt_io.read_plt(FileName)
+    if(szplt != -1):
+        dataset = tp.data.load_tecplot_szl(FileName, read_data_option=2)
+    else:
+        dataset = tp.data.load_tecplot(FileName, read_data_option=2)
+    if Equ is not None:
+        for i in range(np.size(Equ)):
+            tp.data.operate.execute_equation(Equ[i])
+    return dataset
+
+
+def zone_values(zone, var):
+    values = zone.values(var)
+    if hasattr(values, 'as_numpy_array'):  # tecplot engine
+        values = values.as_numpy_array()
+    return values
+
+
+def variable_names(dataset):
+    if isinstance(dataset, plt_io.PltDataset):
+        return list(dataset.variable_names)
+    return [v.name for v in dataset.variables()]
+
+
+def solution_time(dataset):
+    if (np.size(dataset.solution_times) == 0):
+        SolTime = 0.0
+    else:
+        SolTime = dataset.solution_times[0]
+    return SolTime
+
+
+def zone_extent(zone):
+    # (x1, x2, y1, y2, z1, z2) of a zone
+    if isinstance(zone, plt_io.PltZone):
+        return zone.extent  # min/max is saved in the file
+    extent = []
+    for var in ['x', 'y', 'z']:
+        val = zone_values(zone, var)
+        extent.extend([np.min(val), np.max(val)])
+    return tuple(extent)
+
+
+def within_zone(extent, SubZone):
+    x1, x2, y1, y2, z1, z2 = extent
+    return ((SubZone[0][0] < x2 and x1 < SubZone[0][1])
+            and (SubZone[1][0] < y2 and y1 < SubZone[1][1])
+            and (SubZone[2][0] < z2 and z1 < SubZone[2][1]))
+
+
+def zone_layout(zone, SubZone=None, skip=1, shape=None):
+    # shape of the zone and slices to pick points for every skip points
+    if shape is None:
+        if SubZone is not None and not within_zone(zone_extent(zone), SubZone):
+            return None
+        shape = tuple(int(n) for n in zone.dimensions)
+    cut = []
+    for n, axis in zip(shape, ['x', 'y', 'z']):
+        if skip != 1 and n % skip == 1:
+            cut.append(slice(0, None, skip))
+        else:
+            if skip != 1:
+                print("No skip in " + axis + " direction")
+            cut.append(slice(None))
+    newshape = tuple(len(range(n)[c]) for n, c in zip(shape, cut))
+    return (shape, tuple(cut), newshape)
+
+
+def assemble_zones(zones, VarList, SubZone=None, skip=1, shapes=None):
+    # the size of every zone is known first, then the data of all zones
+    # are filled into one contiguous array per variable.
+    # zones are already selected if their shapes are given (block index)
+    layout = []
+    for i, zone in enumerate(zones):
+        shape = None if shapes is None else shapes[i]
+        info = zone_layout(zone, SubZone=SubZone, skip=skip, shape=shape)
+        if info is not None:
+            layout.append((zone,) + info)
+    total = int(np.sum([np.prod(info[3]) for info in layout]))
+    data = np.empty((np.size(VarList), total))
+    for i in range(np.size(VarList)):
+        ind1 = 0
+        for zone, shape, cut, newshape in layout:
+            ind2 = ind1 + int(np.prod(newshape))
+            varval = zone_values(zone, VarList[i]).reshape(shape, order='F')
+            data[i, ind1:ind2].reshape(newshape, order='F')[...] = varval[cut]
+            ind1 = ind2
+    # each column is a view of one row of data
+    df = pd.DataFrame(data=data.T, columns=VarList, copy=False)
+    return df
+
+
+# %% block index of a case, the blocks are the same for every snapshot
+BlockIndexVersion = 2
+BlockCols = ['x1', 'x2', 'y1', 'y2', 'z1', 'z2', 'nx', 'ny', 'nz',
+             'id1', 'id2', 'name', 'file', 'zone']
+
+
+def grid_key(names, shapes, files):
+    # hash of files, zone names and dimensions, i.e. the block topology
+    key = hashlib.sha1()
+    for name, shape, file in zip(names, shapes, files):
+        key.update(str(file).encode('utf-8') + b'\0')
+        key.update(str(name).encode('utf-8') + b'\0')
+        key.update(np.array(shape, dtype=np.int64).tobytes())
+    return key.hexdigest()
+
+
+def case_grid_key(FileName):
+    # grid key of the files as they are now, from the zone headers only
+    if not isinstance(FileName, list):
+        FileName = [FileName]
+    names, shapes, files = [], [], []
+    for file in FileName:
+        try:
+            headers = plt_io.read_zone_headers(file)
+        except IOError:  # not a #!TDV112 file, e.g. .szplt
+            dataset = load_tecplot(file)
+            headers = [(zone.name, zone.dimensions)
+                       for zone in dataset.zones()]
+            del dataset
+        for name, shape in headers:
+            names.append(name)
+            shapes.append([int(n) for n in shape])
+            files.append(os.path.basename(file))
+    return grid_key(names, shapes, files)
+
+
+def index_grid_key(index):
+    # grid key of a block index
+    return grid_key(index['name'], index[['nx', 'ny', 'nz']].values,
+                    index['file'])
+
+
+def build_block_index(FileName):
+    # bounding box, size and global row offsets of every zone
+    if not isinstance(FileName, list):
+        FileName = [FileName]
+    rows = []
+    id2 = -1
+    for file in FileName:
+        dataset = load_tecplot(file)
+        for i, zone in enumerate(dataset.zones()):
+            nx, ny, nz = (int(n) for n in zone.dimensions)
+            id1 = id2 + 1
+            id2 = id1 + nx * ny * nz - 1
+            rows.append(zone_extent(zone) + (nx, ny, nz, id1, id2, zone.name,
+                                             os.path.basename(file), i))
+        del dataset
+    return pd.DataFrame(data=rows, columns=BlockCols)
+
+
+def block_index(FileName, IndexFile=None):
+    """Load the block index of a case from IndexFile (.h5), build it from
+    FileName and save it if the file does not exist or is outdated, i.e.
+    the files, zone names or dimensions (from the headers of the current
+    files) are not those of the saved index.
+    """
+    if IndexFile is not None and os.path.isfile(IndexFile):
+        meta = pd.read_hdf(IndexFile, key='meta')
+        if int(meta['version']) == BlockIndexVersion \
+           and case_grid_key(FileName) == meta['grid']:
+            return pd.read_hdf(IndexFile, key='zones')
+        log.warning("block index %s is outdated, rebuild it", IndexFile)
+    index = build_block_index(FileName)
+    if IndexFile is not None:
+        meta = pd.Series({'version': str(BlockIndexVersion),
+                          'grid': index_grid_key(index)})
+        index.to_hdf(IndexFile, key='zones', format='fixed')
+        meta.to_hdf(IndexFile, key='meta', format='fixed')
+    return index
+
+
+def select_blocks(FileName, index, SubZone=None):
+    # files and zones (in loading order) overlapping with SubZone
+    if SubZone is not None:
+        extent = index[['x1', 'x2', 'y1', 'y2', 'z1', 'z2']].values
+        keep = [within_zone(ext, SubZone) for ext in extent]
+        selected = index[np.array(keep, dtype=bool)]
+        if selected.shape[0] == 0:
+            raise ValueError('ERROR: no zone overlaps with SubZone '
+                             + str(SubZone))
+    else:
+        selected = index
+    if isinstance(FileName, list):
+        used = set(selected['file'])
+        FileName = [name for name in FileName
+                    if os.path.basename(name) in used]
+        files = [os.path.basename(name) for name in FileName]
+    else:
+        files = [os.path.basename(FileName)]
+    # position of every selected zone in the loaded dataset
+    counts = index.groupby('file').size()
+    offset = dict(zip(files, np.cumsum([0] + [counts[f] for f in files])))
+    position = [offset[f] + int(i) for f, i in
+                zip(selected['file'], selected['zone'])]
+    return FileName, selected, position
+
+
 def ReadPlt(FoldPath, VarList=None):
     FileList = os.listdir(FoldPath)
     #clear dataset first
     for j in range(np.size(FileList)):
         FileName = FoldPath + FileList[j]
-        dataset  = tp.data.load_tecplot(FileName)
+        dataset = load_tecplot(FileName)
         #namelist = dataset.VariablesNamedTuple
-        zone = dataset.zone
-        #zones = dataset.zones()
-        zonename = zone(j).name
+        zone = dataset.zone(0)
         if VarList is None:
-            VarList = [v.name for v in dataset.variables()]
+            VarList = variable_names(dataset)
         #print(zonename)
         for i in range(np.size(VarList)):
-            var  = dataset.variable(VarList[i])
             if i == 0:
-                VarCol = var.values(zonename).as_numpy_array()
+                VarCol = zone_values(zone, VarList[i])
                 #print(np.size(VarCol))
             else:
-                Var_index = var.values(zonename).as_numpy_array()
+                Var_index = zone_values(zone, VarList[i])
                 VarCol = np.column_stack((VarCol, Var_index))
         if j == 0:
-            if (np.size(dataset.solution_times) == 0):
-                SolTime = 0.0
-            else:
-                SolTime = dataset.solution_times[0]
+            SolTime = solution_time(dataset)
             #print(SolTime)
             ZoneRow = VarCol
         else:
             ZoneRow = np.row_stack((ZoneRow, VarCol))
-        del dataset, zone, zonename, var
+        del dataset, zone
     df = pd.DataFrame(data=ZoneRow, columns=VarList)
     return(df)
 
 
 def ReadINCAResults(FoldPath, VarList, SubZone=None, FileName=None, Equ=None,
-                    SpanAve=None, SavePath=None, OutFile=None, skip=0, opt=2):
+                    SpanAve=None, SavePath=None, OutFile=None, skip=0, opt=2,
+                    native=None, IndexFile=None):
     if FileName is None:
         files = sorted(os.listdir(FoldPath))
         FileName = [os.path.join(FoldPath, name) for name in files]
-    if(isinstance(FileName, list)):
-        szplt = FileName[0].find('szplt')
-    else:
-        szplt = FileName.find('szplt')
-    if(szplt != -1):
-        dataset = tp.data.load_tecplot_szl(FileName, read_data_option=2)
-    else:
-        dataset = tp.data.load_tecplot(FileName, read_data_option=2)
-    if Equ is not None:
-        for i in range(np.size(Equ)):
-            tp.data.operate.execute_equation(Equ[i])
-    if (np.size(dataset.solution_times) == 0):
-        SolTime = 0.0
-    else:
-        SolTime = dataset.solution_times[0]
+    if IndexFile is not None:
+        # load only files having zones inside SubZone, no need to scan zones
+        index = block_index(FileName, IndexFile)
+        FileName, index, position = select_blocks(FileName, index, SubZone)
+    dataset = load_tecplot(FileName, Equ=Equ, native=native)
+    SolTime = solution_time(dataset)
     skip = skip + 1
     # num_zones = dataset.num_zones
-    df = pd.DataFrame(columns=VarList)
-    for zone in dataset.zones('*'):
-        xvar = zone.values('x').as_numpy_array()
-        yvar = zone.values('y').as_numpy_array()
-        zvar = zone.values('z').as_numpy_array()
-        nx = int(np.size(np.unique(xvar)))
-        ny = int(np.size(np.unique(yvar)))
-        nz = int(np.size(np.unique(zvar)))
-        x1 = np.min(xvar)
-        x2 = np.max(xvar)
-        y1 = np.min(yvar)
-        y2 = np.max(yvar)
-        z1 = np.min(zvar)
-        z2 = np.max(zvar)
-        if SubZone is not None:
-            withinzone = ((SubZone[0][0] < x2 and x1 < SubZone[0][1])
-                     and (SubZone[1][0] < y2 and y1 < SubZone[1][1])
-                     and (SubZone[2][0] < z2 and z1 < SubZone[2][1]))
-
-        if(SubZone is None or withinzone==True):
-            for i in range(np.size(VarList)):
-                varval = zone.values(VarList[i]).as_numpy_array()
-                # this method does much repeated work,
-                # try to find index to filter variables
-                if skip != 1:
-                    NewCol = varval.reshape((nx, ny, nz), order='F')
-                    if nx % skip == 1:
-                        NewCol = NewCol[0::skip, :, :]
-                    else:
-                        print("No skip in x direction")
-                    if ny % skip == 1:
-                        NewCol = NewCol[:, 0::skip, :]
-                    else:
-                        print("No skip in y direction")
-                    if nz % skip == 1:
-                        NewCol = NewCol[:, :, 0::skip]
-                    else:
-                        print("No skip in z direction")
-                    varval = NewCol.ravel(order='F')
-
-                if i == 0:  # first column
-                    VarCol = varval
-                else:  # other columns
-                    Var_index = varval
-                    VarCol = np.column_stack((VarCol, Var_index))
-            df1 = pd.DataFrame(data=VarCol, columns=VarList)
-            df = df.append(df1, ignore_index=True)
-    del dataset, varval
+    if IndexFile is not None:
+        zones = dataset.zones()
+        zones = [zones[i] for i in position]
+        if [zone.name for zone in zones] != list(index['name']):
+            raise ValueError('ERROR: zones do not match block index '
+                             + IndexFile)
+        shapes = index[['nx', 'ny', 'nz']].values
+        df = assemble_zones(zones, VarList, skip=skip, shapes=shapes)
+    else:
+        df = assemble_zones(dataset.zones(), VarList, SubZone=SubZone,
+                            skip=skip)
+    del dataset
     # df = df.drop_duplicates(keep='last')  # if on,spanwise-average may wrong
     if SpanAve == True:
         grouped = df.groupby(['x', 'y'])
@@ -154,40 +325,129 @@ def ReadINCAResults(FoldPath, VarList, SubZone=None, FileName=None, Equ=None,
     return(df, SolTime)
 
 
+# %% convert a series of snapshots with a pool of processes
+def snapshot_list(FoldPath):
+    # a snapshot is a .plt/.szplt file or a folder of block files
+    if any(c in FoldPath for c in '*?['):
+        names = sorted(glob(FoldPath))
+    else:
+        names = [os.path.join(FoldPath, name)
+                 for name in sorted(os.listdir(FoldPath))]
+    return [name for name in names
+            if os.path.isdir(name) or name.endswith('plt')]
+
+
+def snapshot_files(snapshot):
+    if os.path.isdir(snapshot):
+        files = sorted(os.listdir(snapshot))
+        return [os.path.join(snapshot, name) for name in files]
+    return snapshot
+
+
+def snapshot_time(snapshot):
+    # solution time from the file header, None if it cannot be read
+    files = snapshot_files(snapshot)
+    if isinstance(files, list):
+        if len(files) == 0:
+            return None
+        files = files[0]
+    if files.endswith('szplt'):
+        return None
+    try:
+        return plt_io.read_solution_time(files)
+    except (IOError, ValueError, struct.error):
+        # a broken file is reported by the worker converting it
+        return None
+
+
+def series_name(SavePath, OutFile, SolTime):
+    return SavePath + OutFile + '_' + "%08.2f" % SolTime + ".h5"
+
+
+def _convert_snapshot(task):
+    # worker of batch_convert, every process loads data by itself
+    snapshot, VarList, SavePath, OutFile, kwargs = task
+    start = time()
+    files = snapshot_files(snapshot)
+    try:
+        df, SolTime = ReadINCAResults(None, VarList, FileName=files, **kwargs)
+    except Exception as err:
+        return (snapshot, None, str(err), 0, 0, time() - start)
+    outfile = series_name(SavePath, OutFile, SolTime)
+    # write to a temporary file first, an existing output is always complete
+    df.to_hdf(outfile + '.tmp', key='w', format='fixed')
+    os.replace(outfile + '.tmp', outfile)
+    if not isinstance(files, list):
+        files = [files]
+    size = np.sum([os.path.getsize(name) for name in files])
+    return (snapshot, outfile, SolTime, np.shape(df)[0], size,
+            time() - start)
+
+
+def batch_convert(FoldPath, VarList, SavePath, OutFile, SubZone=None,
+                  Equ=None, SpanAve=None, skip=0, opt=2, processes=None,
+                  resume=True):
+    """Convert all snapshots in a folder (or matching a glob pattern)
+    to .h5 files named OutFile_%08.2f.h5 by solution time.
+
+    Snapshots are spread over a pool of processes. The conversion of
+    every snapshot is recorded in SavePath/OutFile_convert.dat with
+    its throughput; with resume=True the snapshots already converted
+    are skipped.
+    """
+    snapshots = snapshot_list(FoldPath)
+    report = SavePath + OutFile + '_convert.dat'
+    cols = ['snapshot', 'outfile', 'time', 'rows', 'MB', 'seconds', 'MB/s']
+    done = set()
+    if resume and os.path.isfile(report):
+        record = pd.read_csv(report, sep='\t')
+        for name, outfile in zip(record['snapshot'], record['outfile']):
+            if os.path.isfile(outfile):
+                done.add(name)
+    kwargs = {'SubZone': SubZone, 'Equ': Equ, 'SpanAve': SpanAve,
+              'skip': skip, 'opt': opt}
+    tasks = []
+    for snapshot in snapshots:
+        if snapshot in done:
+            continue
+        if resume:
+            SolTime = snapshot_time(snapshot)
+            if SolTime is not None and os.path.isfile(
+                    series_name(SavePath, OutFile, SolTime)):
+                continue
+        tasks.append((snapshot, VarList, SavePath, OutFile, kwargs))
+    log.info("convert %d of %d snapshots", len(tasks), len(snapshots))
+    if not os.path.isfile(report):
+        with open(report, 'w') as f:
+            f.write('\t'.join(cols) + '\n')
+    start = time()
+    with Pool(processes) as pool, open(report, 'a') as f:
+        results = pool.imap_unordered(_convert_snapshot, tasks)
+        for i, res in enumerate(results):
+            snapshot, outfile, SolTime, rows, size, elapsed = res
+            progress(i + 1, len(tasks), os.path.basename(snapshot))
+            if outfile is None:
+                log.warning("failed to convert %s: %s", snapshot, SolTime)
+                continue
+            size = size / 1024.0**2
+            f.write('{}\t{}\t{}\t{}\t{:.2f}\t{:.2f}\t{:.2f}\n'.format(
+                snapshot, outfile, SolTime, rows, size, elapsed,
+                size / elapsed))
+            f.flush()
+    log.info("converted %d snapshots in %0.2fs", len(tasks), time() - start)
+    return pd.read_csv(report, sep='\t')
+
+
 # %% save zone information of every tecplot file
-def save_zone_info(path, filename=None):
-    init = os.scandir(path)
+def save_zone_info(path, filename=None, IndexFile=None):
+    files = [path + name for name in sorted(os.listdir(path))]
     cols = ['x1', 'x2', 'y1', 'y2', 'z1',
             'z2', 'nx', 'ny', 'nz']
-    name = np.empty(shape=[0, 1])
-    boundary = np.empty(shape=[0, 9])
-    for folder in init:
-        file = path + folder.name
-        dataset = tp.data.load_tecplot(file, read_data_option=2)
-        zone = dataset.zone
-        zonename = zone(0).name
-        var_x = dataset.variable('x').values(zonename).as_numpy_array()
-        var_y = dataset.variable('y').values(zonename).as_numpy_array()
-        var_z = dataset.variable('z').values(zonename).as_numpy_array()
-        nx = int(np.size(np.unique(var_x)))
-        ny = int(np.size(np.unique(var_y)))
-        nz = int(np.size(np.unique(var_z)))
-        nxyz = np.size(var_x)
-        if nxyz != nx * ny * nz:
-            sys.exit("The shape of data does not match!!!")
-        x1 = np.min(var_x)
-        x2 = np.max(var_x)
-        y1 = np.min(var_y)
-        y2 = np.max(var_y)
-        z1 = np.min(var_z)
-        z2 = np.max(var_z)
-
-        name = np.append(name, folder.name)
-        information = [x1, x2, y1, y2, z1, z2, nx, ny, nz]
-        boundary = np.vstack((boundary, information))
-    name = name.reshape(-1, 1)
-    df = pd.DataFrame(data=boundary, columns=cols)
-    df['name'] = name
+    index = block_index(files, IndexFile)
+    # the first zone of every file
+    index = index[index['zone'] == 0].reset_index(drop=True)
+    df = index[cols].astype(float)
+    df['name'] = index['file']
     if filename is not None:
         df.to_csv(filename, index=False, sep=' ')
     return (df)
@@ -211,82 +471,39 @@ def save_tec_index(df_data, df_zone_info, filename=None):
     return (df)
 
 
-def extract_zone(path, cube, skip=0, filename=None):
+def extract_zone(path, cube, skip=0, filename=None, IndexFile=None):
     # cube = [(-5.0, 25.0), (-3.0, 5.0), (-2.5, 2.5)]
-    init = os.scandir(path)
+    files = [path + name for name in sorted(os.listdir(path))]
     cols = ['x1', 'x2', 'y1', 'y2', 'z1',
             'z2', 'nx', 'ny', 'nz']
-    name = np.empty(shape=[0, 1])
-    boundary = np.empty(shape=[0, 9])
     skip = skip + 1
-    for folder in init:
-        file = path + folder.name
-        dataset = tp.data.load_tecplot(file, read_data_option=2)
-        zone = dataset.zone
-        zonename = zone(0).name
-        var_x = dataset.variable('x').values(zonename).as_numpy_array()
-        var_y = dataset.variable('y').values(zonename).as_numpy_array()
-        var_z = dataset.variable('z').values(zonename).as_numpy_array()
-        nx = int(np.size(np.unique(var_x)))
-        ny = int(np.size(np.unique(var_y)))
-        nz = int(np.size(np.unique(var_z)))
-        nxyz = np.size(var_x)
-        if nxyz != nx * ny * nz:
-            sys.exit("The shape of data does not match!!!")
-        x1 = np.min(var_x)
-        x2 = np.max(var_x)
-        y1 = np.min(var_y)
-        y2 = np.max(var_y)
-        z1 = np.min(var_z)
-        z2 = np.max(var_z)
-        # FileID.loc[jj, 'id1'] = ind[0]
-        # FileID.loc[jj, 'id2'] = ind[-1]
-        if (cube[0][0] < x2 and x1 < cube[0][1]) \
-           and (cube[1][0] < y2 and y1 < cube[1][1]) \
-           and (cube[2][0] < z2 and z1 < cube[2][1]):
-            # id1 = int(id2 + 1)
-            # id2 = int(id1 + nx * ny * nz - 1)
-            # print(folder.name)
-            if skip != 1:
-                if nx % skip == 1:
-                    nx = (nx + 1) // skip
-                else:
-                    print("No skip in x direction")
-                if ny % skip == 1:
-                    ny = (ny + 1) // skip
-                else:
-                    print("No skip in y direction")
-                if nz % skip == 1:
-                    nz = (nz + 1) // skip
-                else:
-                    print("No skip in z direction")
-            name = np.append(name, folder.name)
-            information = [x1, x2, y1, y2, z1, z2, nx, ny, nz]
-            # print(information)
-            boundary = np.vstack((boundary, information))
-    name = name.reshape(-1, 1)
-    df = pd.DataFrame(data=boundary, columns=cols)
-    df['name'] = name
-    df = df.sort_values(by=['name']).reset_index(drop=True)
-    ind1 = np.empty(shape=[0, 1])
-    ind2 = np.empty(shape=[0, 1])
-    id2 = -1
+    index = block_index(files, IndexFile)
+    index = index[index['zone'] == 0]
+    _, index, _ = select_blocks(files, index, cube)
+    df = index[cols].astype(float).reset_index(drop=True)
+    df['name'] = index['file'].values
     for j in range(np.shape(df)[0]):
-        id1 = id2 + 1
-        id2 = id1 + df.iloc[j]['nx'] * df.iloc[j]['ny'] * df.iloc[j]['nz'] - 1
-        ind1 = np.append(ind1, id1)
-        ind2 = np.append(ind2, id2)
-    df['id1'] = ind1
-    df['id2'] = ind2
+        shape = tuple(int(n) for n in index[['nx', 'ny', 'nz']].values[j])
+        newshape = zone_layout(None, skip=skip, shape=shape)[2]
+        df.loc[j, ['nx', 'ny', 'nz']] = newshape
+    df = df.sort_values(by=['name']).reset_index(drop=True)
+    # global row offsets of the extracted zones
+    size = df['nx'] * df['ny'] * df['nz']
+    df['id2'] = np.cumsum(size) - 1
+    df['id1'] = df['id2'] - size + 1
+    df = df[cols + ['name', 'id1', 'id2']]
     if filename is not None:
         df.to_csv(filename, index=False, sep=' ')
     return (df)
 
 
 def GirdIndex(FileID, xarr, yarr, zarr):
-    FileID['nx'] = 0
-    FileID['ny'] = 0
-    FileID['nz'] = 0
+    # the size of zones is known if FileID comes from the block index
+    known = {'nx', 'ny', 'nz'}.issubset(FileID.columns)
+    if not known:
+        FileID['nx'] = 0
+        FileID['ny'] = 0
+        FileID['nz'] = 0
     ind_arr = []
     xyz = pd.DataFrame(np.hstack((xarr, yarr, zarr)), columns=['x', 'y', 'z'])
     for jj in range(FileID.shape[0]):
@@ -298,6 +515,8 @@ def GirdIndex(FileID, xarr, yarr, zarr):
         # df_id = df.drop_duplicates()
         ind = df_id.index.values
         ind_arr.append(ind)
+        if known:
+            continue
         nx = np.size(np.unique(df_id['x'][ind]))
         ny = np.size(np.unique(df_id['y'][ind]))
         nz = np.size(np.unique(df_id['z'][ind]))
@@ -321,39 +540,16 @@ def SaveSlice(df, SolTime, SpanAve, SavePath):
 
 
 def ReadAllINCAResults(FoldPath, SavePath=None, Equ=None,
-                       FileName=None, SpanAve=None, OutFile=None):
+                       FileName=None, SpanAve=None, OutFile=None, native=None):
     if FileName is None:
         # files = os.listdir(FoldPath)
         # FileName = [os.path.join(FoldPath, name) for name in files]
         FileName = glob(FoldPath + '*plt')
-    if(isinstance(FileName, list)):
-        szplt = FileName[0].find('szplt')
-    else:
-        szplt = FileName.find('szplt')
-    if(szplt != -1):
-        dataset = tp.data.load_tecplot_szl(FileName, read_data_option=2)
-    else:
-        dataset = tp.data.load_tecplot(FileName, read_data_option=2)
-    if Equ is not None:
-        for i in range(np.size(Equ)):
-            tp.data.operate.execute_equation(Equ[i])
-    VarList = [v.name for v in dataset.variables()]
-    df = pd.DataFrame(columns=VarList)
-    if (np.size(dataset.solution_times) == 0):
-        SolTime = 0.0
-    else:
-        SolTime = dataset.solution_times[0]
-    for zone in dataset.zones('*'):
-        for i in range(np.size(VarList)):
-            if i == 0:
-                VarCol = zone.values(VarList[i]).as_numpy_array()
-            else:
-                Var_index = zone.values(VarList[i]).as_numpy_array()
-                VarCol = np.column_stack((VarCol, Var_index))
-        df1 = pd.DataFrame(data=VarCol, columns=VarList)
-        df = df.append(df1, ignore_index=True)
-
-    del FileName, dataset, zone
+    dataset = load_tecplot(FileName, Equ=Equ, native=native)
+    VarList = variable_names(dataset)
+    SolTime = solution_time(dataset)
+    df = assemble_zones(dataset.zones(), VarList)
+    del FileName, dataset
     # df = df.drop_duplicates(keep='last')
     if SpanAve is not None:
         grouped = df.groupby(['x', 'y'])
@@ -365,13 +561,53 @@ def ReadAllINCAResults(FoldPath, SavePath=None, Equ=None,
     return(df)
 
 
+def grid_position(val, coord):
+    # position of every value in coordinate array coord (any order),
+    # -1 if the value is not a grid point
+    order = np.argsort(coord, kind='stable')
+    sort_coord = np.asarray(coord)[order]
+    ind = np.searchsorted(sort_coord, val)
+    ind[ind == np.size(coord)] = 0
+    pos = order[ind]
+    pos[sort_coord[ind] != val] = -1
+    return pos
+
+
+def structured_index(dataframe, x, y, z=None):
+    """flat index (x varies fastest) of every row on the tensor-product
+    grid x * y (* z). Rows with z out of z are ignored (-1). Return None if
+    the rows do not fill the grid exactly once"""
+    I = np.size(x)
+    J = np.size(y)
+    ix = grid_position(dataframe['x'].values, x)
+    iy = grid_position(dataframe['y'].values, y)
+    if z is None or np.size(z) == 1:
+        iz = np.zeros(np.shape(ix), dtype=ix.dtype)
+        K = 1
+    else:
+        iz = grid_position(dataframe['z'].values, z)
+        K = np.size(z)
+    outside = iz < 0
+    if np.any((ix[~outside] < 0) | (iy[~outside] < 0)):
+        return None
+    ind = ix + I * (iy + J * iz)
+    ind[outside] = -1
+    inside = ind[~outside]
+    if np.size(inside) != I * J * K or \
+       np.any(np.bincount(inside, minlength=I*J*K) != 1):
+        return None
+    return ind
+
+
 def frame2tec(dataframe,
               SaveFolder,
               FileName,
               z=None,
               zname=None,
               stime=None,
-              float_format='%.8f'):
+              float_format='%.8f',
+              binary=False):
+    # binary=True: save as tecplot binary .plt instead of ascii .dat
     if not os.path.exists(SaveFolder):
         raise IOError('ERROR: directory does not exist: %s' % SaveFolder)
     SavePath = os.path.join(SaveFolder, FileName)
@@ -392,7 +628,14 @@ def frame2tec(dataframe,
     xx, yy = np.meshgrid(x, y, indexing='ij')
     # xx, yy, zz = np.meshgrid(x, y, z, indexing='ij')
     new = np.zeros((I*J*K, np.size(dataframe.columns)))
-    if K == 1:
+    # structured data are put to their grid points directly,
+    # interpolation is only for data not matching the grid
+    ind = structured_index(dataframe, x, y, z)
+    if ind is not None:
+        for i in range(len(dataframe.columns)):
+            header = '{} "{}"'.format(header, dataframe.columns[i])
+        new[ind[ind >= 0]] = dataframe.values[ind >= 0]
+    elif K == 1:
         for i in range(len(dataframe.columns)):
             header = '{} "{}"'.format(header, dataframe.columns[i])
             var = griddata((dataframe.x, dataframe.y),
@@ -414,6 +657,13 @@ def frame2tec(dataframe,
         raise ValueError(
                 'ERROR: dataframe contains NON value due to geometry',
                 'discontinuity, like a step exist in the domain!!!')
+    if binary:
+        strand = 0 if stime is None else 1
+        soltime = 0.0 if stime is None else np.float64(stime)
+        zone = plt_io.new_zone(zone_name, dataframe.columns, (I, J, K), new,
+                               strand=strand, solution_time=soltime)
+        plt_io.write_plt(SavePath + '.plt', list(dataframe.columns), zone)
+        return
     with open(SavePath + '.dat', 'w') as f:
         f.write(header+'\n')
         f.write(zone)
@@ -433,7 +683,9 @@ def frame2tec3d(dataframe,
                 filename,
                 zname=None,
                 stime=None,
-                float_format='%9.8e'):
+                float_format='%9.8e',
+                binary=False):
+    # binary=True: save as tecplot binary .plt instead of ascii .dat
     if not os.path.exists(path):
         raise IOError('ERROR: directory does not exist: %s' % path)
     SavePath = os.path.join(path, filename)
@@ -450,6 +702,14 @@ def frame2tec3d(dataframe,
         zonename = 'B' + '{:010}'.format(1)
     zone = 'ZONE T= "{}" \n'.format(zonename)
 
+    if binary:
+        with timer("save " + filename + " tecplot .plt"):
+            data = dataframe.sort_values(by=['z', 'y', 'x'])
+            soltime = 0.0 if stime is None else np.float64(stime)
+            zone = plt_io.new_zone(zonename, data.columns, (In, Jn, Kn),
+                                   data, strand=1, solution_time=soltime)
+            plt_io.write_plt(SavePath + '.plt', list(data.columns), zone)
+        return
     with timer("save " + filename + " tecplot .dat"):
         with open(SavePath + '.dat', 'w') as f:
             if stime is not None:
@@ -490,17 +750,43 @@ def zone2tec(path, filename, df, zonename, time=None):
                   float_format='%9.8e')
 """
 
-def mul_zone2tec(path, filename, zoneinfo, df, zoneid=None, stime=None):
+def mul_zone2tec(path, filename, zoneinfo, df, zoneid=None, stime=None,
+                 binary=False):
+    # binary=True: save as tecplot binary .plt instead of ascii .dat
     header = "VARIABLES = "
     for j in range(len(df.columns)):
         header = '{} "{}"'.format(header, df.columns[j])
     header = header + '\n'  # write header of the file
     time1 = time()
     for i in range(np.shape(zoneinfo)[0]):
+        zonename = 'B' + '{:010}'.format(i+1)
+        file = zoneinfo.iloc[i]
+        if zoneid is None:
+            data = df.query(
+                "x>={0} & x<={1} & y>={2} & y<={3}".format(file['x1'],
+                                                           file['x2'],
+                                                           file['y1'],
+                                                           file['y2'])
+            )
+        else:
+            grouped = zoneid.groupby(['file'])
+            # ng = grouped.ngroups
+            ind = grouped.get_group(i + 1)['ind']
+            ind = ind.astype('int')
+            data = df.iloc[ind]
+        # data = df.iloc[ind1: ind2 + 1]
+        data = data.sort_values(by=['z', 'y', 'x'])
+        if binary:
+            soltime = 0.0 if stime is None else np.float64(stime)
+            shape = (file['nx'], file['ny'], file['nz'])
+            zone = plt_io.new_zone(zonename, data.columns, shape, data,
+                                   strand=i+1, solution_time=soltime)
+            plt_io.write_plt(path + filename + str(i) + '.plt',
+                             list(data.columns), zone)
+            print("save data " + zonename + " took", time()-time1, "s")
+            continue
         with open(path + filename + str(i) + '.dat', 'w') as f:
             f.write(header)
-            zonename = 'B' + '{:010}'.format(i+1)
-            file = zoneinfo.iloc[i]
             zone = 'ZONE T = "{}" \n'.format(zonename)
             if stime is not None:
                 stime = np.float64(stime)
@@ -513,28 +799,36 @@ def mul_zone2tec(path, filename, zoneinfo, df, zoneid=None, stime=None):
             f.write(zone)
             f.write(timeid)
             f.write(xyz)
-            if zoneid is None:
-                data = df.query(
-                    "x>={0} & x<={1} & y>={2} & y<={3}".format(file['x1'],
-                                                               file['x2'],
-                                                               file['y1'],
-                                                               file['y2'])
-                )
-            else:
-                grouped = zoneid.groupby(['file'])
-                # ng = grouped.ngroups
-                ind = grouped.get_group(i + 1)['ind']
-                ind = ind.astype('int')
-                data = df.iloc[ind]
-            # data = df.iloc[ind1: ind2 + 1]
-            data = data.sort_values(by=['z', 'y', 'x'])
             data.to_csv(f, sep='\t', index=False,
                         header=False, float_format='%.8f')
         print("save data " + zonename + " took", time()-time1, "s")
 
 
-def mul_zone2tec_plt(path, filename, FileId, df, time=None, option=1):
-    if option == 1:
+def mul_zone2tec_plt(path, filename, FileId, df, time=None, option=1,
+                     native=None):
+    # native: write .plt by plt_io without tecplot engine
+    if native is None:
+        native = True
+    if native and option == 1:
+        zones = []
+        for i in range(np.shape(FileId)[0]):
+            file = FileId.iloc[i]
+            ind1 = int(file['id1'])
+            ind2 = int(file['id2'])
+            shape = (int(file['nx']), int(file['ny']), int(file['nz']))
+            zonename = 'B' + '{:010}'.format(i)
+            data = df.iloc[ind1: ind2 + 1]
+            data = data.sort_values(by=['z', 'y', 'x'])
+            if time is not None:
+                zone = plt_io.new_zone(zonename, df.columns, shape, data,
+                                       strand=1, solution_time=time)
+            else:
+                zone = plt_io.new_zone(zonename, df.columns, shape, data)
+            zones.append(zone)
+        plt_io.write_plt(path + filename + '.plt', list(df.columns), zones)
+    elif native:
+        tec2plt(path, filename, native=True)
+    elif option == 1:
         tp.session.connect()
         tp.new_layout()
 #        page = tp.active_page()
@@ -580,22 +874,54 @@ def mul_zone2tec_plt(path, filename, FileId, df, time=None, option=1):
 
 # read INCA output directly without tecIO
 def tec2npy(Folder, InFile, OutFile):
-    with open(Folder + InFile, "rb") as infile:
-        title_line = infile.readline()
-        variables = infile.readline()
-        zone_name = infile.readline()
-        time = infile.readline()
-        i, j, k = infile.readline()
+    dataset = plt_io.read_plt(Folder + InFile)
+    VarList = variable_names(dataset)
+    for i, zone in enumerate(dataset.zones()):
+        data = {var: zone.values(var) for var in VarList}
+        np.savez(Folder + OutFile + '_' + '{:05}'.format(i), **data)
 
 
+# read ordered zones of tecplot ascii file (point format), like the files
+# written by frame2tec, frame2tec3d and mul_zone2tec
+def read_tec_dat(filename):
+    with open(filename, 'r') as f:
+        text = f.read()
+    parts = re.split(r'^\s*ZONE', text, flags=re.M | re.I)
+    VarList = re.findall(r'"([^"]*)"', parts[0])
+    nvar = len(VarList)
+    zones = []
+    for part in parts[1:]:
+        # the data start at the first line beginning with a number
+        match = re.search(r'^\s*[-+.\d]', part, flags=re.M)
+        info = dict((k.upper(), v.strip('"')) for k, v in re.findall(
+            r'(\w+)\s*=\s*("[^"]*"|[^,\s]+)', part[:match.start()]))
+        shape = tuple(int(float(info.get(n, 1))) for n in ['I', 'J', 'K'])
+        data = pd.read_csv(StringIO(part[match.start():]), sep=r'\s+',
+                           header=None, nrows=int(np.prod(shape))).values
+        if np.shape(data)[1] != nvar:
+            raise ValueError('ERROR: NO of variables does not match in '
+                             + filename)
+        zone = plt_io.new_zone(info.get('T', 'ZONE'), VarList, shape, data,
+                               strand=int(info.get('STRANDID', 0)),
+                               solution_time=float(info.get('SOLUTIONTIME',
+                                                            0.0)))
+        zones.append(zone)
+    return VarList, zones
 
-def tec2plt(Folder, InFile, OutFile=None):
-    dataset = tp.data.load_tecplot(
-        Folder + InFile + '.dat', read_data_option=2)
+
+def tec2plt(Folder, InFile, OutFile=None, native=None):
     if OutFile is None:
         filename = InFile
     else:
         filename = OutFile
+    if native is None:
+        native = True
+    if native:
+        VarList, zones = read_tec_dat(Folder + InFile + '.dat')
+        plt_io.write_plt(Folder + filename + '.plt', VarList, zones)
+        return
+    dataset = tp.data.load_tecplot(
+        Folder + InFile + '.dat', read_data_option=2)
     tp.data.save_tecplot_plt(Folder + filename + '.plt', dataset=dataset)
 
 
@@ -611,9 +937,17 @@ def frame2plt(dataframe,
               time=None,
               z=None,
               zonename=None,
-              float_format='%.8f'):
-    frame2tec(dataframe, SaveFolder, OutFile, time, z, zonename, float_format)
-    tec2plt(SaveFolder, OutFile, OutFile)
+              float_format='%.8f',
+              native=None):
+    if native is None:
+        native = True
+    if native:
+        frame2tec(dataframe, SaveFolder, OutFile, z=z, zname=zonename,
+                  stime=time, binary=True)
+        return
+    frame2tec(dataframe, SaveFolder, OutFile, z=z, zname=zonename,
+              stime=time, float_format=float_format)
+    tec2plt(SaveFolder, OutFile, OutFile, native=False)
 
 
 def frame2szplt(dataframe,
@@ -622,8 +956,22 @@ def frame2szplt(dataframe,
                 time=None,
                 z=None,
                 zonename=None,
-                float_format='%.8f'):
-    frame2tec(dataframe, SaveFolder, OutFile, time, z, zonename, float_format)
+                float_format='%.8f',
+                native=None):
+    # .szplt is always saved by tecplot engine, but the data are passed
+    # in binary .plt (native) instead of ascii
+    if native is None:
+        native = True
+    if native:
+        frame2tec(dataframe, SaveFolder, OutFile, z=z, zname=zonename,
+                  stime=time, binary=True)
+        dataset = tp.data.load_tecplot(
+            os.path.join(SaveFolder, OutFile + '.plt'), read_data_option=2)
+        tp.data.save_tecplot_szl(os.path.join(SaveFolder, OutFile + '.szplt'),
+                                 dataset=dataset)
+        return
+    frame2tec(dataframe, SaveFolder, OutFile, z=z, zname=zonename,
+              stime=time, float_format=float_format)
     tec2szplt(SaveFolder, OutFile, OutFile)
 
 
@@ -733,3 +1081,11 @@ def create_folder(path):
 #
 #Snapshots.to_hdf(OutFolder+"TimeSeries.h5", 'w', format='fixed')
 #stat = pd.read_hdf(OutFolder+"TimeSeries.h5")
+
+#%% Convert all snapshots in parallel (resume if restarted)
+#VarList = ['x', 'y', 'z', 'u', 'v', 'w', 'p', 'rho', 'T']
+#FoldPath = "/media/weibo/VID1/BFS_M1.7TS/Slice/S_10/"
+#OutFolder = "/media/weibo/VID2/BFS_M1.7TS_LA/Slice/S_010/"
+#subzone = [(-40.0, 70.0), (-3.0, 10.0), (-8.0, 8.0)]
+#report = batch_convert(FoldPath, VarList, OutFolder, 'TP_2D_S_010',
+#                       SubZone=subzone, processes=16)
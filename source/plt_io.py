@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:12:36 2026
+    This code for reading tecplot binary data (.plt, #!TDV112) directly
+    without tecplot engine. The file is memory-mapped and the variables of
+    every ordered zone are returned as numpy views (no copy).
+    Ordered zones can be written in the same format by write_plt
+@author: weibo
+"""
+
+import os
+import struct
+import numpy as np
+
+
+ZONEMARKER = 299.0
+GEOMMARKER = 399.0
+TEXTMARKER = 499.0
+LABELMARKER = 599.0
+USERMARKER = 699.0
+DSAUXMARKER = 799.0
+VARAUXMARKER = 899.0
+EOHMARKER = 357.0
+# data format of variables in the data section
+DTYPES = {1: 'f4', 2: 'f8', 3: 'i4', 4: 'i2', 5: 'u1'}
+
+
+class _Cursor(object):
+    """read basic types from a buffer and move forward"""
+    def __init__(self, buf, pos=0, endian='<'):
+        self.buf = buf
+        self.pos = pos
+        self.endian = endian
+
+    def unpack(self, fmt, num=1):
+        fmt = self.endian + str(num) + fmt
+        val = struct.unpack_from(fmt, self.buf, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return val
+
+    def int32(self, num=None):
+        if num is None:
+            return self.unpack('i')[0]
+        return list(self.unpack('i', num))
+
+    def float32(self):
+        return self.unpack('f')[0]
+
+    def float64(self, num=None):
+        if num is None:
+            return self.unpack('d')[0]
+        return np.array(self.unpack('d', num))
+
+    def string(self):
+        # every character is saved as int32, null-terminated
+        chars = []
+        while True:
+            c = self.int32()
+            if c == 0:
+                break
+            chars.append(chr(c))
+        return ''.join(chars)
+
+
+class PltZone(object):
+    """An ordered zone of a binary .plt file
+
+    Attributes:
+        name      zone title
+        strand    StrandID (0 for static zones)
+        solution_time
+        dimensions (IMax, JMax, KMax)
+        minmax    min/max value of every variable, shape (nvar, 2)
+    """
+    def __init__(self, name, variables):
+        self.name = name
+        self.variables = variables
+        self.parent = -1
+        self.strand = 0
+        self.solution_time = 0.0
+        self.dimensions = (1, 1, 1)
+        self.aux = {}
+        self.dtypes = None
+        self.passive = None
+        self.shared = None
+        self.minmax = None
+        self._data = [None] * len(variables)
+
+    @property
+    def num_points(self):
+        return int(np.prod(self.dimensions))
+
+    def index(self, var):
+        if isinstance(var, str):
+            return self.variables.index(var)
+        return int(var)
+
+    def values(self, var):
+        """return variable data of the zone, read-only view of the file"""
+        return self._data[self.index(var)]
+
+    def bounds(self, var):
+        return tuple(float(v) for v in self.minmax[self.index(var)])
+
+    @property
+    def extent(self):
+        """(x1, x2, y1, y2, z1, z2) of the zone"""
+        ext = []
+        for var in ['x', 'y', 'z']:
+            ext.extend(self.bounds(var))
+        return tuple(ext)
+
+
+class PltFile(object):
+    """Ordered-zone tecplot binary file (#!TDV112) opened via memory map
+
+    Inputs:
+        filename - path of the .plt file
+        data     - map the data section, False for the headers only
+                   (zone names, dimensions, solution time)
+
+    Attributes:
+        title, variables (names), zones (list of PltZone), aux
+    """
+    def __init__(self, filename, data=True):
+        self.filename = filename
+        self.title = ''
+        self.variables = []
+        self.zones = []
+        self.aux = {}
+        self.file_type = 0
+        self._mm = np.memmap(filename, dtype=np.uint8, mode='r')
+        self._read_header()
+        if data:
+            self._read_data()
+
+    def _read_header(self):
+        buf = self._mm
+        magic = bytes(buf[:8])
+        if magic[:5] != b'#!TDV':
+            raise IOError('ERROR: not a tecplot binary file: %s'
+                          % self.filename)
+        self.version = int(magic[5:8])
+        if self.version != 112:
+            raise IOError('ERROR: unsupported tecplot version %d: %s'
+                          % (self.version, self.filename))
+        # byte order marker (integer 1)
+        endian = '<' if struct.unpack_from('<i', buf, 8)[0] == 1 else '>'
+        cur = _Cursor(buf, 12, endian)
+        self._endian = endian
+        self.file_type = cur.int32()
+        self.title = cur.string()
+        nvar = cur.int32()
+        self.variables = [cur.string() for i in range(nvar)]
+        while True:
+            marker = cur.float32()
+            if marker == ZONEMARKER:
+                self.zones.append(self._read_zone_header(cur))
+            elif marker == DSAUXMARKER:
+                name = cur.string()
+                cur.int32()  # value format, string only
+                self.aux[name] = cur.string()
+            elif marker == VARAUXMARKER:
+                cur.int32()
+                cur.string()
+                cur.int32()
+                cur.string()
+            elif marker == LABELMARKER:
+                for i in range(cur.int32()):
+                    cur.string()
+            elif marker == EOHMARKER:
+                break
+            else:
+                raise IOError('ERROR: geometry/text records are not '
+                              'supported (marker %.1f)' % marker)
+        self._cursor = cur
+
+    def _read_zone_header(self, cur):
+        nvar = len(self.variables)
+        zone = PltZone(cur.string(), self.variables)
+        zone.parent = cur.int32()
+        zone.strand = cur.int32()
+        zone.solution_time = cur.float64()
+        cur.int32()  # zone color, not used
+        zonetype = cur.int32()
+        if zonetype != 0:
+            raise IOError('ERROR: only ordered zones are supported: %s'
+                          % zone.name)
+        if cur.int32() == 1:  # specify var location
+            if any(cur.int32(nvar)):
+                raise IOError('ERROR: cell-centered variables are not '
+                              'supported: %s' % zone.name)
+        cur.int32()  # raw local 1-to-1 face neighbors
+        if cur.int32() != 0:  # misc user-defined face neighbors
+            raise IOError('ERROR: face neighbor connections are not '
+                          'supported: %s' % zone.name)
+        zone.dimensions = tuple(cur.int32(3))
+        while cur.int32() == 1:
+            name = cur.string()
+            cur.int32()
+            zone.aux[name] = cur.string()
+        return zone
+
+    def _read_data(self):
+        cur = self._cursor
+        nvar = len(self.variables)
+        for zone in self.zones:
+            if cur.float32() != ZONEMARKER:
+                raise IOError('ERROR: broken data section of zone %s'
+                              % zone.name)
+            zone.dtypes = cur.int32(nvar)
+            zone.passive = [0] * nvar
+            zone.shared = [-1] * nvar
+            if cur.int32() == 1:
+                zone.passive = cur.int32(nvar)
+            if cur.int32() == 1:
+                zone.shared = cur.int32(nvar)
+            cur.int32()  # share connectivity, not used by ordered zone
+            owned = [i for i in range(nvar)
+                     if zone.shared[i] == -1 and not zone.passive[i]]
+            minmax = np.full((nvar, 2), np.nan)
+            minmax[owned] = cur.float64(2 * len(owned)).reshape(-1, 2)
+            zone.minmax = minmax
+            npts = zone.num_points
+            for i in owned:
+                if zone.dtypes[i] not in DTYPES:
+                    raise IOError('ERROR: unsupported data format of '
+                                  'variable %s' % self.variables[i])
+                dtype = np.dtype(self._endian + DTYPES[zone.dtypes[i]])
+                zone._data[i] = np.frombuffer(self._mm, dtype=dtype,
+                                              count=npts, offset=cur.pos)
+                cur.pos += npts * dtype.itemsize
+        # resolve shared and passive variables
+        for zone in self.zones:
+            for i in range(nvar):
+                if zone.shared[i] != -1:
+                    ref = self.zones[zone.shared[i]]
+                    zone._data[i] = ref._data[i]
+                    zone.minmax[i] = ref.minmax[i]
+                elif zone.passive[i]:
+                    zone._data[i] = np.zeros(zone.num_points)
+                    zone.minmax[i] = 0.0
+
+    @property
+    def solution_times(self):
+        return sorted(set(z.solution_time for z in self.zones
+                          if z.strand > 0))
+
+
+class PltDataset(object):
+    """zones of one or several .plt files with the same variables
+
+    mimics the part of tecplot dataset used by plt2pandas
+    """
+    def __init__(self, files):
+        if isinstance(files, str):
+            files = [files]
+        self.files = [PltFile(name) for name in files]
+        self.variable_names = self.files[0].variables
+        self._zones = []
+        for pltfile in self.files:
+            if pltfile.variables != self.variable_names:
+                raise ValueError('ERROR: variables are not the same in '
+                                 + pltfile.filename)
+            self._zones.extend(pltfile.zones)
+
+    @property
+    def num_zones(self):
+        return len(self._zones)
+
+    def zones(self, pattern=None):
+        return list(self._zones)
+
+    def zone(self, index):
+        if isinstance(index, str):
+            return [z for z in self._zones if z.name == index][0]
+        return self._zones[index]
+
+    @property
+    def solution_times(self):
+        times = set()
+        for pltfile in self.files:
+            times.update(pltfile.solution_times)
+        return sorted(times)
+
+
+def read_plt(FileName):
+    """load a .plt file (or a list of .plt files) as PltDataset"""
+    if isinstance(FileName, str) and os.path.isdir(FileName):
+        files = sorted(os.listdir(FileName))
+        FileName = [os.path.join(FileName, name) for name in files]
+    return PltDataset(FileName)
+
+
+def read_zone_headers(filename):
+    """(name, dimensions) of every zone of a .plt file, only the header
+    is read"""
+    return [(zone.name, zone.dimensions)
+            for zone in PltFile(filename, data=False).zones]
+
+
+def read_solution_time(filename):
+    """solution time of a .plt file, variable data are not read"""
+    times = PltFile(filename, data=False).solution_times
+    if np.size(times) == 0:
+        return 0.0
+    return times[0]
+
+
+# %% write ordered zones to a binary .plt file without tecplot engine
+FORMATS = {'f4': 1, 'f8': 2, 'i4': 3, 'i2': 4, 'u1': 5}
+
+
+def _pack_string(txt):
+    # every character is saved as int32, null-terminated
+    return np.array([ord(c) for c in txt] + [0], dtype='<i4').tobytes()
+
+
+def new_zone(name, variables, dimensions, data, strand=0, solution_time=0.0):
+    """create an ordered zone to be written by write_plt
+
+    Inputs:
+        dimensions - (IMax, JMax, KMax), I varies fastest in data
+        data - DataFrame/dict (variable name -> 1d array) or 2d array
+               with shape (npoints, nvar)
+    """
+    zone = PltZone(name, list(variables))
+    zone.dimensions = tuple(int(n) for n in dimensions)
+    zone.strand = int(strand)
+    zone.solution_time = float(solution_time)
+    for i, var in enumerate(zone.variables):
+        if isinstance(data, np.ndarray):
+            val = data[:, i]
+        else:
+            val = data[var]
+        val = np.asarray(val).ravel()
+        if np.size(val) != zone.num_points:
+            raise ValueError('ERROR: size of %s does not match dimensions '
+                             'of zone %s' % (var, name))
+        zone._data[i] = val
+    return zone
+
+
+def write_plt(filename, variables, zones, title='', dtype='f8'):
+    """save ordered zones (made by new_zone) as tecplot binary (#!TDV112)
+
+    the data of every zone are streamed to the file variable by variable
+    """
+    if isinstance(zones, PltZone):
+        zones = [zones]
+    dtype = np.dtype('<' + dtype)
+    fmt = FORMATS[dtype.str[1:]]
+    nvar = len(variables)
+    with open(filename, 'wb') as f:
+        # header section
+        f.write(b'#!TDV112')
+        f.write(struct.pack('<ii', 1, 0))
+        f.write(_pack_string(title))
+        f.write(struct.pack('<i', nvar))
+        for var in variables:
+            f.write(_pack_string(var))
+        for zone in zones:
+            f.write(struct.pack('<f', ZONEMARKER))
+            f.write(_pack_string(zone.name))
+            f.write(struct.pack('<ii', -1, zone.strand))
+            f.write(struct.pack('<d', zone.solution_time))
+            # zone color, zone type (ordered), var location,
+            # face neighbors, user-defined face neighbors
+            f.write(struct.pack('<iiiii', -1, 0, 0, 0, 0))
+            f.write(struct.pack('<iii', *zone.dimensions))
+            f.write(struct.pack('<i', 0))  # no aux data
+        f.write(struct.pack('<f', EOHMARKER))
+        # data section
+        for zone in zones:
+            data = [np.ascontiguousarray(zone.values(var), dtype=dtype)
+                    for var in variables]
+            f.write(struct.pack('<f', ZONEMARKER))
+            f.write(struct.pack('<%di' % nvar, *([fmt] * nvar)))
+            # no passive, no sharing variables, no sharing connectivity
+            f.write(struct.pack('<iii', 0, 0, -1))
+            for val in data:
+                f.write(struct.pack('<dd', np.min(val), np.max(val)))
+            for val in data:
+                f.write(memoryview(val))
@@ -21,6 +21,8 @@ from numpy import NaN, Inf, arange, isscalar, asarray, array
 from numpy.core.umath_tests import inner1d
 import sys, os
 from timer import timer
+from DMD import vand_amplitude
+from sparse_dmd.dmd import cached_reduction
 
 
 # Proper Orthogonal Decomposition (snapshots method), equal time space
@@ -28,14 +30,20 @@ from timer import timer
 # phi-each column is a mode structure
 # eigval-the amount of enery in each mode
 # alpha -time amplitude, each mode varies in time
-def pod(var, fluc=False, method=None):
+# svd-truncated SVD (low_rank.SVDBackend) instead of the full economy SVD
+def pod(var, fluc=False, method=None, svd=None):
     m, n = np.shape(var) # n: the number of snapshots, m: dimensions
     if(n > m):
         sys.exit(
             "NO of snapshots had better be smaller than NO of grid points!!!")
     if fluc == True:
         var = var - np.transpose(np.tile(np.mean(var, axis=1), (n, 1)))
-    if method == 'svd':  # svd method
+    if svd is not None:  # truncated svd method
+        phi, sigma, VH = svd(var)
+        eigval = sigma*sigma
+        alpha  = np.diag(sigma)@VH
+        eigvec = VH.T.conj()
+    elif method == 'svd':  # svd method
         phi, sigma, VH = sp.linalg.svd(var, full_matrices=False)
         eigval = sigma*sigma
         alpha  = np.diag(sigma)@VH  # row: mode; every column:coordinates
@@ -43,7 +51,7 @@ def pod(var, fluc=False, method=None):
         eigvec = VH.T.conj()
     else:  # eigvalue problem method
         CorrMat = np.matmul(np.transpose(var), var)  # correlation matrix,
-        eigval, eigvec = np.linalg.eig(CorrMat)  # right eigvalues
+        eigval, eigvec = np.linalg.eigh(CorrMat)  # symmetric matrix
         eigval = np.absolute(eigval)
         eigvec = np.absolute(eigvec)
         idx = eigval.argsort()[::-1]
@@ -84,18 +92,22 @@ def pod_reconstruct(num, Snapshots, eigval, phi, alpha):
 # Standard Dynamic Mode Decompostion, equal time space
 # Ref: Jonathan H. T., et. al.-On dynamic mode decomposition: theory and application
 # x/y, phi: construct flow field for each mode (phi:row-coordinates, column-time)
-def DMD_Standard(var, outfolder, fluc = None): # scaled method
+def DMD_Standard(var, outfolder, fluc = None, svd=None, cache=None): # scaled method
     n = np.shape(var)[1]  # n: the number of snapshots, m: dimensions
     if fluc == 'True':
         var  = var - np.transpose(np.tile(np.mean(var, axis=1), (n, 1)))
     V1 = var[:, :-1]
     V2 = var[:, 1:]
-    U, D, VH = sp.linalg.svd(V1, full_matrices=False)  # do not perform tlsq
-    V = VH.conj().T
+    # svd of V1 by the shared DMD engine (truncated if svd is given,
+    # kept on disk in the folder cache)
+    reduction = cached_reduction(var, svd, cache)
+    U = reduction.U
+    D = np.diag(reduction.S)
+    V = reduction.V
     ind = np.where(np.round(D, 1) == 0.0)
     if np.size(ind) != 0:
         print("There are "+str(np.size(ind))+" zero-value singular value!!!")
-        nonzero = n-1-np.size(ind)
+        nonzero = np.size(D)-np.size(ind)
         V = V[:, :nonzero]
         D = D[:nonzero]
         U = U[:, :nonzero]
@@ -104,6 +116,8 @@ def DMD_Standard(var, outfolder, fluc = None): # scaled method
     phi    = U@eigvec  # projected dynamic modes
     if np.size(ind) != 0:
         residual = np.linalg.norm(V2[:, :nonzero]-V1[:, :nonzero]@S)/n
+    elif np.size(D) < n-1:  # truncated svd, residual of the projected map
+        residual = np.linalg.norm(V2-U@(S@(U.T.conj()@V1)))/n
     else:
         residual = np.linalg.norm(V2-V1@S)/n
     return (eigval, phi, U, eigvec, residual)
@@ -114,6 +128,8 @@ def OldDMD_Amplitude(var, phi, eigval, lstsq=None):
     n = np.shape(var)[1]
     if lstsq == 'False':
         coeff  = np.linalg.lstsq(phi, var.T[0], rcond=-1)[0]  # modes coeff
+    elif lstsq == 'vand':  # closed form of the same least squares
+        coeff = vand_amplitude(phi, eigval, var)[0]
     else:  # min(var-phi@coeff@Vand)-->min(UT@V1-UT@U@eigvec@coeff@Vand)
         A = phi@np.diag(eigval**0)
         for i in range(n-1):
@@ -128,6 +144,8 @@ def DMD_Amplitude(var, U, eigvec, phi, eigval, lstsq=None):
     # min(var-phi@coeff@Vand)-->min(UT@V1-UT@U@eigvec@coeff@Vand)
     if lstsq == 'False':
         coeff  = np.linalg.lstsq(phi, var.T[0], rcond=-1)[0]
+    elif lstsq == 'vand':  # closed form of the same least squares
+        coeff = vand_amplitude(eigvec, eigval, U.T.conj()@var[:, :-1])[0]
     else:  # min(var-phi@coeff@Vand)-->min(UT@V1-UT@U@eigvec@coeff@Vand)
         A = eigvec@np.diag(eigval**0)
         for i in range(n-2):
@@ -95,7 +95,7 @@ var2 = 'p'
 col = [var0, var1, var2]
 fa = 1 #/(1.7*1.7*1.4)
 FirstFrame = DataFrame[col].values
-Snapshots = FirstFrame[ind].ravel(order='F')
+Snapshots = [FirstFrame[ind].ravel(order='F')]
 
 # %%
 with timer("Load Data"):
@@ -106,9 +106,9 @@ with timer("Load Data"):
         if np.shape(TempFrame)[0] != np.shape(DataFrame)[0]:
             sys.exit('The input snapshots does not match!!!')
         NextFrame = TempFrame[col].values
-        Snapshots = np.vstack((Snapshots, NextFrame[ind].ravel(order='F')))
+        Snapshots.append(NextFrame[ind].ravel(order='F'))
         DataFrame += TempFrame
-Snapshots = Snapshots.T
+Snapshots = np.stack(Snapshots, axis=1)  # copied only once
 # Snapshots = Snapshots[ind, :]
 # Snapshots = Snapshots*fa
 m, n = np.shape(Snapshots)
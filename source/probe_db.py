@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 20:47:03 2026
+    This code for a binary database of INCA probes (probe_XXXXX.dat)
+    1. the probe files are converted once to raw binary (float64, one
+    file per probe), new lines written by the solver are appended by
+    refresh() without parsing the old ones again
+    2. probes are found by a KD-tree over the coordinates of inca_probes.inp
+    3. data of many probes within a time window are read by memory map
+@author: weibo
+"""
+
+import os
+import json
+from io import StringIO
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+
+DBVersion = 2
+
+
+def probe_name(num):
+    return 'probe_' + format(num, '05d') + '.dat'
+
+
+def default_varname(ncol):
+    if ncol == 9:
+        return ['itstep', 'time', 'u', 'v', 'w', 'rho', 'E', 'walldist', 'p']
+    return ['itstep', 'time', 'u', 'v', 'w', 'rho', 'E', 'p']
+
+
+class ProbeDB(object):
+    """Binary cache of the probe files in path
+
+    Inputs:
+        path    - folder with inca_probes.inp and probe_XXXXX.dat
+        DBPath  - folder of the database, default path + 'probe_db/'
+        varname - names of the columns of probe files
+        tol     - tolerance to find a probe by coordinates
+    """
+    def __init__(self, path, DBPath=None, varname=None, tol=1e-3):
+        self.path = path
+        if DBPath is None:
+            DBPath = os.path.join(path, 'probe_db')
+        self.DBPath = DBPath
+        self.tol = tol
+        if not os.path.exists(DBPath):
+            os.mkdir(DBPath)
+        self._meta_file = os.path.join(DBPath, 'meta.json')
+        meta = None
+        if os.path.isfile(self._meta_file):
+            with open(self._meta_file, 'r') as f:
+                meta = json.load(f)
+            if meta.get('version') != DBVersion:
+                meta = None
+        if meta is None:
+            # binary files of an old or broken database would be appended
+            for name in os.listdir(DBPath):
+                if name.startswith('p') and name.endswith('.bin'):
+                    os.remove(os.path.join(DBPath, name))
+            meta = {'version': DBVersion, 'varname': varname, 'files': {}}
+            probes = np.loadtxt(os.path.join(path, 'inca_probes.inp'),
+                                skiprows=6, usecols=(2, 3, 4), ndmin=2)
+            np.save(os.path.join(DBPath, 'probes.npy'), probes)
+        self.meta = meta
+        self.coords = np.load(os.path.join(DBPath, 'probes.npy'))
+        self.tree = cKDTree(self.coords)
+
+    @property
+    def varname(self):
+        return self.meta['varname']
+
+    @property
+    def num_probes(self):
+        return np.shape(self.coords)[0]
+
+    def _save_meta(self):
+        tmp = self._meta_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self._meta_file)
+
+    def probe_id(self, loc):
+        """number (from 1) of the probe at loc, the last one if several
+        probes are at the same location"""
+        ind = self.tree.query_ball_point(np.asarray(loc, dtype=np.float64),
+                                         r=self.tol, p=np.inf)
+        if len(ind) == 0:
+            raise ValueError('ERROR: no probe is found at ' + str(loc))
+        return int(np.max(ind)) + 1
+
+    def _bin_file(self, num):
+        return os.path.join(self.DBPath, 'p%05d.bin' % num)
+
+    def _refresh_probe(self, num):
+        name = probe_name(num)
+        file = os.path.join(self.path, name)
+        info = self.meta['files'].get(name, {'offset': 0, 'rows': 0})
+        size = os.path.getsize(file)
+        if size < info['offset']:  # file was rewritten, convert again
+            info = {'offset': 0, 'rows': 0}
+        if size == info['offset']:
+            return 0
+        with open(file, 'rb') as f:
+            f.seek(info['offset'])
+            text = f.read()
+        # only complete lines, the solver may be writing the last one
+        end = text.rfind(b'\n') + 1
+        skip = 2 if info['offset'] == 0 else 0
+        lines = text[:end].decode().splitlines()[skip:]
+        if not any(line.strip() for line in lines):
+            return 0  # header only or no complete line yet
+        data = pd.read_csv(StringIO('\n'.join(lines)), sep=r'\s+',
+                           header=None).values.astype(np.float64)
+        if self.meta['varname'] is None:
+            self.meta['varname'] = default_varname(np.shape(data)[1])
+        if np.shape(data)[1] != len(self.varname):
+            raise ValueError('ERROR: columns of ' + name
+                             + ' do not match the varname')
+        # rows written after the last saved meta (e.g. a crash before
+        # the meta was saved) are dropped before appending
+        with open(self._bin_file(num), 'ab') as f:
+            f.truncate(info['rows'] * len(self.varname) * 8)
+            f.write(np.ascontiguousarray(data).tobytes())
+        info = {'offset': info['offset'] + end,
+                'rows': info['rows'] + np.shape(data)[0]}
+        self.meta['files'][name] = info
+        return np.shape(data)[0]
+
+    def refresh(self, probes=None):
+        """convert new lines of probe files (all probes by default)"""
+        if probes is None:
+            probes = range(1, self.num_probes + 1)
+        rows = 0
+        for num in probes:
+            if os.path.isfile(os.path.join(self.path, probe_name(num))):
+                rows += self._refresh_probe(num)
+        self._save_meta()
+        return rows
+
+    def raw(self, num):
+        """all rows of probe num (memory-mapped), shape (rows, vars)"""
+        if probe_name(num) not in self.meta['files']:
+            self.refresh([num])
+        file = self._bin_file(num)
+        rows = self.meta['files'].get(probe_name(num), {'rows': 0})['rows']
+        if rows == 0 or not os.path.isfile(file):
+            return np.empty((0, len(self.varname)))
+        # only the rows recorded in meta
+        return np.memmap(file, dtype=np.float64, mode='r',
+                         shape=(rows, len(self.varname)))
+
+    def load(self, loc, per=None, uniq=True):
+        """DataFrame of the probe at loc (or probe number), sorted by time,
+        only rows within per = (t1, t2)"""
+        num = loc if np.ndim(loc) == 0 else self.probe_id(loc)
+        data = self.raw(num)
+        time = data[:, self.varname.index('time')]
+        if uniq:
+            # keep the last row of repeated time (restart of the solver)
+            rev = time[::-1]
+            _, ind = np.unique(rev, return_index=True)
+            ind = np.size(time) - 1 - ind
+        else:
+            ind = np.argsort(time, kind='stable')
+        if per is not None:
+            ind = ind[(time[ind] >= per[0]) & (time[ind] <= per[1])]
+        return pd.DataFrame(data=data[ind], columns=self.varname)
+
+    def series(self, locs, var, per=None):
+        """time series of var at many probes on the time of the first
+        probe, NaN if a probe has no data at that time
+
+        Return: time, array with shape (time, probes)
+        """
+        frames = [self.load(loc, per=per) for loc in locs]
+        time = frames[0]['time'].values
+        data = np.full((np.size(time), len(frames)), np.nan)
+        for i, frame in enumerate(frames):
+            t = frame['time'].values
+            if np.size(t) == 0:
+                continue
+            pos = np.clip(np.searchsorted(t, time), 0, np.size(t) - 1)
+            match = t[pos] == time
+            data[match, i] = frame[var].values[pos[match]]
+        return time, data
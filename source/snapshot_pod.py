@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 22 09:18:40 2026
+    This code for proper orthogonal decomposition (method of snapshots) of
+    a snapshot store without loading the snapshot matrix
+    1. the correlation (Gram) matrix X^T W X (time x time) is summed tile
+    by tile of points, W is the mass matrix (e.g. cell volume)
+    2. symmetric eigenvalue problem of the Gram matrix (eigh)
+    3. POD modes projected in a second pass over the tiles, written to a
+    memory-mapped .npy
+@author: weibo
+"""
+
+import os
+from contextlib import contextmanager
+import numpy as np
+from scipy import linalg
+from multiprocessing import Pool
+from snapshot_store import SnapshotStore
+from timer import timer
+
+
+def _tile_weight(weight, points):
+    if weight is None:
+        return 1.0
+    return weight[points]
+
+
+def _gram_tile(task):
+    # Gram matrix and the sum over time of every point of a tile
+    filename, VarList, points, steps, weight = task
+    store = SnapshotStore(filename)
+    gram = 0.0
+    total = []
+    for var in VarList:
+        A = store.read(var, points=points, steps=steps)  # (time, points)
+        gram = gram + A @ (A * weight).T
+        total.append(np.sum(A, axis=0))
+    return gram, np.concatenate(total)
+
+
+def _mode_tile(task):
+    # POD modes of a tile, phi = (X - mean) @ eigvec / sqrt(eigval)
+    filename, VarList, points, steps, mean, proj = task
+    store = SnapshotStore(filename)
+    phi = []
+    for i, var in enumerate(VarList):
+        A = store.read(var, points=points, steps=steps)
+        if mean is not None:
+            A = A - mean[i][None, :]
+        phi.append(A.T @ proj)
+    return phi
+
+
+@contextmanager
+def _run(func, tasks, processes):
+    # results of func over tasks, the pool is terminated on leaving
+    if processes == 1:
+        yield map(func, tasks)
+        return
+    with Pool(processes=processes) as pool:
+        yield pool.imap(func, tasks)
+
+
+def snapshot_pod(filename, VarList, OutFolder, points=None, time=None,
+                 weight=None, fluc=True, nmodes=None, tile=8192,
+                 processes=1, tol=1e-12):
+    """POD of variables VarList of a snapshot store, two passes over the
+    data, only one tile of points is in memory (per process)
+
+    Inputs:
+        points  - index of points (default all), e.g. SnapshotStore.points
+        time    - time window (t1, t2)
+        weight  - weight of every point (cell volume), default 1
+        fluc    - POD of fluctuations (mean removed)
+        nmodes  - NO of modes projected (default all nonzero ones)
+        tile    - NO of points per task
+    Output in OutFolder (like 3d_pod_post.py):
+        eigval.npy, eigvec.npy, coeff.npy, phi.npy (modes, variables
+        stacked along rows as SnapshotStore.snapshots), Meanflow.h5
+    Return:
+        eigval, eigvec, phi (memory-mapped), coeff as pod.pod
+    """
+    store = SnapshotStore(filename)
+    if points is None:
+        points = np.arange(store.num_points)
+    points = np.asarray(points)
+    if points.dtype == bool:
+        points = np.flatnonzero(points)
+    if weight is not None:
+        weight = np.asarray(weight, dtype=np.float64)
+        if np.size(weight) == store.num_points:
+            weight = weight[points]
+    if not os.path.exists(OutFolder):
+        os.mkdir(OutFolder)
+    steps = store.steps(time)
+    n = len(range(*steps.indices(store.num_snapshots)))
+    m = np.size(points)
+    o = len(VarList)
+    tiles = [np.arange(i, min(i + tile, m)) for i in range(0, m, tile)]
+    # pass 1: Gram matrix
+    tasks = [(filename, VarList, points[t], steps,
+              _tile_weight(weight, t)) for t in tiles]
+    gram = np.zeros((n, n))
+    total = np.empty(o * m)
+    with timer('POD Gram matrix'):
+        with _run(_gram_tile, tasks, processes) as results:
+            for t, (G, s) in zip(tiles, results):
+                gram += G
+                for i in range(o):
+                    total[i * m + t] = s[i * np.size(t):(i + 1) * np.size(t)]
+    mean = total / n
+    if fluc:
+        # Gram matrix of X - mean = X (I - 1 1^T / n)
+        gram = gram - np.mean(gram, axis=0)[None, :]
+        gram = gram - np.mean(gram, axis=1)[:, None]
+    # eigenvalue problem, in descending order
+    eigval, eigvec = linalg.eigh(0.5 * (gram + gram.T))
+    idx = eigval.argsort()[::-1]
+    eigval = eigval[idx]
+    eigvec = eigvec[:, idx]
+    num = int(np.sum(eigval > tol * eigval[0]))
+    if nmodes is not None:
+        num = min(num, nmodes)
+    eigval = np.maximum(eigval, 0.0)
+    coeff = np.diag(np.sqrt(eigval)) @ eigvec.T
+    # pass 2: modes, W-orthonormal
+    proj = eigvec[:, :num] / np.sqrt(eigval[:num])
+    phi = np.lib.format.open_memmap(os.path.join(OutFolder, 'phi.npy'),
+                                    mode='w+', dtype=np.float64,
+                                    shape=(o * m, num))
+    tasks = []
+    for t in tiles:
+        tmean = [mean[i * m + t] for i in range(o)] if fluc else None
+        tasks.append((filename, VarList, points[t], steps, tmean, proj))
+    with timer('POD modes'):
+        with _run(_mode_tile, tasks, processes) as results:
+            for t, val in zip(tiles, results):
+                for i in range(o):
+                    phi[i * m + t] = val[i]
+    phi.flush()
+    np.save(os.path.join(OutFolder, 'eigval'), eigval)
+    np.save(os.path.join(OutFolder, 'eigvec'), eigvec)
+    np.save(os.path.join(OutFolder, 'coeff'), coeff)
+    meanflow = store.coordinates(points)
+    for i, var in enumerate(VarList):
+        meanflow[var] = mean[i * m:(i + 1) * m]
+    meanflow.to_hdf(os.path.join(OutFolder, 'Meanflow.h5'), key='w',
+                    format='fixed')
+    return eigval, eigvec, phi, coeff
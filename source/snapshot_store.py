@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:40:08 2026
+    This code for saving a series of snapshots into one HDF5 file
+    1. coordinates of the points are written once (/coords)
+    2. every variable is an extendable array (time, space), chunked along
+    both directions and compressed by blosc:lz4
+    3. a single variable, a subset of points or a time window can be read
+    without loading the rest
+    4. adding a snapshot is an append; access is guarded by a lock file, so
+    several readers may work while snapshots are appended
+@author: weibo
+"""
+
+import os
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import tables
+
+try:
+    import fcntl
+except ImportError:  # no file lock on windows
+    fcntl = None
+
+
+FILTERS = tables.Filters(complevel=5, complib='blosc:lz4', shuffle=True)
+
+
+@contextmanager
+def _lock(filename, exclusive=False):
+    # shared lock for reading, exclusive lock for writing
+    if fcntl is None:
+        yield
+        return
+    with open(filename + '.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class SnapshotStore(object):
+    """Snapshots of the same points saved in one compressed HDF5 file
+
+    Inputs:
+        filename - path of the .h5 file, created by create_store()
+
+    Attributes:
+        coords (names of coordinates), variables (names), times, num_points
+    """
+    def __init__(self, filename):
+        if not os.path.isfile(filename):
+            raise IOError('ERROR: snapshot store does not exist: '
+                          + filename)
+        self.filename = filename
+        with self._open() as h5:
+            self.coords = list(h5.root.coords.attrs.names)
+            self.variables = list(h5.root._v_attrs.variables)
+            self.num_points = h5.root.coords.shape[0]
+            self.chunkshape = h5.root.vars.v0.chunkshape
+
+    @contextmanager
+    def _open(self, mode='r'):
+        with _lock(self.filename, exclusive=(mode != 'r')):
+            h5 = tables.open_file(self.filename, mode=mode)
+            try:
+                yield h5
+            finally:
+                h5.close()
+
+    def _node(self, h5, var):
+        if var not in self.variables:
+            raise KeyError('ERROR: no variable ' + str(var) + ' in '
+                           + self.filename)
+        return h5.get_node('/vars/v%d' % self.variables.index(var))
+
+    @property
+    def times(self):
+        with self._open() as h5:
+            return h5.root.time.read()
+
+    @property
+    def num_snapshots(self):
+        with self._open() as h5:
+            return h5.root.time.nrows
+
+    def coordinates(self, points=None):
+        """coordinates of the points as DataFrame"""
+        with self._open() as h5:
+            xyz = h5.root.coords.read()
+        if points is not None:
+            xyz = xyz[points]
+        return pd.DataFrame(data=xyz, columns=self.coords)
+
+    def points(self, SubZone):
+        """index of points inside SubZone, e.g. [(x1, x2), (y1, y2)] in
+        the order of coordinates"""
+        xyz = self.coordinates().values
+        mask = np.ones(self.num_points, dtype=bool)
+        for i, (v1, v2) in enumerate(SubZone):
+            if v1 is not None:
+                mask &= xyz[:, i] >= v1
+            if v2 is not None:
+                mask &= xyz[:, i] <= v2
+        return np.flatnonzero(mask)
+
+    def steps(self, time=None):
+        """slice of snapshots within time window (t1, t2)"""
+        if time is None:
+            return slice(0, self.num_snapshots)
+        times = self.times
+        i1 = np.searchsorted(times, time[0], side='left')
+        i2 = np.searchsorted(times, time[1], side='right')
+        return slice(int(i1), int(i2))
+
+    def _read(self, arr, steps, points):
+        if points is None:
+            return arr[steps, :]
+        # only chunks containing the points are read
+        points = np.asarray(points)
+        if points.dtype == bool:
+            points = np.flatnonzero(points)
+        order = np.argsort(points, kind='stable')
+        sort_pts = points[order]
+        cs = arr.chunkshape[1]
+        nt = len(range(*steps.indices(arr.nrows)))
+        data = np.empty((nt, np.size(points)), dtype=arr.dtype)
+        chunk = sort_pts // cs
+        bounds = np.flatnonzero(np.diff(chunk)) + 1
+        for pts in np.split(np.arange(np.size(points)), bounds):
+            if np.size(pts) == 0:
+                continue
+            p1 = sort_pts[pts[0]]
+            p2 = sort_pts[pts[-1]] + 1
+            block = arr[steps, p1:p2]
+            data[:, order[pts]] = block[:, sort_pts[pts] - p1]
+        return data
+
+    def read(self, var, points=None, time=None, steps=None):
+        """read one variable, shape (snapshots, points)
+
+        Inputs:
+            var    - name of variable
+            points - index (or boolean mask) of points, default all points
+            time   - time window (t1, t2)
+            steps  - slice of snapshots, used if time is None
+        """
+        if steps is None:
+            steps = self.steps(time)
+        with self._open() as h5:
+            return self._read(self._node(h5, var), steps, points)
+
+    def frame(self, step, VarList=None, points=None):
+        """snapshot as DataFrame (coordinates and variables), like the file
+        saved by plt2pandas.ReadINCAResults"""
+        if VarList is None:
+            VarList = self.variables
+        df = self.coordinates(points)
+        for var in VarList:
+            df[var] = self.read(var, points=points,
+                                steps=slice(step, step + 1))[0]
+        return df
+
+    def snapshots(self, VarList, points=None, time=None, steps=None):
+        """snapshot matrix for POD/DMD, each column is one snapshot and
+        the variables are stacked along rows (u1...um, v1...vm, ...)"""
+        data = [self.read(var, points=points, time=time, steps=steps)
+                for var in VarList]
+        return np.vstack([arr.T for arr in data])
+
+    def append(self, df, time):
+        """append one snapshot (DataFrame or dict of arrays) or several
+        snapshots (arrays of shape (snapshots, points)) at time"""
+        time = np.atleast_1d(np.asarray(time, dtype=np.float64))
+        shape = (np.size(time), self.num_points)
+        # every variable is checked before anything is appended, so a bad
+        # snapshot leaves the store unchanged
+        values = []
+        for var in self.variables:
+            val = np.asarray(df[var])
+            if np.size(val) != shape[0] * shape[1]:
+                raise ValueError('ERROR: snapshot of ' + str(var)
+                                 + ' does not match the points and times '
+                                 'of ' + self.filename)
+            values.append(val.reshape(shape))
+        with self._open('a') as h5:
+            for var, val in zip(self.variables, values):
+                arr = self._node(h5, var)
+                arr.append(val.astype(arr.dtype, copy=False))
+            h5.root.time.append(time)
+            h5.flush()
+
+
+def create_store(filename, coords, VarList, chunks=(16, 8192),
+                 dtype=np.float64, filters=FILTERS):
+    """create an empty snapshot store
+
+    Inputs:
+        coords  - DataFrame of coordinates (e.g. x, y, z) of all points
+        VarList - names of variables to be saved
+        chunks  - chunk size along (time, space)
+    """
+    coords = pd.DataFrame(coords)
+    npts = coords.shape[0]
+    chunks = (int(chunks[0]), int(min(chunks[1], npts)))
+    with _lock(filename, exclusive=True):
+        with tables.open_file(filename, mode='w') as h5:
+            h5.root._v_attrs.variables = list(VarList)
+            arr = h5.create_carray('/', 'coords', obj=coords.values,
+                                   filters=filters)
+            arr.attrs.names = list(coords.columns)
+            h5.create_earray('/', 'time', atom=tables.Float64Atom(),
+                             shape=(0,))
+            h5.create_group('/', 'vars')
+            # variable names like "<u`u`>" are not valid node names
+            for i, var in enumerate(VarList):
+                arr = h5.create_earray('/vars', 'v%d' % i,
+                                       atom=tables.Atom.from_dtype(
+                                           np.dtype(dtype)),
+                                       shape=(0, npts), chunkshape=chunks,
+                                       filters=filters)
+                arr.attrs.name = var
+    return SnapshotStore(filename)
+
+
+def store_from_hdf(InFolder, filename, VarList, coords=['x', 'y', 'z'],
+                   times=None, **kwargs):
+    """convert a series of snapshots (one .h5 file per time, sorted by name)
+    into a snapshot store"""
+    dirs = sorted(os.listdir(InFolder))
+    if times is None:
+        times = np.arange(np.size(dirs), dtype=np.float64)
+    if np.size(dirs) != np.size(times):
+        raise ValueError('ERROR: the NO of snapshots is not equal to the NO '
+                         'of time points')
+    store = None
+    for i, name in enumerate(dirs):
+        df = pd.read_hdf(os.path.join(InFolder, name))
+        if store is None:
+            store = create_store(filename, df[coords], VarList, **kwargs)
+        store.append(df, times[i])
+    return store
@@ -1,4 +1,4 @@
-from .dmd import DMD
+from .dmd import DMD, DMDResult, Reconstruction
 from .util import to_data, to_snaps
 from .sparse import SparseDMD
 from .plots import SparsePlots
@@ -0,0 +1,241 @@
+"""ADMM engine of sparsity-promoting DMD, shared by sparse.SparseDMD and
+DMD.DMD.
+
+The gamma-parameterized problem
+
+    minimize J(x) + gamma * sum(|x|),  J(x) = x* P x - q* x - x* q + s
+
+is solved by ADMM with the cholesky factor C of Prho = P + rho/2 I.
+
+    admm_solve - the ADMM loop, the convergence (four BLAS norms) is
+                 tested every `check` steps; kernel='numba' runs the
+                 whole loop compiled by numba (if installed), where the
+                 thresholding, multiplier update and residual norms are
+                 fused into a single pass per step
+    benchmark  - compares the engine with the reference loop on
+                 synthetic DMD problems
+"""
+import time
+import warnings
+import numpy as np
+import scipy.linalg as linalg
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _admm_kernel(C, q, a, rho, z, y, maxiter, eps_abs, eps_rel, check):
+    # the whole ADMM in loops, compiled by numba; the triangular solves
+    # replace potrs, thresholding, multiplier update and the norms of
+    # the convergence test are done in one pass
+    n = q.shape[0]
+    root_n = np.sqrt(n)
+    w = np.empty(n, dtype=np.complex128)
+    x = np.empty(n, dtype=np.complex128)
+    znew = np.empty(n, dtype=np.complex128)
+    for step in range(maxiter):
+        # C* w = q + rho/2 (z - y/rho)
+        for i in range(n):
+            acc = q[i] + 0.5 * rho * z[i] - 0.5 * y[i]
+            for k in range(i):
+                acc -= np.conj(C[k, i]) * w[k]
+            w[i] = acc / np.conj(C[i, i])
+        # C x = w
+        for i in range(n - 1, -1, -1):
+            acc = w[i]
+            for k in range(i + 1, n):
+                acc -= C[i, k] * x[k]
+            x[i] = acc / C[i, i]
+        prim = 0.0
+        dual = 0.0
+        nx = 0.0
+        nz = 0.0
+        ny = 0.0
+        for i in range(n):
+            v = x[i] + y[i] / rho
+            abs_v = np.abs(v)
+            if abs_v > a:
+                zi = (1.0 - a / abs_v) * v
+            else:
+                zi = 0.0 * v
+            d = x[i] - zi
+            y[i] = y[i] + rho * d
+            prim += d.real ** 2 + d.imag ** 2
+            d = zi - z[i]
+            dual += d.real ** 2 + d.imag ** 2
+            nx += x[i].real ** 2 + x[i].imag ** 2
+            nz += zi.real ** 2 + zi.imag ** 2
+            ny += y[i].real ** 2 + y[i].imag ** 2
+            znew[i] = zi
+        if (step + 1) % check == 0:
+            eps_prim = root_n * eps_abs \
+                + eps_rel * max(np.sqrt(nx), np.sqrt(nz))
+            eps_dual = root_n * eps_abs + eps_rel * np.sqrt(ny)
+            if np.sqrt(prim) < eps_prim and rho * np.sqrt(dual) < eps_dual:
+                return z, y, step + 1
+        for i in range(n):
+            z[i] = znew[i]
+    return z, y, maxiter
+
+
+_compiled = []
+
+
+def compiled_kernel():
+    """numba version of the ADMM loop, None if numba is not installed"""
+    if numba is None:
+        return None
+    if len(_compiled) == 0:
+        _compiled.append(numba.njit(cache=True)(_admm_kernel))
+    return _compiled[0]
+
+
+def admm_solve(C, q, gamma, rho, z, y, maxiter=10000, eps_abs=1e-6,
+               eps_rel=1e-4, check=1, kernel=None):
+    """ADMM of the gamma-parameterized problem, C is the (upper)
+    cholesky factor of Prho = P + rho/2 I, z and y the initial
+    amplitudes and Lagrange multiplier.
+
+    check  - test the convergence every check steps, check=1 gives the
+             output of the matlab code
+    kernel - None (numpy and LAPACK potrs) or 'numba'
+
+    Returns z, y
+    """
+    a = (gamma / rho)
+    if kernel == 'numba':
+        func = compiled_kernel()
+        if func is not None:
+            C = np.ascontiguousarray(C, dtype=np.complex128)
+            z, y, steps = func(C, np.asarray(q, dtype=np.complex128), a,
+                               rho, np.array(z, dtype=np.complex128),
+                               np.array(y, dtype=np.complex128), maxiter,
+                               eps_abs, eps_rel, check)
+            return z, y
+        warnings.warn('numba is not available, the numpy ADMM is used')
+    elif kernel is not None:
+        raise ValueError('ERROR: unknown ADMM kernel ' + str(kernel))
+
+    # link directly to LAPACK fortran solver for positive
+    # definite symmetric system with precomputed cholesky decomp:
+    potrs, = linalg.get_lapack_funcs(('potrs',), arrays=(C, q))
+    # simple norm of a 1d vector, called directly from BLAS
+    norm, = linalg.get_blas_funcs(('nrm2',), arrays=(q,))
+    # square root outside of the loop
+    root_n = np.sqrt(len(q))
+
+    for ADMMstep in range(maxiter):
+        # ## x-minimization step (alpha minimisation)
+        qs = q + (rho / 2.) * z - 0.5 * y
+        # Solve Prho x = qs, using fact that Prho is hermitian and
+        # positive definite and assuming it is well behaved (no
+        # inf or nan).
+        xnew = potrs(C, qs, lower=False, overwrite_b=True)[0]
+
+        # ## z-minimization step (beta minimisation)
+        v = xnew + (1 / rho) * y
+        # Soft-thresholding of v (v is complex, as the matlab source),
+        # zero for |v| <= a without dividing by |v| = 0
+        if a > 0:
+            znew = (1 - a / np.maximum(np.abs(v), a)) * v
+        else:
+            znew = v
+
+        # ## Lagrange multiplier update step
+        d = xnew - znew
+        y = y + rho * d
+
+        # ## Test convergence of admm every check steps
+        if (ADMMstep + 1) % check == 0:
+            # Primal and dual residuals
+            res_prim = norm(d)
+            res_dual = rho * norm(znew - z)
+            # Stopping criteria
+            eps_prim = root_n * eps_abs \
+                + eps_rel * max(norm(xnew), norm(znew))
+            eps_dual = root_n * eps_abs + eps_rel * norm(y)
+            if (res_prim < eps_prim) & (res_dual < eps_dual):
+                return z, y
+        z = znew
+
+    return z, y
+
+
+def _admm_reference(C, q, gamma, rho, z, y, maxiter=10000, eps_abs=1e-6,
+                    eps_rel=1e-4):
+    # the loop of SparseDMD.admm before the shared engine, for benchmark
+    a = (gamma / rho)
+    potrs, = linalg.get_lapack_funcs(('potrs',), arrays=(C, q))
+    norm, = linalg.get_blas_funcs(('nrm2',), arrays=(q,))
+    root_n = np.sqrt(len(q))
+    for ADMMstep in range(maxiter):
+        u = z - (1. / rho) * y
+        qs = q + (rho / 2.) * u
+        xnew = potrs(C, qs, lower=False, overwrite_b=False)[0]
+        v = xnew + (1 / rho) * y
+        abs_v = np.abs(v)
+        znew = ((1 - a / abs_v) * v) * (abs_v > a)
+        y = y + rho * (xnew - znew)
+        res_prim = norm(xnew - znew)
+        res_dual = rho * norm(znew - z)
+        eps_prim = root_n * eps_abs + eps_rel * max(norm(xnew), norm(znew))
+        eps_dual = root_n * eps_abs + eps_rel * norm(y)
+        if (res_prim < eps_prim) & (res_dual < eps_dual):
+            return z, y
+        else:
+            z = znew
+    return z, y
+
+
+def synthetic_problem(r=100, m=2000, noise=1e-2, seed=0):
+    """P, q, s of the DMD of random oscillating snapshots with about r
+    modes (r + 1 snapshots)"""
+    from .dmd import DMD
+    rng = np.random.default_rng(seed)
+    t = np.arange(r + 1) * 0.1
+    k = np.arange(r // 2)[:, None]
+    dyn = np.vstack((np.cos((k + 1) * 0.37 * t + k),
+                     np.sin((k + 1) * 0.37 * t + k))) \
+        * 0.97 ** np.vstack((k, k))
+    X = rng.standard_normal((m, np.shape(dyn)[0])) @ dyn \
+        + noise * rng.standard_normal((m, r + 1))
+    dmd = DMD(X)
+    dmd.compute()
+    return dmd.P, dmd.q, dmd.s
+
+
+def benchmark(sizes=(50, 200), gammas=(10., 1000.), checks=(1, 10),
+              rho=1., maxiter=10000):
+    """time of the reference loop and of the engine (numpy with every
+    check interval, numba if installed) on synthetic problems"""
+    for r in sizes:
+        P, q, s = synthetic_problem(r)
+        n = len(q)
+        C = linalg.cholesky(P + (rho / 2.) * np.identity(n), lower=False)
+        for gamma in gammas:
+            t0 = time.time()
+            zref = _admm_reference(C, q, gamma, rho, np.zeros(n),
+                                   np.zeros(n), maxiter)[0]
+            tref = time.time() - t0
+            print('r=%d gamma=%g reference: %0.3fs, Nz=%d'
+                  % (n, gamma, tref, np.sum(zref != 0)))
+            runs = [(None, c) for c in checks]
+            if numba is not None:
+                compiled_kernel()(C.astype(np.complex128),
+                                  q.astype(np.complex128), 1.0, rho,
+                                  np.zeros(n, np.complex128),
+                                  np.zeros(n, np.complex128), 1, 1e-6,
+                                  1e-4, 1)  # compile
+                runs += [('numba', c) for c in checks]
+            for kernel, check in runs:
+                t0 = time.time()
+                z = admm_solve(C, q, gamma, rho, np.zeros(n), np.zeros(n),
+                               maxiter, check=check, kernel=kernel)[0]
+                dt = time.time() - t0
+                print('    %s check=%d: %0.3fs (x%0.1f), Nz=%d, '
+                      'max|z-zref|=%0.1e'
+                      % (kernel or 'numpy', check, dt, tref / dt,
+                         np.sum(z != 0), np.max(np.abs(z - zref))))
+
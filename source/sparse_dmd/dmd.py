@@ -1,5 +1,7 @@
 from collections import namedtuple
 
+import os
+import hashlib
 import numpy as np
 import scipy.linalg as linalg
 import warnings
@@ -7,9 +9,63 @@ import sys
 
 from . import util
 
+try:
+    import tables
+except ImportError:
+    tables = None
+
+reduction_keys = ('UstarX1', 'S', 'V', 'U', 'X0', 'X1')
+Reduction = namedtuple('DMDReduction', reduction_keys)
+
+
+def snapshot_hash(snapshots, block=4096):
+    """hash of the snapshot matrix (shape, dtype and values), read block
+    by block of rows"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update((str(np.shape(snapshots)) + str(snapshots.dtype)).encode())
+    for i in range(0, np.shape(snapshots)[0], block):
+        h.update(np.ascontiguousarray(snapshots[i:i + block]).tobytes())
+    return h.hexdigest()
+
+
+def cached_reduction(snapshots, svd=None, cache=None):
+    """DMD.dmd_reduction of the snapshots, kept in the folder cache
+    under the hash of the snapshots (and of the svd, which must have a
+    stable repr like low_rank.SVDBackend). U is loaded memory-mapped.
+    No cache if cache is None.
+    """
+    if cache is None:
+        return DMD.dmd_reduction(snapshots, svd)
+    key = snapshot_hash(snapshots)
+    if svd is not None:
+        key = key + '_' + hashlib.md5(repr(svd).encode()).hexdigest()[:8]
+    folder = os.path.join(cache, key)
+    names = ('U', 'S', 'V', 'UstarX1')
+    if all(os.path.exists(os.path.join(folder, nm + '.npy'))
+           for nm in names):
+        U = np.load(os.path.join(folder, 'U.npy'), mmap_mode='r')
+        S, V, UstarX1 = [np.load(os.path.join(folder, nm + '.npy'))
+                         for nm in names[1:]]
+        return Reduction(UstarX1=UstarX1, S=S, V=V, U=U,
+                         X0=snapshots[:, :-1], X1=snapshots[:, 1:])
+    reduction = DMD.dmd_reduction(snapshots, svd)
+    # written aside and renamed, a crashed run leaves no partial entry
+    temp = folder + '.' + str(os.getpid())
+    os.makedirs(temp, exist_ok=True)
+    for nm in names:
+        np.save(os.path.join(temp, nm), getattr(reduction, nm))
+    try:
+        os.replace(temp, folder)
+    except OSError:  # written by another run meanwhile
+        for nm in names:
+            os.remove(os.path.join(temp, nm + '.npy'))
+        os.rmdir(temp)
+    return reduction
+
 
 class DMD(object):
-    def __init__(self, snapshots=None, dt=1, fluc=False, axis=-1):
+    def __init__(self, snapshots=None, dt=1, fluc=False, axis=-1, svd=None,
+                 cache=None):
         """Dynamic Mode Decomposition with optimal amplitudes.
 
         Arguments
@@ -22,15 +78,23 @@ class DMD(object):
                    you can supply the matrix of snapshots as
                    data.
 
+            svd - truncated SVD of X0 (e.g. low_rank.SVDBackend),
+                  economy SVD if None
+
+            cache - folder of the reductions kept on disk (keyed by
+                    the hash of the snapshots), no cache if None
+
         Methods
             compute - perform the decomposition on the snapshots and
                       calculate the modes, frequencies and amplitudes
             dmd_reduction - compute the matrices U*X1, S and V that
                             represent the input snapshots
             init - perform the dmd computation given a reduction
+            mode_blocks - the modes block by block of columns
+            save - write the results to one file, see DMDResult
 
         Attributes
-            modes - the dmd modes
+            modes - the dmd modes, computed on first access
             amplitudes - corresponding optimal amplitudes
             ritz_values - corresponding ritz values
             frequencies - corresponding frequencies
@@ -39,11 +103,12 @@ class DMD(object):
             self.data_shape = snapshots.shape
             self.snapshots = snapshots
             # self.snapshots = util.to_snaps(snapshots, axis=axis)
-        if self.data_shape[0] < self.data_shape[1]:
-            sys.exit("Input snapshots error: time series must be in column!")
+            if self.data_shape[0] < self.data_shape[1]:
+                sys.exit("Input snapshots error: "
+                         + "time series must be in column!")
 
         self.fluc = fluc
-        if self.fluc is True:
+        if self.fluc is True and snapshots is not None:
             self.snapshots = self.snapshots - np.transpose(
                 np.tile(
                     np.mean(self.snapshots, axis=1), (self.data_shape[1], 1)))
@@ -53,12 +118,14 @@ class DMD(object):
         self.computed = False
 
         self.keep_reduction = True
+        self.svd = svd
+        self.cache = cache
+        self._modes = None
 
     def compute(self):
         reduction = self.reduction
         self.init(reduction.UstarX1, reduction.S, reduction.V)
 
-        self.modes = np.dot(reduction.U, self.Ydmd)
         self.eigval = self.Edmd
         self.frequencies = np.log(self.eigval) / self.dt
         self.beta = np.real(self.frequencies)
@@ -67,16 +134,76 @@ class DMD(object):
         self.amplitudes = self.xdmd
         self.computed = True
 
+    @property
+    def modes(self):
+        """the dmd modes U Ydmd, None before compute"""
+        if self._modes is None and hasattr(self, 'Ydmd') \
+                and (hasattr(self, '_reduction')
+                     or hasattr(self, 'snapshots')):
+            self._modes = np.dot(self.reduction.U, self.Ydmd)
+        return self._modes
+
+    @modes.setter
+    def modes(self, modes):
+        self._modes = modes
+
+    def mode_blocks(self, block=256, ind=None):
+        """yield (columns, modes[:, columns]) for blocks of block modes
+        (among ind, default all), without forming all the modes"""
+        if ind is None:
+            ind = np.arange(np.shape(self.Ydmd)[1])
+        for i in range(0, np.size(ind), block):
+            cols = ind[i:i + block]
+            if self._modes is not None:
+                yield cols, self._modes[:, cols]
+            else:
+                yield cols, np.dot(self.reduction.U, self.Ydmd[:, cols])
+
+    def mode_columns(self, ind):
+        """modes[:, ind], without forming the other modes"""
+        if self._modes is not None:
+            return self._modes[:, ind]
+        return np.dot(self.reduction.U, self.Ydmd[:, ind])
+
+    def reconstruction(self, amplitudes=None, ind=None, real=True):
+        """modes diag(amplitudes) Vand (of the modes ind, default all) as
+        a Reconstruction, computed on demand by frames or tiles"""
+        if amplitudes is None:
+            amplitudes = self.amplitudes
+        if ind is None:
+            ind = np.arange(np.size(self.eigval))
+        if self._modes is not None:
+            modes = self._modes[:, ind]
+        else:
+            modes = (self.reduction.U, self.Ydmd[:, ind])
+        return Reconstruction(modes, np.asarray(amplitudes)[ind],
+                              self.eigval[ind], np.shape(self.Vand)[1],
+                              real=real)
+
+    def save(self, filename, block=256, sparse=None, **extra):
+        """write modes, eigval, amplitudes, omega, beta (and the sparse
+        answer, extra arrays) to filename, see save_result"""
+        save_result(filename, self.reduction.U, self.Ydmd, self.eigval,
+                    self.amplitudes, dt=self.dt, block=block, sparse=sparse,
+                    omega=self.omega, beta=self.beta, **extra)
+
     @property
     def reduction(self):
         """Compute the reduced form of the data snapshots"""
         if not hasattr(self, '_reduction') and self.keep_reduction:
-            self._reduction = self.dmd_reduction(self.snapshots)
+            self._reduction = cached_reduction(self.snapshots, self.svd,
+                                               self.cache)
             return self._reduction
         elif hasattr(self, '_reduction'):
             return self._reduction
         else:
-            return self.dmd_reduction(self.snapshots)
+            return cached_reduction(self.snapshots, self.svd, self.cache)
+
+    @reduction.setter
+    def reduction(self, reduction):
+        """a reduction computed elsewhere, e.g. by
+        low_rank.IncrementalSVD.reduction()"""
+        self._reduction = reduction
 
     @reduction.deleter
     def reduction(self):
@@ -84,7 +211,7 @@ class DMD(object):
             del self._reduction
 
     @staticmethod
-    def dmd_reduction(snapshots):
+    def dmd_reduction(snapshots, svd=None):
         """Takes a series of snapshots and splits into two subsequent
         series, X0, X1, where
 
@@ -94,6 +221,9 @@ class DMD(object):
 
             X0 = U S V*
 
+        or the truncated one if svd (a function returning U, S, Vh)
+        is given
+
         returns an object with attributes
 
             UstarX1 - U* X1, the left singular vectors (POD modes)
@@ -108,7 +238,10 @@ class DMD(object):
         X1 = snapshots[:, 1:]
 
         # economy size SVD of X0
-        U, S, Vh = linalg.svd(X0, full_matrices=False)
+        if svd is None:
+            U, S, Vh = linalg.svd(X0, full_matrices=False)
+        else:
+            U, S, Vh = svd(X0)
         # n.b. differences with matlab svd:
         # 1. S is a 1d array of diagonal elements
         # 2. Vh == V': the matlab version returns V for X = U S V',
@@ -129,9 +262,6 @@ class DMD(object):
         # Determine matrix UstarX1
         UstarX1 = np.dot(U.T.conj(), X1)   # conjugate transpose (U' in matlab)
 
-        reduction_keys = ('UstarX1', 'S', 'V', 'U', 'X0', 'X1')
-        Reduction = namedtuple('DMDReduction', reduction_keys)
-
         return Reduction(UstarX1=UstarX1, S=S, V=V, U=U, X0=X0, X1=X1)
 
     def init(self, UstarX1=None, S=None, V=None):
@@ -159,6 +289,8 @@ class DMD(object):
 
         # eigenvalue decomposition of Fdmd
         self.Edmd, self.Ydmd = linalg.eig(self.Fdmd)
+        # the modes U Ydmd are formed on demand
+        self._modes = None
 
         # Form Vandermonde matrix
         # Vand = Edmd ** np.arange(N)[None].T
@@ -191,11 +323,11 @@ class DMD(object):
 
     def reduce(self, percent):
         ind = np.where(np.abs(self.eigval) > percent)[0]
-        num = np.shape(self.modes)[0]
+        num = np.shape(self.reduction.U)[0]
         reduced = ReducedDMD(num, np.size(ind))
         reduced.ind = ind
         reduced.eigval = self.eigval[ind]
-        reduced.modes = self.modes[:, ind]
+        reduced.modes = self.mode_columns(ind)
         reduced.omega =  self.omega[ind]
         reduced.beta = self.beta[ind]
         reduced.amplitudes = self.amplitudes[ind]
@@ -221,8 +353,8 @@ class DMD(object):
 class ReducedDMD(object):
 
     def __init__(self, num1, num2):
-        self.eigval = np.zeros(num2, dtype=np.complex)
-        self.modes = np.zeros((num1, num2), dtype=np.complex)
+        self.eigval = np.zeros(num2, dtype=complex)
+        self.modes = np.zeros((num1, num2), dtype=complex)
         self.omega = np.zeros(num2)
         self.beta = np.zeros(num2)
         self.amplitudes = np.zeros(num2)
@@ -245,3 +377,221 @@ class ReducedDMD(object):
         self.computed = True
 
 
+class Reconstruction(object):
+    """modes diag(amplitudes) Vand, only the requested frames (time steps)
+    or tiles (rows) are computed, the (space x time) array is not formed
+
+        rec = dmd.reconstruction()
+        rec.frame(10)              # snapshot 10
+        rec[rows, 0:50]            # a tile of rows and steps
+        for step, frame in rec.frames(block=16):
+            ...
+        rec.write(func)            # func(step, frame) for every frame
+        rec.to_store(store, VarList, dt)  # appended to a SnapshotStore
+
+    Inputs:
+        modes - (m, k) array (also DMDResult.modes), or a pair (U, Y) of
+                the modes U Y which are then never formed
+        amplitudes, eigval - of the k modes
+        n     - NO of time steps (snapshots)
+        mean  - added to every frame (e.g. the mean flow), optional
+        real  - real part only (real data, modes in conjugate pairs)
+    """
+    def __init__(self, modes, amplitudes, eigval, n, mean=None, real=True):
+        self.modes = modes
+        self.amplitudes = np.asarray(amplitudes)
+        self.eigval = np.asarray(eigval)
+        self.n = n
+        self.mean = mean
+        self.real = real
+
+    @property
+    def shape(self):
+        if isinstance(self.modes, tuple):
+            return (np.shape(self.modes[0])[0], self.n)
+        return (np.shape(self.modes)[0], self.n)
+
+    def dynamics(self, steps):
+        """diag(amplitudes) Vand[:, steps]"""
+        steps = np.atleast_1d(np.arange(self.n)[steps])
+        return self.amplitudes[:, None] \
+            * self.eigval[:, None] ** steps[None, :]
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        rows, steps = key
+        dyn = self.dynamics(steps)
+        if isinstance(self.modes, tuple):
+            U, Y = self.modes
+            tile = np.dot(U[rows], np.dot(Y, dyn))
+        else:
+            tile = np.dot(self.modes[rows, :], dyn)
+        if self.real:
+            tile = tile.real
+        if self.mean is not None:
+            tile = tile + np.reshape(np.asarray(self.mean)[rows], (-1, 1))
+        if np.ndim(steps) == 0 and not isinstance(steps, slice):
+            return tile[:, 0]
+        return tile
+
+    def __array__(self, dtype=None, copy=None):
+        # the full array, only for small cases
+        val = self[:, :]
+        return val if dtype is None else val.astype(dtype)
+
+    def frame(self, step, rows=slice(None)):
+        """snapshot at time step step"""
+        return self[rows, step]
+
+    def frames(self, steps=None, rows=slice(None), block=16):
+        """yield (step, frame) for steps (default all), block frames are
+        computed at a time"""
+        steps = np.arange(self.n) if steps is None \
+            else np.arange(self.n)[steps]
+        for i in range(0, np.size(steps), block):
+            tile = self[rows, steps[i:i + block]]
+            for j, step in enumerate(steps[i:i + block]):
+                yield step, tile[:, j]
+
+    def tiles(self, tile=8192, steps=slice(None)):
+        """yield (rows, reconstruction[rows, steps]) tile by tile of
+        rows"""
+        for i in range(0, self.shape[0], tile):
+            rows = slice(i, min(i + tile, self.shape[0]))
+            yield rows, self[rows, steps]
+
+    def write(self, func, steps=None, rows=slice(None), block=16):
+        """func(step, frame) for every frame, e.g. to write Tecplot files
+        by plt2pandas.frame2tec3d"""
+        for step, frame in self.frames(steps, rows, block):
+            func(step, frame)
+
+    def to_store(self, store, VarList, dt=1, t0=0.0, steps=None, block=16):
+        """append the frames to a snapshot_store.SnapshotStore, the
+        variables VarList are stacked along rows (as the snapshots)"""
+        steps = np.arange(self.n) if steps is None \
+            else np.arange(self.n)[steps]
+        o = len(VarList)
+        for i in range(0, np.size(steps), block):
+            tile = self[:, steps[i:i + block]]
+            m = np.shape(tile)[0] // o
+            store.append({var: tile[k * m:(k + 1) * m].T
+                          for k, var in enumerate(VarList)},
+                         t0 + dt * steps[i:i + block])
+
+
+def save_result(filename, U, Ydmd, eigval, amplitudes, dt=1, block=256,
+                sparse=None, **extra):
+    """Write the DMD results to one HDF5 file (PyTables, chunked and
+    compressed), the modes U Ydmd are formed and written block by block
+    of columns
+
+    sparse - sparse.SparseAnswer of SPDMD (gamma, Nz, xsp, xpol, ...)
+    extra  - other arrays, e.g. omega=, beta=
+
+    The file is written aside and renamed at the end. Read it with
+    DMDResult.
+    """
+    if tables is None:
+        raise ImportError('ERROR: PyTables is required to save DMD results')
+    m, r = np.shape(U)[0], np.shape(Ydmd)[1]
+    filters = tables.Filters(complevel=5, complib='blosc:lz4', shuffle=True)
+    temp = filename + '.tmp'
+    with tables.open_file(temp, mode='w') as f:
+        f.root._v_attrs.dt = dt
+        modes = f.create_carray(
+            f.root, 'modes', tables.ComplexAtom(itemsize=16), shape=(m, r),
+            filters=filters,
+            chunkshape=(min(m, 1024), max(1, min(block, r))))
+        for i in range(0, r, block):
+            modes[:, i:i + block] = np.dot(U, Ydmd[:, i:i + block])
+        f.create_array(f.root, 'eigval', np.asarray(eigval))
+        f.create_array(f.root, 'amplitudes', np.asarray(amplitudes))
+        for key, val in extra.items():
+            f.create_array(f.root, key, np.asarray(val))
+        if sparse is not None:
+            group = f.create_group(f.root, 'sparse')
+            for key in ('gamma', 'Nz', 'Jsp', 'Jpol', 'Ploss', 'xsp',
+                        'xpol'):
+                f.create_array(group, key, np.asarray(getattr(sparse, key)))
+    os.replace(temp, filename)
+
+
+class LazyModes(object):
+    """modes in a DMD result file, read on slicing (modes[:, ind])"""
+    def __init__(self, filename):
+        self.filename = filename
+        with tables.open_file(filename, mode='r') as f:
+            self.shape = tuple(int(i) for i in f.root.modes.shape)
+        self.dtype = np.dtype(complex)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        rows, cols = key
+        with tables.open_file(self.filename, mode='r') as f:
+            if np.ndim(cols) == 0 or isinstance(cols, slice):
+                return f.root.modes[rows, cols]
+            cols = np.asarray(cols)
+            if cols.dtype == bool:
+                cols = np.flatnonzero(cols)
+            # a point selection of unique, sorted columns
+            uniq, inv = np.unique(cols, return_inverse=True)
+            return f.root.modes[rows, uniq][..., inv]
+
+    def __array__(self, dtype=None, copy=None):
+        val = self[:, :]
+        return val if dtype is None else val.astype(dtype)
+
+    def blocks(self, block=256):
+        """yield (columns, modes[:, columns]) block by block"""
+        for i in range(0, self.shape[1], block):
+            cols = np.arange(i, min(i + block, self.shape[1]))
+            yield cols, self[:, i:i + block]
+
+
+class DMDResult(object):
+    """DMD results written by save_result (DMD.save), the modes are read
+    lazily by slice
+
+        res = DMDResult(path3D + 'dmd.h5')
+        res.eigval, res.amplitudes, res.omega, res.beta, res.dt
+        res.modes[:, num]   # only these modes are read
+        res.sparse          # sparse.SparseAnswer, None if not saved
+    """
+    def __init__(self, filename):
+        if tables is None:
+            raise ImportError('ERROR: PyTables is required to read DMD '
+                              'results')
+        self.filename = filename
+        self.sparse = None
+        with tables.open_file(filename, mode='r') as f:
+            self.dt = f.root._v_attrs.dt
+            for node in f.root._f_iter_nodes(classname='Array'):
+                if node.name != 'modes':
+                    setattr(self, node.name, node.read())
+            if 'sparse' in f.root:
+                from .sparse import SparseAnswer
+                group = f.root.sparse
+                self.sparse = SparseAnswer(np.shape(group.xsp)[0],
+                                           np.shape(group.xsp)[1])
+                for node in group._f_iter_nodes(classname='Array'):
+                    setattr(self.sparse, node.name, node.read())
+        self.modes = LazyModes(filename)
+        self.frequencies = np.log(self.eigval) / self.dt
+
+    def mode_blocks(self, block=256):
+        return self.modes.blocks(block)
+
+    def reduce(self, percent):
+        """modes with |eigval| > percent, as DMD.reduce"""
+        ind = np.where(np.abs(self.eigval) > percent)[0]
+        reduced = ReducedDMD(0, 0)
+        reduced.ind = ind
+        reduced.eigval = self.eigval[ind]
+        reduced.modes = self.modes[:, ind]
+        reduced.omega = np.imag(self.frequencies[ind])
+        reduced.beta = np.real(self.frequencies[ind])
+        reduced.amplitudes = self.amplitudes[ind]
+        return reduced
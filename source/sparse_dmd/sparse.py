@@ -1,14 +1,226 @@
+import warnings
 import numpy as np
 import scipy.linalg as linalg
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
 # from progressbar import ProgressBar, Percentage, Bar
 
-from .dmd import DMD
+from .dmd import DMD, Reconstruction
 from .util import to_data
+from .admm import admm_solve
+
+
+def kkt_solve(P, q, z):
+    """Polishing of the sparse vector z. Seeks solution to
+    E^T z = 0
+    """
+    n = len(q)
+    # indices of zero elements of z (i.e. amplitudes that
+    # we are ignoring)
+    ind_zero = abs(z) < 1E-12
+
+    # number of zero elements
+    m = ind_zero.sum()
+
+    # Form the constraint matrix E for E^T x = 0
+    E = np.identity(n)[:, ind_zero]
+    # n.b. we don't form the sparse matrix as the original
+    # matlab does as it doesn't seem to affect the
+    # computation speed or the output.
+
+    # Form KKT system for the optimality conditions
+    KKT = np.vstack((np.hstack((P, E)),
+                     np.hstack((E.T.conj(), np.zeros((m, m))))
+                     ))
+    rhs = np.hstack((q, np.zeros(m)))
+
+    # Solve KKT system
+    return linalg.solve(KKT, rhs)
+
+
+def residual(P, q, s, x):
+    """J(x) = x* P x - 2 Re(q* x) + s"""
+    x_Px = np.dot(np.dot(x.T.conj(), P), x)
+    q_x = np.dot(q.T.conj(), x)
+    return x_Px.real - 2 * q_x.real + s
+
+
+def optimize_gamma(P, q, s, C, gamma, rho, maxiter=10000, eps_abs=1e-6,
+                   eps_rel=1e-4, z0=None, y0=None, check=1, kernel=None):
+    """ADMM and polishing for one gamma, see SparseDMD.optimize_gamma.
+    The ADMM starts from z0, y0 (zeros by default); the final Lagrange
+    multiplier is returned as 'y' for a warm start."""
+    n = len(q)
+    if z0 is None:
+        z0 = np.zeros(n)  # initial amplitudes
+    if y0 is None:
+        y0 = np.zeros(n)  # Lagrange multiplier
+    z, y = admm_solve(C, q, gamma, rho, z0, y0, maxiter, eps_abs, eps_rel,
+                      check, kernel)
+    xpol = kkt_solve(P, q, z)[:n]
+    Jpol = residual(P, q, s, xpol)
+    return {'xsp':   z,
+            'Nz':    (z != 0).sum(),
+            'Jsp':   residual(P, q, s, z),
+            'xpol':  xpol,
+            'Jpol':  Jpol,
+            'Ploss': 100 * np.sqrt(max(Jpol, 0.) / s),
+            'y':     y,
+            }
+
+
+# problem shared by the workers of gamma_sweep, set once per worker
+_sweep = {}
+
+
+def _init_sweep(state):
+    _sweep.clear()
+    _sweep.update(state)
+
+
+def _sweep_chunk(gammas):
+    # gammas of one task one after another, warm started if required
+    st = _sweep
+    z = y = None
+    rets = []
+    for gamma in gammas:
+        ret = optimize_gamma(st['P'], st['q'], st['s'], st['C'], gamma,
+                             st['rho'], st['maxiter'], st['eps_abs'],
+                             st['eps_rel'], z0=z, y0=y, check=st['check'],
+                             kernel=st['kernel'])
+        if st['warm']:
+            z, y = ret['xsp'], ret['y']
+        rets.append(ret)
+    return rets
+
+
+def gamma_sweep(P, q, s, gammaval, rho=1, maxiter=10000, eps_abs=1e-6,
+                eps_rel=1e-4, processes=1, warm=False, threads=False,
+                check=1, kernel=None):
+    """ADMM and polishing for every gamma of gammaval
+
+    Inputs:
+        P, q, s   - J(x) = x* P x - q* x - x* q + s
+        processes - NO of workers, every gamma is an independent task
+        warm      - start every gamma from the solution (amplitudes and
+                    Lagrange multiplier) of the previous one, the grid is
+                    then split in one contiguous part per worker
+        threads   - threads instead of processes
+        check, kernel - see admm.admm_solve
+
+    The cholesky factor of Prho = P + rho/2 I is computed once and sent
+    to every worker once.
+    Return: list of the results of optimize_gamma
+    """
+    n = len(q)
+    C = linalg.cholesky(P + (rho / 2.) * np.identity(n), lower=False)
+    state = {'P': P, 'q': q, 's': s, 'C': C, 'rho': rho,
+             'maxiter': maxiter, 'eps_abs': eps_abs, 'eps_rel': eps_rel,
+             'warm': warm, 'check': check, 'kernel': kernel}
+    gammaval = np.asarray(gammaval)
+    if processes == 1:
+        _init_sweep(state)
+        return _sweep_chunk(gammaval)
+    if warm:
+        chunks = np.array_split(gammaval, min(processes, np.size(gammaval)))
+    else:
+        chunks = [[gamma] for gamma in gammaval]
+    PoolClass = ThreadPool if threads else Pool
+    with PoolClass(processes=processes, initializer=_init_sweep,
+                   initargs=(state,)) as pool:
+        results = pool.map(_sweep_chunk, chunks)
+    return [ret for rets in results for ret in rets]
+
+
+def gamma_search(P, q, s, nmodes=None, ploss=None, gamma0=None, factor=2.,
+                 rho=1, maxiter=10000, eps_abs=1e-6, eps_rel=1e-4,
+                 maxbisect=30, rtol=1e-3, check=1, kernel=None):
+    """Continuation in gamma to find the amplitudes with nmodes nonzero
+    modes, or the sparsest ones with a performance loss <= ploss
+
+    gamma is multiplied by factor from gamma0 (default 1e-3 max|q|),
+    every ADMM is warm started from the previous solution, until the
+    target is passed or all amplitudes are zero; then the bracket is
+    bisected (in log scale) until Nz == nmodes or the bracket is
+    narrower than rtol.
+
+    Return: list of the results of optimize_gamma (with 'gamma') of every
+    gamma tried, sorted by gamma, and the index of the answer
+    """
+    if (nmodes is None) == (ploss is None):
+        raise ValueError('ERROR: give either nmodes or ploss')
+    n = len(q)
+    C = linalg.cholesky(P + (rho / 2.) * np.identity(n), lower=False)
+    if gamma0 is None:
+        gamma0 = 1e-3 * np.max(np.abs(q))
+
+    def run(gamma, start):
+        z0, y0 = (None, None) if start is None else (start['xsp'],
+                                                     start['y'])
+        ret = optimize_gamma(P, q, s, C, gamma, rho, maxiter, eps_abs,
+                             eps_rel, z0=z0, y0=y0, check=check,
+                             kernel=kernel)
+        ret['gamma'] = gamma
+        rets.append(ret)
+        return ret
+
+    def past(ret):
+        if nmodes is not None:
+            return ret['Nz'] <= nmodes
+        return ret['Ploss'] > ploss
+
+    def done(ret):
+        return nmodes is not None and ret['Nz'] == nmodes
+
+    rets = []
+    lo = hi = None
+    ret = run(gamma0, None)
+    if past(ret):
+        # walk down to a dense solution
+        hi = ret
+        for i in range(maxbisect):
+            if done(hi):
+                break
+            ret = run(hi['gamma'] / factor, hi)
+            if not past(ret):
+                lo = ret
+                break
+            hi = ret
+    else:
+        # walk up, stop once the target is passed or all modes are zero
+        lo = ret
+        while True:
+            ret = run(lo['gamma'] * factor, lo)
+            if past(ret) or ret['Nz'] == 0:
+                hi = ret
+                break
+            lo = ret
+    # bisection of the bracket [lo, hi]
+    for i in range(maxbisect):
+        if lo is None or hi is None or done(hi) \
+                or hi['gamma'] / lo['gamma'] < 1. + rtol:
+            break
+        ret = run(np.sqrt(lo['gamma'] * hi['gamma']), lo)
+        if past(ret):
+            hi = ret
+        else:
+            lo = ret
+    if nmodes is not None or lo is None:
+        best = hi if past(hi) else lo
+    else:
+        best = lo
+    if (nmodes is not None and best['Nz'] != nmodes) \
+            or (ploss is not None and best['Ploss'] > ploss):
+        warnings.warn('The target is not found, the nearest answer has '
+                      + str(best['Nz']) + ' modes')
+    rets.sort(key=lambda ret: ret['gamma'])
+    return rets, next(i for i, ret in enumerate(rets) if ret is best)
 
 
 class SparseDMD(object):
     def __init__(self, snapshots=None, dmd=None, axis=-1, dt=1,
-                 rho=1, maxiter=10000, eps_abs=1e-6, eps_rel=1e-4):
+                 rho=1, maxiter=10000, eps_abs=1e-6, eps_rel=1e-4,
+                 svd=None, check=1, kernel=None, cache=None):
         # TODO: allow data, axis as an argument instead of snapshots
         """Sparse Dynamic Mode Decomposition, using ADMM to find a
         sparse set of optimal dynamic mode amplitudes
@@ -30,6 +242,12 @@ class SparseDMD(object):
             maxiter - maximum number of ADMM iterations
             eps_abs - absolute tolerance for ADMM
             eps_rel - relative tolerance for ADMM
+            svd     - truncated SVD of the dmd reduction
+                      (e.g. low_rank.SVDBackend), full SVD if None
+            check   - test the ADMM convergence every check steps
+            kernel  - ADMM kernel, None (numpy) or 'numba', see admm.py
+            cache   - folder of the cached dmd reductions, see
+                      dmd.cached_reduction
 
         Defaults:
             If snapshots is not supplied and you have precomputed
@@ -45,26 +263,33 @@ class SparseDMD(object):
         self.max_admm_iter = maxiter
         self.eps_abs = eps_abs
         self.eps_rel = eps_rel
+        self.check = check
+        self.kernel = kernel
 
         if snapshots is not None:
-            self.dmd = DMD(snapshots, axis=axis, dt=dt)
+            self.dmd = DMD(snapshots, axis=axis, dt=dt, svd=svd,
+                           cache=cache)
             self.dmd.compute()
-        elif not snapshots and dmd is not None:
+        elif dmd is not None:
             self.dmd = dmd
-        elif not snapshots and not dmd:
+        else:
             self.dmd = DMD()
-        if np.linalg.matrix_rank(self.dmd.modes) \
-           != np.shape(self.dmd.modes)[1]:
+        # U is orthonormal, rank(modes) = rank(Ydmd) without the modes
+        if hasattr(self.dmd, 'Ydmd') and np.linalg.matrix_rank(
+                self.dmd.Ydmd) != np.shape(self.dmd.Ydmd)[1]:
             print("The input modes are not linear independent!!!")
 
-    def compute_sparse(self, gammaval):
+    def compute_sparse(self, gammaval, processes=1, warm=False):
         """Compute the sparse dmd structure and set as attribute."""
         self.gammaval = gammaval
-        self.sparse = self.dmdsp(gammaval)
+        self.sparse = self.dmdsp(gammaval, processes=processes, warm=warm)
 
-    def dmdsp(self, gammaval):
+    def dmdsp(self, gammaval, processes=1, warm=False, threads=False):
         """Inputs:
             gammaval - vector of gamma to perform sparse optimisation over
+            processes - NO of workers of the gamma sweep
+            warm     - warm start every gamma from the previous one
+            threads  - use threads instead of processes
 
         Returns:
             answer - gamma-parameterized structure containing
@@ -82,32 +307,35 @@ class SparseDMD(object):
         """
         # Number of optimization variables
         self.n = len(self.dmd.q)
-        # length of parameter vector
-        ng = len(gammaval)
 
         self.Prho = self.dmd.P + (self.rho / 2.) * np.identity(self.n)
 
-        answer = SparseAnswer(self.n, ng)
-        answer.gamma = gammaval
-        # report the computing progress
-#        widgets = ['SPDMD iteration on gamma:', Percentage(), ' ',
-#                   Bar(marker='>', left='[', right=']')]
-#        pbar = ProgressBar(widgets=widgets, maxval=np.size(gammaval))
-#        pbar.start()
-        for i, gamma in enumerate(gammaval):
-            ret = self.optimize_gamma(gamma)
+        rets = gamma_sweep(self.dmd.P, self.dmd.q, self.dmd.s, gammaval,
+                           self.rho, self.max_admm_iter, self.eps_abs,
+                           self.eps_rel, processes=processes, warm=warm,
+                           threads=threads, check=self.check,
+                           kernel=self.kernel)
+        return SparseAnswer.from_results(rets, self.n, gammaval)
 
-            answer.xsp[:, i] = ret['xsp']
-            answer.xpol[:, i] = ret['xpol']
+    def search_gamma(self, nmodes=None, ploss=None, **kwargs):
+        """Find gamma giving nmodes nonzero amplitudes (or the sparsest
+        amplitudes with performance loss <= ploss) by continuation and
+        bisection (gamma_search), warm starting ADMM every time.
 
-            answer.Nz[i] = ret['Nz']
-            answer.Jsp[i] = ret['Jsp']
-            answer.Jpol[i] = ret['Jpol']
-#            answer.Ploss[i] = ret['Ploss']
-#        pbar.finish()
-        answer.nonzero[:] = answer.xsp != 0
-
-        return answer
+        The gamma tried are set as self.sparse (like compute_sparse).
+        Returns the index Ni of the answer, for spdmd_reconstruction(Ni).
+        """
+        self.n = len(self.dmd.q)
+        self.Prho = self.dmd.P + (self.rho / 2.) * np.identity(self.n)
+        rets, ind = gamma_search(self.dmd.P, self.dmd.q, self.dmd.s,
+                                 nmodes=nmodes, ploss=ploss, rho=self.rho,
+                                 maxiter=self.max_admm_iter,
+                                 eps_abs=self.eps_abs,
+                                 eps_rel=self.eps_rel, check=self.check,
+                                 kernel=self.kernel, **kwargs)
+        self.gammaval = np.array([ret['gamma'] for ret in rets])
+        self.sparse = SparseAnswer.from_results(rets, self.n, self.gammaval)
+        return ind
 
     def optimize_gamma(self, gamma):
         """Minimise
@@ -122,173 +350,41 @@ class SparseDMD(object):
 
         The second constraint is satisfied using KKT_solve.
         """
-        # Use ADMM to solve the gamma-parameterized problem,
-        # minimising J, with initial conditions z0, y0
-        y0 = np.zeros(self.n)  # Lagrange multiplier
-        z0 = np.zeros(self.n)  # initial amplitudes
-        z = self.admm(z0, y0, gamma)
-
-        # Now use the minimised amplitudes as the input to the
-        # sparsity contraint to create a vector of polished
-        # (optimal) amplitudes
-        xpol = self.KKT_solve(z)[:self.n]
-
-        # outputs that we care about...
-        # vector of amplitudes
-        sparse_amplitudes = z
-        # number of non-zero amplitudes
-        num_nonzero = (z != 0).sum()
-        # least squares residual
-        residuals = self.residuals(z)
-
-        # Vector of polished (optimal) amplitudes
-        polished_amplitudes = xpol
-        # Polished (optimal) least-squares residual
-        polished_residual = self.residuals(xpol)
-        # Polished (optimal) performance loss
-        polished_performance_loss = 100 * \
-            np.sqrt(polished_residual / self.dmd.s)
-
-        return {'xsp':   sparse_amplitudes,
-                'Nz':    num_nonzero,
-                'Jsp':   residuals,
-                'xpol':  polished_amplitudes,
-                'Jpol':  polished_residual,
-                'Ploss': polished_performance_loss,
-                }
+        C = linalg.cholesky(self.Prho, lower=False)
+        return optimize_gamma(self.dmd.P, self.dmd.q, self.dmd.s, C, gamma,
+                              self.rho, self.max_admm_iter, self.eps_abs,
+                              self.eps_rel, check=self.check,
+                              kernel=self.kernel)
 
     def admm(self, z, y, gamma):
-        """Alternating direction method of multipliers."""
-        # Optimization:
-        # This has been reasonably optimized already and performs ~3x
-        # faster than a naive translation of the matlab version.
-
-        # Two major changes are a custom function for calculating
-        # the norm of a 1d vector and accessing the lapack solver
-        # directly.
-
-        # However it still isn't as fast as matlab (~1/3rd the
-        # speed).
-
-        # There are two complexity sources:
-        # 1. the matrix solver. I can't see how this can get any
-        #    faster (tested with Intel MKL on Canopy).
-        # 2. the test for convergence. This is the dominant source
-        #    now (~3x the time of the solver)
-
-        # One simple speedup (~2x faster) is to only test
-        # convergence every n iterations (n~10). However this breaks
-        # output comparison with the matlab code. This might not
-        # actually be a problem.
-
-        # Further avenues for optimization:
-        # - write in cython and import as compiled module, e.g.
-        #   http://docs.cython.org/src/userguide/numpy_tutorial.html
-        # - use two cores, with one core performing the admm and
-        #   the other watching for convergence.
-
-        a = (gamma / self.rho)
-        q = self.dmd.q
+        """Alternating direction method of multipliers (admm_solve)."""
+        # The convergence test was the dominant cost (~3x the time of
+        # the solver); it is done every self.check steps with the norms
+        # in one call, kernel='numba' compiles the whole loop (admm.py).
 
         # precompute cholesky decomposition
         C = linalg.cholesky(self.Prho, lower=False)
-        # link directly to LAPACK fortran solver for positive
-        # definite symmetric system with precomputed cholesky decomp:
-        potrs, = linalg.get_lapack_funcs(('potrs',), arrays=(C, q))
-
-        # simple norm of a 1d vector, called directly from BLAS
-        norm, = linalg.get_blas_funcs(('nrm2',), arrays=(q,))
-
-        # square root outside of the loop
-        root_n = np.sqrt(self.n)
-
-        for ADMMstep in range(self.max_admm_iter):
-            # ## x-minimization step (alpha minimisation)
-            u = z - (1. / self.rho) * y
-            qs = q + (self.rho / 2.) * u
-            # Solve P x = qs, using fact that P is hermitian and
-            # positive definite and assuming P is well behaved (no
-            # inf or nan).
-            xnew = potrs(C, qs, lower=False, overwrite_b=False)[0]
-            # ##
-
-            # ## z-minimization step (beta minimisation)
-            v = xnew + (1 / self.rho) * y
-            # Soft-thresholding of v
-            # zero for |v| < a
-            # v - a for v > a
-            # v + a for v < -a
-            # n.b. This doesn't actually do this because v is
-            # complex. This is the same as the matlab source. You might
-            # want to use np.sign, but this won't work because v is complex.
-            abs_v = np.abs(v)
-            znew = ((1 - a / abs_v) * v) * (abs_v > a)
-            # ##
-
-            # ## Lagrange multiplier update step
-            y = y + self.rho * (xnew - znew)
-            # ##
-
-            # ## Test convergence of admm
-            # Primal and dual residuals
-            res_prim = norm(xnew - znew)
-            res_dual = self.rho * norm(znew - z)
-
-            # Stopping criteria
-            eps_prim = root_n * self.eps_abs \
-                        + self.eps_rel * max(norm(xnew), norm(znew))
-            eps_dual = root_n * self.eps_abs + self.eps_rel * norm(y)
-
-            if (res_prim < eps_prim) & (res_dual < eps_dual):
-                return z
-            else:
-                z = znew
-
-        return z
+        return admm_solve(C, self.dmd.q, gamma, self.rho, z, y,
+                          self.max_admm_iter, self.eps_abs,
+                          self.eps_rel, self.check, self.kernel)[0]
 
     def KKT_solve(self, z):
         """Polishing of the sparse vector z. Seeks solution to
         E^T z = 0
         """
-        # indices of zero elements of z (i.e. amplitudes that
-        # we are ignoring)
-        ind_zero = abs(z) < 1E-12
-
-        # number of zero elements
-        m = ind_zero.sum()
-
-        # Polishing of the nonzero amplitudes
-        # Form the constraint matrix E for E^T x = 0
-        E = np.identity(self.n)[:, ind_zero]
-        # n.b. we don't form the sparse matrix as the original
-        # matlab does as it doesn't seem to affect the
-        # computation speed or the output.
-        # If you want to use a sparse matrix, use the
-        # scipy.sparse.linalg.spsolve solver with a csc matrix
-        # and stack using scipy.sparse.{hstack, vstack}
-
-        # Form KKT system for the optimality conditions
-        KKT = np.vstack((np.hstack((self.dmd.P, E)),
-                         np.hstack((E.T.conj(), np.zeros((m, m))))
-                         ))
-        rhs = np.hstack((self.dmd.q, np.zeros(m)))
-
-        # Solve KKT system
-        return linalg.solve(KKT, rhs)
+        return kkt_solve(self.dmd.P, self.dmd.q, z)
 
     def residuals(self, x):
         """Calculate the residuals from a minimised
         vector of amplitudes x.
         """
-        # conjugate transpose
-        x_ = x.T.conj()
-        q_ = self.dmd.q.T.conj()
-
-        x_P = np.dot(x_, self.dmd.P)
-        x_Px = np.dot(x_P, x)
-        q_x = np.dot(q_, x)
+        return residual(self.dmd.P, self.dmd.q, self.dmd.s, x)
 
-        return x_Px.real - 2 * q_x.real + self.dmd.s
+    def save(self, filename, block=256, **extra):
+        """write the dmd results and the sparse answer to one file,
+        read it by dmd.DMDResult"""
+        self.dmd.save(filename, block=block,
+                      sparse=getattr(self, 'sparse', None), **extra)
 
     def spdmd_reconstruction(self, Ni):
         """Compute a reconstruction of the input data based on a sparse
@@ -340,15 +436,30 @@ class SparseAnswer(object):
         # number of non-zero amplitudes
         self.Nz = np.zeros(ng)
         # square of frobenius norm (before polishing)
-        self.Jsp = np.zeros(ng, dtype=np.complex)
+        self.Jsp = np.zeros(ng, dtype=complex)
         # square of frobenius norm (after polishing)
-        self.Jpol = np.zeros(ng, dtype=np.complex)
+        self.Jpol = np.zeros(ng, dtype=complex)
         # optimal performance loss (after polishing)
-        self.Ploss = np.zeros(ng, dtype=np.complex)
+        self.Ploss = np.zeros(ng, dtype=complex)
         # vector of amplitudes (before polishing)
-        self.xsp = np.zeros((n, ng), dtype=np.complex)
+        self.xsp = np.zeros((n, ng), dtype=complex)
         # vector of amplitudes (after polishing)
-        self.xpol = np.zeros((n, ng), dtype=np.complex)
+        self.xpol = np.zeros((n, ng), dtype=complex)
+
+    @classmethod
+    def from_results(cls, rets, n, gammaval):
+        """answer from the results of optimize_gamma for gammaval"""
+        answer = cls(n, len(rets))
+        answer.gamma = gammaval
+        for i, ret in enumerate(rets):
+            answer.xsp[:, i] = ret['xsp']
+            answer.xpol[:, i] = ret['xpol']
+
+            answer.Nz[i] = ret['Nz']
+            answer.Jsp[i] = ret['Jsp']
+            answer.Jpol[i] = ret['Jpol']
+            answer.Ploss[i] = ret['Ploss']
+        return answer
 
     @property
     def nonzero(self):
@@ -374,7 +485,8 @@ class SparseReconstruction(object):
     Returns error if the given number of modes cannot be found
     over the gamma we've looked at.
 
-    TODO: think about a gamma search function?
+    To get a given number of modes, use the index returned by
+    SparseDMD.search_gamma(nmodes=...).
     """
     def __init__(self, sparse_dmd, number_index, shape=None, axis=-1):
         """
@@ -398,14 +510,16 @@ class SparseReconstruction(object):
         self.data_shape = shape
         self.axis = axis
 
-        self.rmodes = self.sparse_reconstruction()
-
         nonzero = self.sparse_dmd.nonzero[:, number_index]
 
-        self.modes = self.dmd.modes[:, nonzero]
+        self.modes = self.dmd.mode_columns(nonzero)
         self.freqs = self.dmd.Edmd[nonzero]
         self.amplitudes = self.sparse_dmd.xpol[nonzero, number_index]
         self.ploss = self.sparse_dmd.Ploss[number_index]
+        # frames and tiles on demand, only the nonzero modes
+        self.reconstruction = Reconstruction(self.modes, self.amplitudes,
+                                             self.freqs,
+                                             np.shape(self.dmd.Vand)[1])
 
     def sparse_reconstruction(self):
         """Reconstruct the snapshots using a given number of modes.
@@ -413,21 +527,19 @@ class SparseReconstruction(object):
         Ni is the index that gives the desired number of
         modes in `self.sparse.Nz`.
 
-        shape is the shape of the original data. If None (default),
-        the reconstructed snapshots will be returned; otherwise the
-        snapshots will be reshaped to the original data dimensions,
-        assuming that they were decomposed along axis `axis`.
+        The whole (space x time) array is formed, use
+        self.reconstruction for frames or tiles of it.
         """
-        amplitudes = np.diag(self.sparse_dmd.xpol[:, self.Ni])
-        modes = self.dmd.modes
-        time_series = self.dmd.Vand
-
         # we take the real part because for real data the modes are
         # in conjugate pairs and should cancel out. They don't
         # exactly because this is an optimal fit, not an exact
         # match.
-        reconstruction = np.dot(modes, np.dot(amplitudes, time_series))
-        return reconstruction.real
+        return self.reconstruction[:, :]
+
+    @property
+    def rmodes(self):
+        """the reconstructed snapshots (formed on every call)"""
+        return self.sparse_reconstruction()
 
     @property
     def rdata(self):
@@ -440,6 +552,16 @@ class SparseReconstruction(object):
                                           self.axis)
             return data_reconstruction
 
+    def frames(self, steps=None, block=16):
+        """yield (step, frame) of the reconstruction, frames reshaped into
+        the original data shape (without time axis) if it is known"""
+        for step, frame in self.reconstruction.frames(steps, block=block):
+            if self.data_shape is not None:
+                shape = list(self.data_shape)
+                shape.pop(self.axis)  # remove the decomp axis
+                frame = np.reshape(frame, shape)
+            yield step, frame
+
     @property
     def dmodes(self):
         """Convenience function to return modes reshaped into original
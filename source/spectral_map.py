@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 09:35:18 2026
+    This code for spectral maps of a flow field, the time series of all
+    points are read from a snapshot store tile by tile
+    1. Welch PSD of every point
+    2. dominant frequency, band-integrated energy and premultiplied
+    spectrum (f*PSD) of every point
+    3. tiles are processed by a pool of processes, at most window tiles
+    are submitted and not yet consumed, so only a few tiles are in memory
+    at the same time
+@author: weibo
+"""
+
+from collections import deque
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+from snapshot_store import SnapshotStore
+import variable_analysis as va
+from timer import timer
+
+
+def _spectra_tile(task):
+    (filename, var, points, time, dt, Freq_samp, seg, overlap,
+     bands) = task
+    store = SnapshotStore(filename)
+    sig = store.read(var, points=points, time=time)
+    Freq, PSD = va.psd_batch(sig, dt, Freq_samp, opt=1, seg=seg,
+                             overlap=overlap, axis=0, workers=1)
+    # dominant frequency without the mean (f=0)
+    ind = np.argmax(PSD[:, 1:], axis=1) + 1
+    fields = [Freq[ind], PSD[np.arange(np.size(ind)), ind]]
+    df = Freq[1] - Freq[0]
+    for f1, f2 in bands:
+        band = (Freq >= f1) & (Freq <= f2)
+        fields.append(np.sum(PSD[:, band], axis=1) * df)
+    return points, np.stack(fields, axis=1), PSD * Freq
+
+
+def bounded_imap(pool, func, tasks, window):
+    """results of func over tasks in order like pool.imap, but a task is
+    submitted only when fewer than window results are pending"""
+    pending = deque()
+    for task in tasks:
+        if len(pending) >= window:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (task,)))
+    while pending:
+        yield pending.popleft().get()
+
+
+def spectral_map(filename, var, OutFile, dt, Freq_samp, points=None,
+                 time=None, bands=None, seg=8, overlap=4, tile=4096,
+                 processes=1, window=None):
+    """spectral map of variable var of a snapshot store
+
+    Inputs:
+        points  - index of points (default all), e.g. SnapshotStore.points
+        time    - time window (t1, t2)
+        bands   - frequency bands [(f1, f2), ...] for band energy
+        tile    - NO of points per task
+        window  - NO of tiles submitted and not yet consumed, default
+                  2 * processes, bounds the memory of results
+    Output:
+        OutFile + '.h5': coordinates, freq_max, psd_max, E_band0, ...
+        OutFile + '_fpsd.npy': premultiplied spectrum, (points, freq)
+        OutFile + '_freq.dat': frequencies
+    Return:
+        DataFrame of the fields, can be saved by plt2pandas.frame2tec
+    """
+    store = SnapshotStore(filename)
+    if points is None:
+        points = np.arange(store.num_points)
+    points = np.asarray(points)
+    if bands is None:
+        bands = []
+    num = int(np.ceil(np.size(points) / tile))
+    tasks = [(filename, var, points[i * tile:(i + 1) * tile], time, dt,
+              Freq_samp, seg, overlap, bands) for i in range(num)]
+    # frequencies from a short run
+    Freq = va.psd_batch(store.read(var, points=points[:1], time=time), dt,
+                        Freq_samp, opt=1, seg=seg, overlap=overlap,
+                        axis=0)[0]
+    cols = ['freq_max', 'psd_max'] + \
+        ['E_band' + str(i) for i in range(len(bands))]
+    fields = np.empty((np.size(points), len(cols)))
+    fpsd = np.lib.format.open_memmap(OutFile + '_fpsd.npy', mode='w+',
+                                     dtype=np.float64,
+                                     shape=(np.size(points), np.size(Freq)))
+    start = np.cumsum([0] + [np.size(t[2]) for t in tasks])
+
+    pool = None
+    try:
+        with timer('spectral map of ' + var):
+            if processes == 1:
+                results = map(_spectra_tile, tasks)
+            else:
+                if window is None:
+                    window = 2 * processes
+                pool = Pool(processes=processes)
+                results = bounded_imap(pool, _spectra_tile, tasks, window)
+            for i, (_, val, spec) in enumerate(results):
+                fields[start[i]:start[i + 1]] = val
+                fpsd[start[i]:start[i + 1]] = spec
+    finally:
+        # workers are stopped and the memmap closed also on errors
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        fpsd.flush()
+        del fpsd
+    df = store.coordinates(points)
+    for i, col in enumerate(cols):
+        df[col] = fields[:, i]
+    df.to_hdf(OutFile + '.h5', key='w', format='fixed')
+    np.savetxt(OutFile + '_freq.dat', Freq, delimiter=' ')
+    return df
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 14:02:44 2026
+    This code for spectral proper orthogonal decomposition (SPOD)
+    Ref: Towne A., et. al.-Spectral proper orthogonal decomposition and its
+    relationship to dynamic mode decomposition and resolvent analysis
+    1. the snapshots are read block by block (Welch segments), the FFT of
+    every block is saved on disk, the full snapshot matrix is never formed
+    2. eigenvalue problem of the cross-spectral density for every frequency,
+    solved in parallel
+    3. results saved like 3d_pod_post.py: eigval.npy, phi (modes),
+    freq.npy, Meanflow.h5
+@author: weibo
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from scipy import signal
+from multiprocessing import Pool
+from timer import timer
+
+
+"""
+------------------------------------------------------------------------------
+structure of snapshots, as for pod.pod
+t1  t2  ... tn
+u1  u2  ... un
+v1  v2  ... vn
+------------------------------------------------------------------------------
+"""
+
+
+def _spod_frequency(task):
+    # eigenvalue problem of one frequency, M = Q^H W Q / nblk
+    QFile, ind, weight, nmodes, ModeFile = task
+    Qhat = np.load(QFile, mmap_mode='r')
+    Q = np.array(Qhat[ind]).T  # (space, nblk)
+    nblk = np.shape(Q)[1]
+    M = Q.conj().T @ (Q * weight[:, None]) / nblk
+    eigval, theta = np.linalg.eigh(M)
+    idx = eigval.argsort()[::-1][:nmodes]
+    eigval = np.abs(eigval[idx])
+    theta = theta[:, idx]
+    # W-orthonormal modes, zero eigenvalues (rank deficiency) kept finite
+    phi = Q @ theta / np.sqrt(np.maximum(eigval, 1e-300) * nblk)
+    np.save(ModeFile, phi)
+    return eigval
+
+
+class SPOD(object):
+    """Spectral POD of snapshots streamed from disk
+
+    Inputs:
+        reader   - function reader(i1, i2) returning snapshots i1...i2-1,
+                   shape (space, i2 - i1)
+        num      - NO of snapshots
+        dt       - time interval of snapshots
+        nfft     - NO of snapshots of one block
+        overlap  - overlap of blocks (fraction of nfft)
+        window   - window of blocks
+        weight   - weight of every point (mass matrix, e.g. cell volume)
+        workdir  - folder of block FFT and results
+        nmodes   - NO of modes of every frequency, at most nblk
+    """
+    def __init__(self, reader, num, dt, nfft=128, overlap=0.5,
+                 window='hamming', weight=None, workdir='./SPOD/',
+                 nmodes=None):
+        self.reader = reader
+        self.num = int(num)
+        self.dt = dt
+        self.nfft = nfft
+        self.novlp = int(nfft * overlap)
+        self.nblk = (self.num - self.novlp) // (nfft - self.novlp)
+        if self.nblk < 1:
+            raise ValueError('ERROR: too few snapshots for a block')
+        if nmodes is None:
+            nmodes = self.nblk
+        self.nmodes = min(nmodes, self.nblk)
+        self.window = signal.get_window(window, nfft)
+        self.weight = weight
+        self.workdir = workdir
+        if not os.path.exists(workdir):
+            os.mkdir(workdir)
+        self.freq = np.fft.rfftfreq(nfft, d=dt)
+        self.mean = None
+        self.eigval = None
+
+    @classmethod
+    def from_store(cls, StoreFile, VarList, dt, points=None, **kwargs):
+        """SPOD of variables of a snapshot store, variables are stacked
+        along space like the snapshots of pod.pod"""
+        from snapshot_store import SnapshotStore
+        store = SnapshotStore(StoreFile)
+
+        def reader(i1, i2):
+            return store.snapshots(VarList, points=points,
+                                   steps=slice(i1, i2))
+        spod = cls(reader, store.num_snapshots, dt, **kwargs)
+        spod.coords = store.coordinates(points)
+        spod.VarList = VarList
+        return spod
+
+    @property
+    def QFile(self):
+        return os.path.join(self.workdir, 'Qhat.npy')
+
+    def ModeFile(self, ind):
+        return os.path.join(self.workdir, 'phi_f{:05}.npy'.format(ind))
+
+    def _mean(self):
+        # mean of all snapshots, read in blocks
+        total = None
+        for i1 in range(0, self.num, self.nfft):
+            block = self.reader(i1, min(i1 + self.nfft, self.num))
+            part = np.sum(block, axis=1)
+            total = part if total is None else total + part
+        return total / self.num
+
+    def compute_fft(self):
+        """FFT of every block saved in Qhat.npy, shape (freq, block, space)
+        scaled so that the eigenvalues are the (one-sided) spectral
+        density, i.e. sum of eigval * df is the energy"""
+        with timer('SPOD mean'):
+            self.mean = self._mean()
+        space = int(np.size(self.mean))
+        if self.weight is None:
+            self.weight = np.ones(space)
+        Qhat = np.lib.format.open_memmap(
+            self.QFile, mode='w+', dtype=np.complex128,
+            shape=(np.size(self.freq), self.nblk, space))
+        scale = np.sqrt(self.dt / (np.sum(self.window ** 2)))
+        onesided = np.full(np.size(self.freq), np.sqrt(2.0))
+        onesided[0] = 1.0
+        if self.nfft % 2 == 0:
+            onesided[-1] = 1.0
+        step = self.nfft - self.novlp
+        with timer('SPOD block FFT'):
+            for b in range(self.nblk):
+                i1 = b * step
+                block = self.reader(i1, i1 + self.nfft) - self.mean[:, None]
+                block = block * self.window[None, :]
+                fft = np.fft.rfft(block, axis=1) * scale
+                Qhat[:, b, :] = (fft * onesided[None, :]).T
+        Qhat.flush()
+        del Qhat
+
+    def compute_modes(self, nmodes=None, processes=1, freq_ind=None):
+        """eigenvalues (freq, modes) and modes (saved per frequency)"""
+        if self.mean is None:
+            self.compute_fft()
+        if nmodes is None:
+            nmodes = self.nmodes
+        nmodes = min(nmodes, self.nblk)
+        if freq_ind is None:
+            freq_ind = range(np.size(self.freq))
+        freq_ind = list(freq_ind)
+        tasks = [(self.QFile, i, self.weight, nmodes, self.ModeFile(i))
+                 for i in freq_ind]
+        with timer('SPOD eigenvalue problems'):
+            if processes == 1:
+                eigval = list(map(_spod_frequency, tasks))
+            else:
+                with Pool(processes=processes) as pool:
+                    eigval = pool.map(_spod_frequency, tasks)
+        self.eigval = np.full((np.size(self.freq), nmodes), np.nan)
+        self.eigval[freq_ind] = np.array(eigval)
+        return self.eigval
+
+    def modes(self, ind):
+        """SPOD modes of frequency freq[ind], shape (space, modes)"""
+        return np.load(self.ModeFile(ind), mmap_mode='r')
+
+    def save(self, path=None):
+        """save results in the layout of 3d_pod_post.py"""
+        if path is None:
+            path = self.workdir
+        np.save(os.path.join(path, 'freq'), self.freq)
+        np.save(os.path.join(path, 'eigval'), self.eigval)
+        np.save(os.path.join(path, 'mean'), self.mean)
+        if hasattr(self, 'coords'):
+            meanflow = self.coords.copy()
+            m = np.shape(meanflow)[0]
+            for i, var in enumerate(self.VarList):
+                meanflow[var] = self.mean[i * m:(i + 1) * m]
+            meanflow.to_hdf(os.path.join(path, 'Meanflow.h5'), key='w',
+                            format='fixed')
+
+
+def spod_energy(eigval, freq):
+    """energy of every frequency and the fraction of the first mode"""
+    energy = np.nansum(eigval, axis=1)
+    frac = eigval[:, 0] / energy
+    return pd.DataFrame({'freq': freq, 'energy': energy, 'frac1': frac})
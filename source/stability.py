@@ -21,6 +21,7 @@ import sys
 import os
 from planar_field import PlanarField as pf
 from triaxial_field import TriField as tf
+from grid_index import GridIndex
 
 plt.close("All")
 plt.rc("text", usetex=True)
@@ -434,12 +435,13 @@ plt.show()
 # %% compute
 var = 'p'
 skip = 1
-samples = int(np.size(timepoints) / skip / 2 + 1)
-FPSD = np.zeros((samples, np.size(xval)))
-for i in range(np.size(xval)):
-    xyz = [xval[i], yval[i], 0.0]
-    freq, FPSD[:, i] = va.fw_psd_map(Snapshots, xyz, var, dt, freq_samp,
-                                     opt=1, seg=4, overlap=2)
+# time series of all points on the line, FWPSD computed at once
+grid = GridIndex(Snapshots)
+rows = np.array([grid.rows([xval[i], yval[i], 0.0])
+                 for i in range(np.size(xval))])
+freq, FPSD = va.fw_psd_batch(Snapshots[var].values[rows], dt, freq_samp,
+                             opt=1, seg=4, overlap=2)
+FPSD = FPSD.T
 np.savetxt(pathSL + 'FWPSD_freq_' + sp + '.dat', freq, delimiter=' ')
 np.savetxt(pathSL + 'FWPSD_x.dat', xval, delimiter=' ')
 np.savetxt(pathSL + var + '_FWPSD_psd_' + sp + '.dat', FPSD, delimiter=' ')
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+import scipy.linalg as linalg
+from sparse_dmd.admm import (admm_solve, _admm_kernel, _admm_reference,
+                             compiled_kernel, synthetic_problem)
+
+
+@pytest.fixture(scope='module')
+def problem():
+    P, q, s = synthetic_problem(r=40, m=500)
+    rho = 1.
+    n = len(q)
+    C = linalg.cholesky(P + (rho / 2.) * np.identity(n), lower=False)
+    return C, q, rho
+
+
+def _reference(C, q, gamma, rho):
+    n = len(q)
+    return _admm_reference(C, q, gamma, rho, np.zeros(n), np.zeros(n))[0]
+
+
+def _kernel(func, C, q, gamma, rho, check):
+    n = len(q)
+    z = func(np.ascontiguousarray(C, dtype=np.complex128),
+             np.asarray(q, dtype=np.complex128), gamma / rho, rho,
+             np.zeros(n, np.complex128), np.zeros(n, np.complex128),
+             10000, 1e-6, 1e-4, check)[0]
+    return z
+
+
+@pytest.mark.parametrize('gamma', [10., 1000.])
+def test_numpy_matches_reference(problem, gamma):
+    C, q, rho = problem
+    n = len(q)
+    zref = _reference(C, q, gamma, rho)
+    z = admm_solve(C, q, gamma, rho, np.zeros(n), np.zeros(n))[0]
+    assert np.allclose(z, zref, rtol=0, atol=1e-10)
+    assert np.array_equal(z != 0, zref != 0)
+    z = admm_solve(C, q, gamma, rho, np.zeros(n), np.zeros(n), check=10)[0]
+    assert np.array_equal(z != 0, zref != 0)
+    assert np.allclose(z, zref, rtol=0, atol=1e-4 * np.max(np.abs(zref)))
+
+
+@pytest.mark.parametrize('gamma', [10., 1000.])
+def test_kernel_matches_reference(problem, gamma):
+    # the loop of the numba kernel, run by python when numba is missing
+    C, q, rho = problem
+    zref = _reference(C, q, gamma, rho)
+    funcs = [_admm_kernel]
+    if compiled_kernel() is not None:
+        funcs.append(compiled_kernel())
+    for func in funcs:
+        z = _kernel(func, C, q, gamma, rho, 1)
+        assert np.allclose(z, zref, rtol=0, atol=1e-10)
+        assert np.array_equal(z != 0, zref != 0)
+
+
+def test_numba_fallback(problem):
+    C, q, rho = problem
+    n = len(q)
+    zref = _reference(C, q, 10., rho)
+    if compiled_kernel() is None:
+        with pytest.warns(UserWarning):
+            z = admm_solve(C, q, 10., rho, np.zeros(n), np.zeros(n),
+                           kernel='numba')[0]
+    else:
+        z = admm_solve(C, q, 10., rho, np.zeros(n), np.zeros(n),
+                       kernel='numba')[0]
+    assert np.allclose(z, zref, rtol=0, atol=1e-10)
+
+
+def test_unknown_kernel(problem):
+    C, q, rho = problem
+    n = len(q)
+    with pytest.raises(ValueError):
+        admm_solve(C, q, 10., rho, np.zeros(n), np.zeros(n), kernel='c')
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+import plt_io
+import plt2pandas as p2p
+
+VARS = ['x', 'y', 'z', 'u']
+
+
+def _write(name, x0, dims=(3, 2, 2), zones=1):
+    out = []
+    for i in range(zones):
+        n = int(np.prod(dims))
+        data = {'x': x0 + i + np.linspace(0.0, 0.5, n), 'y': np.zeros(n),
+                'z': np.zeros(n), 'u': np.ones(n)}
+        out.append(plt_io.new_zone('Z%d' % i, VARS, dims, data))
+    plt_io.write_plt(str(name), VARS, out)
+    return str(name)
+
+
+def test_block_index_cache_and_rebuild(tmp_path):
+    files = [_write(tmp_path / 'a.plt', 0.0), _write(tmp_path / 'b.plt', 5.0)]
+    cache = str(tmp_path / 'index.h5')
+    index = p2p.block_index(files, cache)
+    assert list(index['name']) == ['Z0', 'Z0']
+    assert list(index['nx']) == [3, 3]
+    # unchanged files: the saved index is returned
+    again = p2p.block_index(files, cache)
+    assert again.equals(index)
+    # dimensions of a zone changed: rebuilt
+    _write(tmp_path / 'b.plt', 5.0, dims=(4, 2, 2))
+    index = p2p.block_index(files, cache)
+    assert list(index['nx']) == [3, 4]
+    assert index['id2'].iloc[-1] == 12 + 16 - 1
+    # one more zone in a file: rebuilt
+    _write(tmp_path / 'a.plt', 0.0, zones=2)
+    index = p2p.block_index(files, cache)
+    assert list(index['name']) == ['Z0', 'Z1', 'Z0']
+    # another file list: rebuilt
+    index = p2p.block_index(files[:1], cache)
+    assert list(index['file']) == ['a.plt', 'a.plt']
+
+
+def test_select_blocks_without_overlap(tmp_path):
+    files = [_write(tmp_path / 'a.plt', 0.0), _write(tmp_path / 'b.plt', 5.0)]
+    index = p2p.block_index(files)
+    names, selected, position = p2p.select_blocks(
+        files, index, [[4.0, 6.0], [-1.0, 1.0], [-1.0, 1.0]])
+    assert [n[-5:] for n in names] == ['b.plt']
+    assert position == [0]
+    with pytest.raises(ValueError):
+        p2p.select_blocks(files, index, [[50.0, 60.0], [-1.0, 1.0],
+                                         [-1.0, 1.0]])
+
+
+def test_snapshot_time_of_broken_file(tmp_path):
+    good = _write(tmp_path / 'good.plt', 0.0)
+    with open(good, 'rb') as f:
+        head = f.read(50)
+    (tmp_path / 'cut.plt').write_bytes(head)
+    (tmp_path / 'text.plt').write_bytes(b'not tecplot')
+    (tmp_path / 'empty').mkdir()
+    assert p2p.snapshot_time(good) == 0.0
+    assert p2p.snapshot_time(str(tmp_path / 'cut.plt')) is None
+    assert p2p.snapshot_time(str(tmp_path / 'text.plt')) is None
+    assert p2p.snapshot_time(str(tmp_path / 'empty')) is None
@@ -0,0 +1,67 @@
+import numpy as np
+from DMD import DMD
+
+
+def _snapshots(m=200, n=31, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) * 0.1
+    k = np.arange(3)[:, None]
+    dyn = np.vstack((np.cos((k + 1) * 0.9 * t), np.sin((k + 1) * 0.9 * t)))
+    return rng.standard_normal((m, 6)) @ dyn \
+        + 1e-3 * rng.standard_normal((m, n))
+
+
+def _engine():
+    dmd = DMD(_snapshots())
+    dmd.dmd_standard()
+    dmd.amplit = dmd.dmd_amplitude(opt='spdmd')
+    dmd.compute_spdmd(gamma=np.logspace(-1, 3, 5))
+    return dmd
+
+
+def test_spdmd_reconstruct_complex():
+    dmd = _engine()
+    ind = 2
+    rec = dmd.spdmd_reconstruct(ind)
+    ref = dmd.modes @ np.diag(dmd.spdmd.PolAmplit[:, ind]) @ dmd.Vand
+    out = np.asarray(rec)
+    assert np.iscomplexobj(out)
+    assert np.allclose(out, ref)
+    assert np.allclose(rec.frame(4), ref[:, 4])
+    nonzero = dmd.spdmd.nonzero[:, ind]
+    # the reconstruction keeps U and eigvec, the modes are not formed
+    assert isinstance(rec.modes, tuple)
+    assert np.allclose(dmd.spdmd_modes, dmd.modes[:, nonzero])
+
+
+def test_save_roundtrip(tmp_path):
+    from sparse_dmd import DMDResult
+    dmd = _engine()
+    dmd.dmd_dynamics(np.arange(dmd.tn) * 0.1)
+    name = str(tmp_path / 'dmd.h5')
+    dmd.save(name, block=7)
+    res = DMDResult(name)
+    assert res.dt == dmd.dt
+    assert np.array_equal(res.eigval, dmd.eigval)
+    assert np.array_equal(res.amplitudes, dmd.amplit)
+    assert np.array_equal(res.omega, dmd.omega)
+    assert np.array_equal(res.beta, dmd.beta)
+    assert np.allclose(res.frequencies, dmd.beta + 1j * dmd.omega)
+    assert np.allclose(np.asarray(res.modes), dmd.modes)
+    assert np.allclose(res.modes[:, [3, 1]], dmd.modes[:, [3, 1]])
+    assert np.array_equal(res.sparse.gamma, dmd.spdmd.gamma)
+    assert np.array_equal(res.sparse.xpol, dmd.spdmd.PolAmplit)
+    assert np.array_equal(res.sparse.Nz, dmd.spdmd.Nz)
+
+
+def test_save_without_dynamics(tmp_path):
+    from sparse_dmd import DMDResult
+    dmd = DMD(_snapshots())
+    dmd.dmd_standard()
+    dmd.dmd_amplitude()
+    name = str(tmp_path / 'dmd.h5')
+    dmd.save(name)
+    res = DMDResult(name)
+    assert res.dt == 1
+    assert res.sparse is None
+    assert np.allclose(res.beta + 1j * res.omega, np.log(dmd.eigval))
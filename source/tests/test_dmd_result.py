@@ -0,0 +1,73 @@
+import os
+import numpy as np
+from sparse_dmd import DMD, DMDResult
+from sparse_dmd.dmd import cached_reduction
+from sparse_dmd.sparse import SparseDMD
+
+
+def _snapshots(m=300, n=21, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) * 0.1
+    k = np.arange(4)[:, None]
+    dyn = np.vstack((np.cos((k + 1) * 0.7 * t), np.sin((k + 1) * 0.7 * t)))
+    return rng.standard_normal((m, 8)) @ dyn \
+        + 1e-3 * rng.standard_normal((m, n))
+
+
+def test_save_roundtrip(tmp_path):
+    dmd = DMD(_snapshots(), dt=0.1)
+    dmd.compute()
+    name = str(tmp_path / 'dmd.h5')
+    dmd.save(name, block=3, extra_info=np.arange(4))
+    assert not os.path.exists(name + '.tmp')
+    res = DMDResult(name)
+    assert res.dt == 0.1
+    assert np.array_equal(res.eigval, dmd.eigval)
+    assert np.array_equal(res.amplitudes, dmd.amplitudes)
+    assert np.array_equal(res.omega, dmd.omega)
+    assert np.array_equal(res.beta, dmd.beta)
+    assert np.array_equal(res.extra_info, np.arange(4))
+    assert np.allclose(res.frequencies, dmd.frequencies)
+    assert res.sparse is None
+    assert res.modes.shape == np.shape(dmd.modes)
+    assert np.allclose(np.asarray(res.modes), dmd.modes)
+    ind = [5, 0, 5, 2]
+    assert np.allclose(res.modes[:, ind], dmd.modes[:, ind])
+    assert np.allclose(res.modes[10:20, 3], dmd.modes[10:20, 3])
+    for cols, modes in res.mode_blocks(block=4):
+        assert np.allclose(modes, dmd.modes[:, cols])
+    reduced, ref = res.reduce(0.99), dmd.reduce(0.99)
+    assert np.array_equal(reduced.ind, ref.ind)
+    assert np.allclose(reduced.modes, ref.modes)
+    assert np.allclose(reduced.omega, ref.omega)
+
+
+def test_save_sparse(tmp_path):
+    spdmd = SparseDMD(_snapshots(), dt=0.1)
+    spdmd.compute_sparse(np.logspace(-1, 2, 4))
+    name = str(tmp_path / 'spdmd.h5')
+    spdmd.save(name)
+    res = DMDResult(name)
+    for key in ('gamma', 'Nz', 'Jsp', 'Jpol', 'Ploss', 'xsp', 'xpol'):
+        assert np.array_equal(getattr(res.sparse, key),
+                              getattr(spdmd.sparse, key))
+    assert np.array_equal(res.sparse.nonzero, spdmd.sparse.nonzero)
+
+
+def test_cached_reduction(tmp_path):
+    snapshots = _snapshots()
+    cache = str(tmp_path / 'cache')
+    ref = DMD.dmd_reduction(snapshots)
+    first = cached_reduction(snapshots, cache=cache)
+    assert len(os.listdir(cache)) == 1
+    second = cached_reduction(snapshots, cache=cache)
+    assert isinstance(second.U, np.memmap)
+    for key in ('U', 'S', 'V', 'UstarX1'):
+        assert np.array_equal(getattr(first, key), getattr(ref, key))
+        assert np.array_equal(getattr(second, key), getattr(ref, key))
+    cached_reduction(snapshots[:, :-1], cache=cache)
+    assert len(os.listdir(cache)) == 2
+    dmd = DMD(snapshots, cache=cache)
+    dmd.compute()
+    assert len(os.listdir(cache)) == 2
+    assert np.allclose(dmd.modes, np.dot(ref.U, dmd.Ydmd))
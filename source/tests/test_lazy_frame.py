@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+from lazy_frame import LazyFrame, StoreColumn, save_columns
+from snapshot_store import create_store, SnapshotStore
+
+
+def _store(path, m=50, n=12):
+    rng = np.random.default_rng(0)
+    xyz = pd.DataFrame({'x': rng.random(m), 'y': rng.random(m),
+                        'z': np.zeros(m)})
+    store = create_store(str(path / 's.h5'), xyz, ['u', 'p'], chunks=(4, 16))
+    U = rng.standard_normal((n, m))
+    P = rng.standard_normal((n, m))
+    for j in range(n):
+        store.append({'u': U[j], 'p': P[j]}, 0.5 * j)
+    return store, xyz, U, P
+
+
+def test_from_store_matches_concat(tmp_path):
+    store, xyz, U, P = _store(tmp_path)
+    steps = slice(2, 11)
+    lf = LazyFrame.from_store(store.filename, steps=steps)
+    ref = pd.concat([xyz.assign(u=U[j], p=P[j]) for j in range(2, 11)],
+                    ignore_index=True)
+    assert lf.shape == (ref.shape[0], 5)
+    assert lf.loaded == []
+    rows = np.array([0, 7, 49, 50, 333, 449, 120, 7])
+    part = lf.iloc[rows]
+    assert np.allclose(part[['x', 'y', 'u', 'p']].values,
+                       ref[['x', 'y', 'u', 'p']].values[rows])
+    # rows are read, the columns are not loaded
+    assert all(isinstance(lf.column(c), StoreColumn) for c in ['u', 'p'])
+    assert np.allclose(lf['u'].values, ref['u'].values)
+    assert np.allclose(lf[['x', 'p']].values, ref[['x', 'p']].values)
+
+
+def test_store_column_slices(tmp_path):
+    store, xyz, U, P = _store(tmp_path)
+    col = StoreColumn(SnapshotStore(store.filename), 'u', slice(1, 12, 2),
+                      block=2)
+    ref = U[1:12:2].ravel()
+    assert len(col) == np.size(ref)
+    assert np.allclose(np.asarray(col), ref)
+    assert np.allclose(col[10:140:3], ref[10:140:3])
+    mask = np.zeros(np.size(ref), dtype=bool)
+    mask[[3, 99, 250]] = True
+    assert np.allclose(col[mask], ref[mask])
+    assert col[-1] == ref[-1]
+
+
+def test_from_columns(tmp_path):
+    df = pd.DataFrame({'x': np.arange(5.0), '<u`u`>': np.ones(5)})
+    save_columns(df, str(tmp_path / 'cols'))
+    lf = LazyFrame.from_columns(str(tmp_path / 'cols'))
+    assert list(lf.columns) == ['x', '<u`u`>']
+    assert np.allclose(lf['x'], df['x'])
+
+
+def test_store_span_ave_reads_blocks(tmp_path):
+    from triaxial_field import TriField
+    x, y, z = np.meshgrid(np.arange(4.0), np.arange(3.0), np.arange(5.0),
+                          indexing='ij')
+    xyz = pd.DataFrame({'x': x.ravel(), 'y': y.ravel(), 'z': z.ravel()})
+    store = create_store(str(tmp_path / 'g.h5'), xyz, ['u', 'p'],
+                         chunks=(4, 16))
+    rng = np.random.default_rng(2)
+    frames = []
+    for j in range(6):
+        df = xyz.assign(u=rng.random(60), p=rng.random(60))
+        store.append(df, 0.1 * j)
+        frames.append(df)
+    ref = pd.concat(frames, ignore_index=True)
+    flow = TriField()
+    flow.load_store(store.filename)
+    out = flow.span_ave()
+    part = flow.grid.mean(flow.TriData, keys=['x', 'y'], chunk=25)
+    assert flow.grid.num_points == 60 and flow.grid.repeat == 6
+    # columns are read by rows, nothing is kept in memory
+    assert not any(isinstance(flow.TriData.column(c), np.ndarray)
+                   for c in flow.TriData.columns)
+    mean = ref.groupby(['x', 'y']).mean().reset_index()
+    assert np.allclose(out[['x', 'y', 'z', 'u', 'p']].values,
+                       mean[['x', 'y', 'z', 'u', 'p']].values)
+    assert np.allclose(part.values, out.values)
+    rows = flow.grid.rows([1.0, None, 2.0])
+    assert np.array_equal(rows, np.flatnonzero(
+        (ref['x'].values == 1.0) & (ref['z'].values == 2.0)))
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from triaxial_field import TriField
+from planar_field import PlanarField
+
+
+def _frame(nx, ny, nz, seed=0):
+    rng = np.random.default_rng(seed)
+    x, y, z = np.meshgrid(np.linspace(-1.0, 1.0, nx), np.linspace(0.0, 2.0, ny),
+                          np.linspace(0.0, 0.5, nz), indexing='ij')
+    df = pd.DataFrame({'x': x.ravel(), 'y': y.ravel(), 'z': z.ravel()})
+    df['u'] = rng.random(len(df))
+    return df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def _reference(df, var_name, var_val):
+    df1 = df.loc[np.isclose(df[var_name], var_val)]
+    return df1.groupby(['y']).mean().reset_index().sort_values(by=['y'])
+
+
+def test_planar_yprofile():
+    flow = PlanarField()
+    flow._data_field = _frame(5, 7, 1)
+    val = flow.PlanarData['x'].values[3]
+    out = flow.yprofile('x', val)
+    ref = _reference(flow.PlanarData, 'x', val)
+    assert np.allclose(out[['y', 'u']].values, ref[['y', 'u']].values)
+
+
+def test_trifield_yprofile_uses_planar_data():
+    flow = TriField()
+    flow._data_field = _frame(4, 6, 3, seed=1)
+    # planar data: other frame, more rows than the 3D field
+    flow.PlanarData = _frame(9, 11, 1, seed=2)
+    for val in np.unique(flow.PlanarData['x'])[[0, 4, 8]]:
+        out = flow.yprofile('x', val)
+        ref = _reference(flow.PlanarData, 'x', val)
+        assert len(out) == 11
+        assert np.allclose(out[['y', 'u']].values, ref[['y', 'u']].values)
+    # the 3D field is still indexed on its own rows
+    assert flow.grid.num_rows == len(flow._data_field)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+import plt_io
+
+
+def _zones(seed=0, time=1.5):
+    rng = np.random.default_rng(seed)
+    zones = []
+    for i, dims in enumerate([(4, 3, 2), (5, 1, 1)]):
+        n = int(np.prod(dims))
+        data = {'x': np.arange(n) + 10.0 * i, 'y': rng.random(n),
+                'z': rng.random(n), 'u': rng.standard_normal(n)}
+        zones.append(plt_io.new_zone('B%02d' % i, ['x', 'y', 'z', 'u'], dims,
+                                     data, strand=1, solution_time=time))
+    return zones
+
+
+@pytest.mark.parametrize('dtype', ['f8', 'f4'])
+def test_write_read_roundtrip(tmp_path, dtype):
+    zones = _zones()
+    name = str(tmp_path / 'case.plt')
+    plt_io.write_plt(name, ['x', 'y', 'z', 'u'], zones, title='t',
+                     dtype=dtype)
+    dataset = plt_io.read_plt(name)
+    assert dataset.variable_names == ['x', 'y', 'z', 'u']
+    assert dataset.num_zones == 2
+    assert dataset.solution_times == [1.5]
+    for zone, ref in zip(dataset.zones(), zones):
+        assert zone.name == ref.name
+        assert zone.dimensions == ref.dimensions
+        for var in ['x', 'y', 'z', 'u']:
+            val = np.asarray(ref.values(var), dtype=dtype)
+            assert np.array_equal(zone.values(var), val)
+            assert zone.bounds(var) == (val.min(), val.max())
+
+
+def test_headers_only(tmp_path):
+    name = str(tmp_path / 'case.plt')
+    plt_io.write_plt(name, ['x', 'y', 'z', 'u'], _zones(time=3.0))
+    assert plt_io.read_zone_headers(name) == [('B00', (4, 3, 2)),
+                                              ('B01', (5, 1, 1))]
+    assert plt_io.read_solution_time(name) == 3.0
+
+
+def test_not_a_plt_file(tmp_path):
+    name = tmp_path / 'bad.plt'
+    name.write_bytes(b'not tecplot')
+    with pytest.raises(IOError):
+        plt_io.read_plt(str(name))
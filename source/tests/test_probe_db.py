@@ -0,0 +1,94 @@
+import os
+import numpy as np
+import pytest
+from probe_db import ProbeDB, probe_name
+from line_field import LineField
+
+
+def _case(path, nprobe=2):
+    lines = ['header'] * 6
+    for i in range(nprobe):
+        lines.append('%d 1 %f 0.5 0.0' % (i + 1, float(i)))
+    (path / 'inca_probes.inp').write_text('\n'.join(lines) + '\n')
+
+
+def _rows(t0, t1, probe):
+    rows = []
+    for t in range(t0, t1):
+        rows.append([t, 0.1 * t, probe, 2.0, 3.0, 1.0, 5.0, 0.7 * t])
+    return np.array(rows, dtype=np.float64)
+
+
+def _write(path, num, data, mode='w'):
+    with open(path / probe_name(num), mode) as f:
+        if mode == 'w':
+            f.write('title\nvariables\n')
+        np.savetxt(f, data, fmt='%.10g')
+
+
+def test_refresh_appends_new_lines(tmp_path):
+    _case(tmp_path)
+    _write(tmp_path, 1, _rows(0, 10, 1))
+    db = ProbeDB(str(tmp_path))
+    assert db.refresh() == 10
+    _write(tmp_path, 1, _rows(10, 15, 1), mode='a')
+    assert db.refresh() == 5
+    assert db.refresh() == 0
+    df = ProbeDB(str(tmp_path)).load(1)
+    assert np.allclose(df.values, _rows(0, 15, 1))
+
+
+def test_refresh_header_only(tmp_path):
+    # a run just started: only the header, then a line being written
+    _case(tmp_path)
+    _write(tmp_path, 1, np.zeros((0, 8)))
+    db = ProbeDB(str(tmp_path))
+    assert db.refresh() == 0
+    assert db.meta['files'].get(probe_name(1), {'offset': 0})['offset'] == 0
+    with open(tmp_path / probe_name(1), 'a') as f:
+        f.write('0 0.0 1')
+    assert db.refresh() == 0
+    with open(tmp_path / probe_name(1), 'a') as f:
+        f.write(' 2 3 1 5 0\n')
+    _write(tmp_path, 1, _rows(1, 4, 1), mode='a')
+    assert db.refresh() == 4
+    assert np.allclose(db.raw(1), _rows(0, 4, 1))
+
+
+def test_reset_meta_removes_old_bins(tmp_path):
+    _case(tmp_path)
+    _write(tmp_path, 1, _rows(0, 10, 1))
+    db = ProbeDB(str(tmp_path))
+    db.refresh()
+    os.remove(os.path.join(db.DBPath, 'meta.json'))
+    db = ProbeDB(str(tmp_path))
+    assert db.refresh() == 10
+    assert np.shape(db.raw(1)) == (10, 8)
+
+
+def test_crash_before_meta_is_saved(tmp_path):
+    _case(tmp_path)
+    _write(tmp_path, 1, _rows(0, 10, 1))
+    db = ProbeDB(str(tmp_path))
+    db.refresh()
+    # new lines converted, but the meta not saved (crash)
+    _write(tmp_path, 1, _rows(10, 14, 1), mode='a')
+    db._refresh_probe(1)
+    db = ProbeDB(str(tmp_path))
+    assert np.shape(db.raw(1)) == (10, 8)
+    assert db.refresh() == 4
+    assert np.allclose(db.raw(1), _rows(0, 14, 1))
+    assert os.path.getsize(db._bin_file(1)) == 14 * 8 * 8
+
+
+def test_load_probe_varname(tmp_path):
+    _case(tmp_path)
+    _write(tmp_path, 2, _rows(0, 6, 2))
+    db = ProbeDB(str(tmp_path))
+    flow = LineField()
+    df = flow.load_probe(str(tmp_path) + '/', 2, varname=['time', 'p'],
+                         db=db)
+    assert list(df.columns) == ['time', 'p']
+    assert np.allclose(df['p'], 0.7 * np.arange(6))
+    with pytest.raises(ValueError):
+        flow.load_probe(str(tmp_path) + '/', 2, varname=['time', 'q'], db=db)
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+from snapshot_store import create_store, store_from_hdf, SnapshotStore
+
+
+def _store(path, npts=50, chunks=(4, 16)):
+    coords = pd.DataFrame({'x': np.arange(npts, dtype=float),
+                           'y': np.linspace(0, 1, npts)})
+    return create_store(str(path / 'store.h5'), coords, ['u', '<p`p`>'],
+                        chunks=chunks)
+
+
+def _fill(store, nt=10, seed=0):
+    rng = np.random.default_rng(seed)
+    u = rng.standard_normal((nt, store.num_points))
+    p = rng.standard_normal((nt, store.num_points))
+    # one snapshot, then the rest at once
+    store.append({'u': u[0], '<p`p`>': p[0]}, 0.0)
+    store.append({'u': u[1:], '<p`p`>': p[1:]}, 0.1 * np.arange(1, nt))
+    return u, p
+
+
+def test_append_read_roundtrip(tmp_path):
+    u, p = _fill(_store(tmp_path))
+    store = SnapshotStore(str(tmp_path / 'store.h5'))
+    assert store.variables == ['u', '<p`p`>']
+    assert store.coords == ['x', 'y']
+    assert store.num_snapshots == 10
+    assert np.allclose(store.times, 0.1 * np.arange(10))
+    assert np.array_equal(store.read('u'), u)
+    assert np.array_equal(store.read('<p`p`>'), p)
+    points = np.array([40, 3, 17, 3, 49, 0])
+    assert np.array_equal(store.read('u', points=points), u[:, points])
+    mask = np.zeros(store.num_points, dtype=bool)
+    mask[[5, 20, 33]] = True
+    assert np.array_equal(store.read('u', points=mask), u[:, mask])
+    assert np.array_equal(store.read('u', steps=slice(2, 7)), u[2:7])
+    assert np.array_equal(store.read('u', time=(0.25, 0.55)), u[3:6])
+
+
+def test_frame_and_snapshots(tmp_path):
+    store = _store(tmp_path)
+    u, p = _fill(store)
+    df = store.frame(4)
+    assert list(df.columns) == ['x', 'y', 'u', '<p`p`>']
+    assert np.array_equal(df['u'].values, u[4])
+    assert np.array_equal(df['x'].values, np.arange(store.num_points))
+    points = [1, 8, 30]
+    snap = store.snapshots(['u', '<p`p`>'], points=points,
+                           steps=slice(0, 5))
+    assert np.array_equal(snap, np.vstack((u[:5, points].T,
+                                           p[:5, points].T)))
+    assert np.array_equal(store.points([(10, 12), (None, None)]),
+                          [10, 11, 12])
+
+
+def test_append_mismatch(tmp_path):
+    store = _store(tmp_path)
+    u, p = _fill(store)
+    with pytest.raises(ValueError):
+        store.append({'u': np.zeros(7), '<p`p`>': np.zeros(7)}, 0.0)
+    # only the second variable is wrong
+    with pytest.raises(ValueError):
+        store.append({'u': np.zeros(50), '<p`p`>': np.zeros(49)}, 1.0)
+    # times do not match the snapshots
+    with pytest.raises(ValueError):
+        store.append({'u': np.zeros((2, 50)), '<p`p`>': np.zeros((2, 50))},
+                     [1.0, 1.1, 1.2])
+    store = SnapshotStore(store.filename)
+    assert store.num_snapshots == 10
+    assert np.array_equal(store.read('u'), u)
+    assert np.array_equal(store.read('<p`p`>'), p)
+    store.append({'u': np.ones(50), '<p`p`>': np.ones(50)}, 1.0)
+    with store._open() as h5:
+        assert [store._node(h5, var).nrows for var in store.variables] \
+            == [11, 11]
+    assert np.array_equal(store.read('u')[-1], np.ones(50))
+    assert np.array_equal(store.read('<p`p`>')[-1], np.ones(50))
+    with pytest.raises(KeyError):
+        store.read('v')
+    with pytest.raises(IOError):
+        SnapshotStore(str(tmp_path / 'missing.h5'))
+
+
+def test_store_from_hdf(tmp_path):
+    folder = tmp_path / 'snapshots'
+    folder.mkdir()
+    rng = np.random.default_rng(1)
+    frames = []
+    for i in range(3):
+        df = pd.DataFrame({'x': np.arange(20.0), 'y': np.zeros(20),
+                           'z': np.ones(20), 'u': rng.random(20)})
+        df.to_hdf(str(folder / ('s%03d.h5' % i)), key='w', format='fixed')
+        frames.append(df)
+    store = store_from_hdf(str(folder), str(tmp_path / 'store.h5'), ['u'],
+                           times=[1.0, 2.0, 3.0])
+    assert np.array_equal(store.times, [1.0, 2.0, 3.0])
+    assert np.array_equal(store.read('u'),
+                          np.vstack([df['u'].values for df in frames]))
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from spod import SPOD
+
+
+def _reader(data):
+    def reader(i1, i2):
+        return data[:, i1:i2]
+    return reader
+
+
+def test_nmodes_clamped_to_blocks(tmp_path):
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((6, 64))
+    spod = SPOD(_reader(data), 64, 0.1, nfft=16, overlap=0.5,
+                workdir=str(tmp_path) + '/', nmodes=20)
+    assert spod.nblk == 7
+    assert spod.nmodes == 7
+    eigval = spod.compute_modes(nmodes=20)
+    assert np.shape(eigval) == (np.size(spod.freq), 7)
+    assert np.all(np.isfinite(eigval))
+    assert np.all(np.diff(eigval, axis=1) <= 1e-12)
+    assert np.shape(spod.modes(1)) == (6, 7)
+
+
+def test_too_few_snapshots(tmp_path):
+    with pytest.raises(ValueError):
+        SPOD(_reader(np.zeros((2, 8))), 8, 0.1, nfft=16,
+             workdir=str(tmp_path) + '/')
@@ -10,6 +10,7 @@ from planar_field import PlanarField
 import plt2pandas as p2p
 from glob import glob
 import numpy as np
+from lazy_frame import LazyFrame
 
 
 class TriField(PlanarField):
@@ -22,7 +23,7 @@ class TriField(PlanarField):
 
     @TriData.setter
     def TriData(self, frame):
-        assert isinstance(frame, pd.DataFrame)
+        assert isinstance(frame, (pd.DataFrame, LazyFrame))
         self._TriData = frame
 
     @property
@@ -55,6 +56,12 @@ class TriField(PlanarField):
                 num = np.size(FileList)
                 df = pd.concat([pd.read_hdf(FileList[i]) for i in range(num)])
                 df.reset_index()
+        elif NameList == 'store':
+            # snapshots in a snapshot store, columns are read when used
+            if isinstance(infile, list):
+                infile = infile[0]
+            self.load_store(infile)
+            return
         else:
             df = p2p.ReadINCAResults(path,
                                      VarList=NameList,
@@ -65,12 +72,10 @@ class TriField(PlanarField):
         self._data_field = df
 
     def span_ave(self):
-        grouped = self._data_field.groupby(['x', 'y'])
-        df = grouped.mean().reset_index()
+        df = self.grid.mean(self._data_field, keys=['x', 'y'])
         return (df)
 
     def unique(self):
-        grouped = self._data_field.groupby(['x', 'y', 'z'])
-        df = grouped.mean().reset_index()
+        df = self.grid.mean(self._data_field, keys=['x', 'y', 'z'])
         self._data_field = df
         return (df)
@@ -12,6 +12,8 @@ Created on Tue May 1 10:24:50 2018
 
 import numpy as np
 from scipy import signal
+import scipy.fft as sp_fft
+from contextlib import contextmanager
 import matplotlib.pyplot as plt
 import matplotlib
 import warnings
@@ -22,10 +24,13 @@ from scipy.interpolate import griddata  # interp1d
 from scipy.integrate import trapz, dblquad  # simps,
 # import scipy.optimize
 from scipy.interpolate import splprep, splev, interp1d
+from scipy.spatial import cKDTree
+from multiprocessing import Pool
 # from numpy import NaN, Inf, arange, isscalar, asarray, array
 import sys
 from timer import timer
 import os
+from grid_index import GridIndex
 
 
 def basic_var(opt):
@@ -336,12 +341,17 @@ def fw_psd(VarZone, dt, Freq_samp, opt=2, seg=8, overlap=4):
     return (Freq, FPSD)
 
 
-def fw_psd_map(orig, xyz, var, dt, Freq_samp, opt=2, seg=8, overlap=4):
-    frame1 = orig.loc[np.around(orig['x'], 5) == np.around(xyz[0], 5)]
-    # frame2 = frame1.loc[np.around(frame1['y'], 5) == xyz[1]]
-    frame2 = frame1.loc[np.around(frame1['y'], 5) == np.around(xyz[1], 5)]
-    orig = frame2.loc[frame2['z'] == xyz[2]]
-    varzone = orig[var]
+# grid: GridIndex of orig, points are found by integer keys
+def fw_psd_map(orig, xyz, var, dt, Freq_samp, opt=2, seg=8, overlap=4,
+               grid=None):
+    if grid is not None:
+        varzone = orig[var].values[grid.rows(xyz)]
+    else:
+        frame1 = orig.loc[np.around(orig['x'], 5) == np.around(xyz[0], 5)]
+        # frame2 = frame1.loc[np.around(frame1['y'], 5) == xyz[1]]
+        frame2 = frame1.loc[np.around(frame1['y'], 5) == np.around(xyz[1], 5)]
+        orig = frame2.loc[frame2['z'] == xyz[2]]
+        varzone = orig[var]
     Freq, FPSD = fw_psd(varzone, dt, Freq_samp,
                         opt=opt, seg=seg, overlap=overlap)
     return (Freq, FPSD)
@@ -355,11 +365,14 @@ def rms(dataseries):
 
 
 # Compute the RMS
-def rms_map(orig, xyz, var):
-    frame1 = orig.loc[np.around(orig['x'], 6) == np.around(xyz[0], 6)]
-    frame2 = frame1.loc[np.around(frame1['y'], 6) == np.around(xyz[1], 6)]
-    orig = frame2.loc[np.around(frame2['z'], 6) == np.around(xyz[2], 6)]
-    varzone = orig[var]
+def rms_map(orig, xyz, var, grid=None):
+    if grid is not None:
+        varzone = orig[var].values[grid.rows(xyz)]
+    else:
+        frame1 = orig.loc[np.around(orig['x'], 6) == np.around(xyz[0], 6)]
+        frame2 = frame1.loc[np.around(frame1['y'], 6) == np.around(xyz[1], 6)]
+        orig = frame2.loc[np.around(frame2['z'], 6) == np.around(xyz[2], 6)]
+        varzone = orig[var]
     rms_val = rms(varzone)
     return (rms_val)
 
@@ -450,6 +463,126 @@ def coherence(Var1, Var2, dt, Freq_samp, opt=1, seg=8, overlap=4):
     return (Freq, gamma)
 
 
+# %% spectra of many signals at once, signals along rows (or axis=0 for
+# data like SnapshotStore.read with shape (time, points))
+try:
+    import pyfftw
+except ImportError:
+    pyfftw = None
+
+
+@contextmanager
+def fft_backend(workers=None):
+    # multithreaded FFT, by FFTW if pyfftw is installed
+    if pyfftw is not None:
+        with sp_fft.set_backend(pyfftw.interfaces.scipy_fft):
+            with sp_fft.set_workers(workers or -1):
+                yield
+    else:
+        with sp_fft.set_workers(workers or -1):
+            yield
+
+
+def resample_batch(var, dt, Freq_samp):
+    """interpolate signals (signals x time) to uniform time with the
+    sampling frequency, the interpolation weights are computed once"""
+    nt = np.shape(var)[1]
+    if np.size(dt) > 1:
+        TimeSpan = np.asarray(dt, dtype=np.float64)
+        TotalNo = int(Freq_samp * (TimeSpan[-1] - TimeSpan[0]))
+        if TotalNo > np.size(dt):
+            warnings.warn("PSD results are not accurate as too few snapshots",
+                          UserWarning)
+    else:
+        if Freq_samp > 1 / dt:
+            warnings.warn("PSD results are not accurate as too few snapshots",
+                          UserWarning)
+        if Freq_samp >= 1 / dt:
+            return var, nt
+        TimeSpan = np.arange(nt) * dt
+        TotalNo = int((TimeSpan[-1] - TimeSpan[0]) * Freq_samp) + 1
+    TimeZone = np.linspace(TimeSpan[0], TimeSpan[-1], TotalNo)
+    ind = np.clip(np.searchsorted(TimeSpan, TimeZone, side='right') - 1,
+                  0, nt - 2)
+    wgt = (TimeZone - TimeSpan[ind]) / (TimeSpan[ind + 1] - TimeSpan[ind])
+    return var[:, ind] * (1.0 - wgt) + var[:, ind + 1] * wgt, TotalNo
+
+
+def _prepare_batch(var, dt, Freq_samp, detrend, axis):
+    var = np.asarray(var, dtype=np.float64)
+    if axis == 0:
+        var = var.T
+    var = np.atleast_2d(var)
+    if detrend == 'linear':
+        var = signal.detrend(var, axis=1, type='linear')
+    elif detrend:
+        var = var - np.mean(var, axis=1, keepdims=True)
+    return resample_batch(var, dt, Freq_samp)
+
+
+def psd_batch(var, dt, Freq_samp, opt=2, seg=8, overlap=4,
+              detrend='constant', axis=1, workers=None):
+    """PSD of every signal, same as psd() but for an array of signals
+
+    Return: Freq, PSD with shape (signals, frequencies)
+    """
+    Var, TotalNo = _prepare_batch(var, dt, Freq_samp, detrend, axis)
+    with fft_backend(workers):
+        if opt == 2:
+            Var_fft = sp_fft.rfft(Var, axis=1)
+            Var_psd = np.abs(Var_fft) ** 2 / (Freq_samp * TotalNo)
+            Freq = np.linspace(0.0, Freq_samp / 2, np.shape(Var_fft)[1])
+        else:
+            ns = TotalNo // seg
+            Freq, Var_psd = signal.welch(Var, fs=Freq_samp, nperseg=ns,
+                                         nfft=TotalNo, noverlap=ns // overlap,
+                                         axis=1)
+    return (Freq, Var_psd)
+
+
+def fw_psd_batch(var, dt, Freq_samp, opt=2, seg=8, overlap=4,
+                 detrend='constant', axis=1, workers=None):
+    Freq, Var_psd = psd_batch(var, dt, Freq_samp, opt=opt, seg=seg,
+                              overlap=overlap, detrend=detrend, axis=axis,
+                              workers=workers)
+    return (Freq, Var_psd * Freq)
+
+
+def cro_psd_batch(var1, var2, dt, Freq_samp, opt=1, seg=8, overlap=4,
+                  detrend='constant', axis=1, workers=None):
+    """cross-PSD of pairs of signals, same as cro_psd()"""
+    NVar1, TotalNo = _prepare_batch(var1, dt, Freq_samp, detrend, axis)
+    NVar2, _ = _prepare_batch(var2, dt, Freq_samp, detrend, axis)
+    with fft_backend(workers):
+        if opt == 1:
+            ns = TotalNo // seg
+            Freq, Cpsd = signal.csd(NVar1, NVar2, Freq_samp, nperseg=ns,
+                                    nfft=TotalNo, noverlap=ns // overlap,
+                                    axis=1)
+            Freq = Freq[1:]
+            Cpsd = Cpsd[:, 1:]
+        else:
+            Var1_fft = sp_fft.rfft(NVar1, axis=1)[:, 1:]
+            Var2_fft = sp_fft.rfft(NVar2, axis=1)[:, 1:]
+            Cpsd = Var1_fft * Var2_fft
+            num = np.shape(Var1_fft)[1]
+            Freq = np.linspace(Freq_samp / TotalNo, Freq_samp / 2, num)
+    return (Freq, Cpsd)
+
+
+def coherence_batch(var1, var2, dt, Freq_samp, seg=8, overlap=4,
+                    detrend='constant', axis=1, workers=None):
+    """coherence of pairs of signals, same as coherence(opt=1)"""
+    NVar1, TotalNo = _prepare_batch(var1, dt, Freq_samp, detrend, axis)
+    NVar2, _ = _prepare_batch(var2, dt, Freq_samp, detrend, axis)
+    ns = TotalNo // seg
+    with fft_backend(workers):
+        Freq, gamma = signal.coherence(NVar1, NVar2, fs=Freq_samp,
+                                       nperseg=ns, nfft=TotalNo,
+                                       noverlap=ns // overlap, axis=1)
+    return (Freq[1:], gamma[:, 1:])
+
+
 # Obtain the standard law of wall (turbulence)
 def std_wall_law():
     ConstK = 0.41
@@ -662,9 +795,8 @@ def extract_point(InFolder, OutFolder, timezone, xy, skip=1, col=None):
         col = ["u", "v", "w", "p", "vorticity_1", "vorticity_2", "vorticity_3"]
     dirs = sorted(os.listdir(InFolder))
     data = pd.read_hdf(InFolder + dirs[0])
-    NewFrame = data.loc[data["x"] == xy[0]]
-    TemFrame = NewFrame.loc[NewFrame["y"] == xy[1]]
-    ind = TemFrame.index.values[0]
+    grid = GridIndex(data, cols=['x', 'y'])
+    ind = grid.rows(xy)[0]
     xarr = np.zeros((np.size(timezone), np.size(col)))
     j = 0
     for i in range(np.size(dirs)):
@@ -685,6 +817,95 @@ def extract_point(InFolder, OutFolder, timezone, xy, skip=1, col=None):
     )
 
 
+# %% extract time series of many probes by one pass over the snapshots
+def probe_weights(frame, probes, method='nearest'):
+    """rows and weights of every probe in a snapshot
+
+    Inputs:
+        probes - coordinates of probes, shape (m, 2) for (x, y) or (m, 3)
+                 for (x, y, z)
+        method - 'nearest': the closest point,
+                 'bilinear': interpolation in x-y plane of the grid
+                 (the z plane is the nearest one)
+    Return:
+        rows, weights with shape (m, 1) or (m, 4)
+    """
+    probes = np.atleast_2d(np.asarray(probes, dtype=np.float64))
+    cols = ['x', 'y', 'z'][:np.shape(probes)[1]]
+    if method == 'nearest':
+        tree = cKDTree(frame[cols].values)
+        dist, rows = tree.query(probes)
+        return rows.reshape(-1, 1), np.ones((np.size(rows), 1))
+    if method != 'bilinear':
+        raise ValueError('ERROR: unknown probe method ' + str(method))
+    grid = GridIndex(frame, cols=cols)
+    xline = grid.axis('x')
+    yline = grid.axis('y')
+    i = np.clip(np.searchsorted(xline, probes[:, 0]) - 1, 0,
+                np.size(xline) - 2)
+    j = np.clip(np.searchsorted(yline, probes[:, 1]) - 1, 0,
+                np.size(yline) - 2)
+    sx = (probes[:, 0] - xline[i]) / (xline[i + 1] - xline[i])
+    sy = (probes[:, 1] - yline[j]) / (yline[j + 1] - yline[j])
+    rows = np.empty((np.shape(probes)[0], 4), dtype=np.int64)
+    weights = np.empty((np.shape(probes)[0], 4))
+    corners = [(0, 0), (1, 0), (0, 1), (1, 1)]
+    for n, (di, dj) in enumerate(corners):
+        pts = np.stack([xline[i + di], yline[j + dj]], axis=1)
+        if len(cols) == 3:
+            zline = grid.axis('z')
+            k = np.argmin(np.abs(zline[None, :] - probes[:, 2:3]), axis=1)
+            pts = np.hstack((pts, zline[k].reshape(-1, 1)))
+        rows[:, n] = grid.point_rows(pts)
+        weights[:, n] = (sx if di else 1 - sx) * (sy if dj else 1 - sy)
+    if np.any(rows < 0):
+        raise ValueError('ERROR: probes are not inside the grid cells')
+    return rows, weights
+
+
+def _probe_series(task):
+    files, rows, weights, VarList = task
+    data = np.empty((np.size(files), np.shape(rows)[0], len(VarList)))
+    for n, file in enumerate(files):
+        frame = pd.read_hdf(file)
+        for v, var in enumerate(VarList):
+            val = frame[var].values
+            data[n, :, v] = np.sum(val[rows] * weights, axis=1)
+    return data
+
+
+def extract_probes(InFolder, OutFile, probes, VarList, timezone=None,
+                   method='nearest', skip=1, processes=1):
+    """time series of many probes from the snapshots (.h5) in InFolder,
+    every snapshot is read only once
+
+    Return:
+        data with shape (time, probe, var), also saved in OutFile (.npz)
+        together with time, probes and variables
+    """
+    dirs = sorted(os.listdir(InFolder))[::skip]
+    files = [InFolder + name for name in dirs]
+    if timezone is None:
+        timezone = np.arange(np.size(files))
+    if np.size(timezone) != np.size(files):
+        sys.exit("The NO of snapshots are not equal to the NO of timespoints!!!")
+    rows, weights = probe_weights(pd.read_hdf(files[0]), probes,
+                                  method=method)
+    num = max(1, min(processes, np.size(files)))
+    parts = np.array_split(np.arange(np.size(files)), num)
+    tasks = [([files[i] for i in part], rows, weights, VarList)
+             for part in parts]
+    with timer("Extracting probes"):
+        if num == 1:
+            data = _probe_series(tasks[0])
+        else:
+            with Pool(processes=num) as pool:
+                data = np.concatenate(pool.map(_probe_series, tasks))
+    np.savez(OutFile, data=data, time=np.asarray(timezone),
+             probes=np.atleast_2d(probes), variables=np.array(VarList))
+    return data
+
+
 # Obtain shock location inside the boudary layer with time
 def shock_foot(InFolder, OutFolder, timepoints, yval, var, skip=1):
     dirs = sorted(os.listdir(InFolder))